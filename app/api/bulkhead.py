@@ -0,0 +1,38 @@
+"""Bulkheads used to bound the number of concurrent outbound requests."""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+
+class Bulkhead:
+    """
+    Limits the number of concurrent requests sharing a resource,
+    while keeping count of the requests in flight and of those waiting for a free slot (the queue depth).
+
+    Parameters
+    ----------
+    max_concurrent : int
+        Maximum number of requests allowed in flight at once.
+    """
+
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Wait for a free slot and hold it for the duration of the context."""
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
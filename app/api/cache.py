@@ -0,0 +1,234 @@
+"""In-process cache with time-to-live expiry and stale-while-revalidate refreshes."""
+
+import asyncio
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from .logger import get_logger
+from .shared_store import SharedStore
+
+logger = get_logger(__name__)
+
+
+class TTLCache:
+    """
+    Caches values by key for a limited time (the time-to-live, TTL).
+
+    Once the TTL of an entry has passed, the stale value is still returned immediately
+    while a single background refresh of the entry is started (stale-while-revalidate).
+    If a refresh fails or its value is not to be cached, the stale value is kept and served for the retry interval
+    before the entry is refreshed again, so that every request does not start a new refresh.
+    If a maximum size is set, the least recently used entries are evicted once the cache is full.
+    If the cache is shared (see share), values are first looked up in the shared store before being fetched,
+    and fetched values are written to the shared store, so that other worker processes do not have to fetch them again.
+
+    Parameters
+    ----------
+    ttl : float
+        Default time in seconds for which a cached value is considered fresh.
+    max_size : int, optional
+        Maximum number of entries in the cache, by default None (unbounded).
+    retry_interval : float, optional
+        Time in seconds for which a stale value is kept after a failed refresh before it is refreshed again,
+        by default 0 (refreshed again on the next lookup).
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_size: int | None = None,
+        retry_interval: float = 0,
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.retry_interval = retry_interval
+        # In the form of {key: (value, expires_at), ...}, ordered from least to most recently used
+        self._entries = OrderedDict()
+        # Stores the in-flight fetch of each key, in the form of {key: asyncio.Task, ...}
+        self._fetches = {}
+        self.shared_store = None
+        self.shared_namespace = None
+        self.on_shared_hit = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def get(self, key: str) -> tuple[Any, bool] | None:
+        """Return the cached value of a key along with whether it is still fresh, or None if the key is not cached."""
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        value, expires_at = self._entries[key]
+        return value, time.monotonic() < expires_at
+
+    def set(self, key: str, value: Any, ttl: float | None = None):
+        """Cache a value for a key, for the given TTL (or the default TTL of the cache)."""
+        ttl = self.ttl if ttl is None else ttl
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        if self.max_size is not None:
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    async def set_and_share(
+        self, key: str, value: Any, ttl: float | None = None
+    ):
+        """
+        Cache a value for a key, for the given TTL (or the default TTL of the cache),
+        and write it to the shared store (if the cache is shared).
+        """
+        ttl = self.ttl if ttl is None else ttl
+        self.set(key, value, ttl=ttl)
+        await self._set_shared(key, value, ttl)
+
+    def invalidate(self, key: str):
+        """Remove the cached value of a key."""
+        self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove all cached values."""
+        self._entries.clear()
+
+    def share(
+        self,
+        shared_store: SharedStore | None,
+        namespace: str,
+        on_shared_hit: Callable[[str], Awaitable[None]] | None = None,
+    ):
+        """
+        Share fetched values with other worker processes through a shared store, under the given namespace (or stop sharing if the store is None).
+        If given, on_shared_hit is awaited with the key of each value taken from the shared store instead of being fetched,
+        e.g., to rebuild any state that is otherwise derived while fetching the value.
+        """
+        self.shared_store = shared_store
+        self.shared_namespace = namespace
+        self.on_shared_hit = on_shared_hit
+
+    async def clear_shared(self):
+        """Remove all cached values, including those in the shared store (if the cache is shared)."""
+        self.clear()
+        if self.shared_store is not None:
+            try:
+                await asyncio.to_thread(
+                    self.shared_store.clear, self.shared_namespace
+                )
+            except sqlite3.Error as exc:
+                logger.warning(
+                    f"Failed to clear the shared cache {self.shared_namespace}: {exc}"
+                )
+
+    async def get_or_fetch(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        get_ttl: Callable[[Any], float | None] | None = None,
+    ) -> Any:
+        """
+        Return the cached value of a key if there is one, or otherwise fetch, cache and return it.
+        Stale values are returned as is, and refreshed in the background.
+
+        Parameters
+        ----------
+        key : str
+            Key of the value.
+        fetch : Callable[[], Awaitable[Any]]
+            Function returning a coroutine that fetches the value.
+        get_ttl : Callable[[Any], float | None], optional
+            Function returning the TTL for a fetched value, where None means the default TTL and
+            a value <= 0 means the value is not cached, by default None (always use the default TTL).
+        """
+        cached = self.get(key)
+        if cached is not None:
+            value, is_fresh = cached
+            if not is_fresh and key not in self._fetches:
+                self._start_fetch(key, fetch, get_ttl).add_done_callback(
+                    self._log_failed_refresh
+                )
+            return value
+
+        fetch_task = self._fetches.get(key) or self._start_fetch(
+            key, fetch, get_ttl
+        )
+        return await asyncio.shield(fetch_task)
+
+    def _start_fetch(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        get_ttl: Callable[[Any], float | None] | None,
+    ) -> asyncio.Task:
+        """Start fetching the value of a key in a task that caches the value once fetched."""
+
+        async def fetch_and_cache() -> Any:
+            try:
+                shared = await self._get_shared(key)
+                if shared is not None:
+                    value, ttl = shared
+                    self.set(key, value, ttl=ttl)
+                    if self.on_shared_hit is not None:
+                        await self.on_shared_hit(key)
+                    return value
+
+                try:
+                    value = await fetch()
+                except Exception:
+                    self._keep_stale(key)
+                    raise
+                ttl = None if get_ttl is None else get_ttl(value)
+                if ttl is None or ttl > 0:
+                    await self.set_and_share(key, value, ttl=ttl)
+                else:
+                    self._keep_stale(key)
+                return value
+            finally:
+                del self._fetches[key]
+
+        task = asyncio.ensure_future(fetch_and_cache())
+        self._fetches[key] = task
+        return task
+
+    def _keep_stale(self, key: str):
+        """Keep serving the stale value of a key (if there is one) for the retry interval, instead of a failed refresh."""
+        cached = self._entries.get(key)
+        if cached is not None and self.retry_interval > 0:
+            self.set(key, cached[0], ttl=self.retry_interval)
+
+    async def _get_shared(self, key: str) -> tuple[Any, float | None] | None:
+        """Return the value of a key from the shared store along with its remaining TTL, or None if it is not there."""
+        if self.shared_store is None:
+            return None
+        try:
+            return await asyncio.to_thread(
+                self.shared_store.get, self.shared_namespace, key
+            )
+        except sqlite3.Error as exc:
+            logger.warning(
+                f"Failed to read {key} from the shared cache {self.shared_namespace}: {exc}"
+            )
+            return None
+
+    async def _set_shared(self, key: str, value: Any, ttl: float):
+        """Write the value of a key to the shared store, for the given TTL."""
+        if self.shared_store is None:
+            return
+        try:
+            await asyncio.to_thread(
+                self.shared_store.set, self.shared_namespace, key, value, ttl
+            )
+        except (sqlite3.Error, TypeError) as exc:
+            logger.warning(
+                f"Failed to write {key} to the shared cache {self.shared_namespace}: {exc}"
+            )
+
+    @staticmethod
+    def _log_failed_refresh(task: asyncio.Task):
+        """Log an error raised while refreshing a stale value in the background (the stale value is kept)."""
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(
+                f"Failed to refresh a stale cached value: {task.exception()}"
+            )
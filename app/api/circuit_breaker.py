@@ -0,0 +1,98 @@
+"""Circuit breaker used to stop sending requests to nodes that are repeatedly failing."""
+
+import time
+from enum import Enum
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class CircuitState(str, Enum):
+    """Possible states of a circuit breaker."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """
+    Tracks consecutive failed requests to a single node.
+
+    The circuit starts closed (requests are sent as usual).
+    After a number of consecutive failures, the circuit opens and requests are rejected without being sent.
+    Once the reset timeout has passed, the circuit becomes half-open and a single probe request is let through:
+    if it succeeds the circuit closes again, otherwise it reopens.
+
+    Parameters
+    ----------
+    name : str
+        Name used to identify the circuit in logs, e.g. the node URL.
+    failure_threshold : int
+        Number of consecutive failures after which the circuit opens.
+    reset_timeout : float
+        Time in seconds after which an open circuit lets a probe request through.
+    """
+
+    def __init__(
+        self, name: str, failure_threshold: int, reset_timeout: float
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probe_started_at = None
+
+    def allow_request(self) -> bool:
+        """Return whether a request may be sent, moving an open circuit to half-open once the reset timeout has passed."""
+        if self.state == CircuitState.CLOSED:
+            return True
+
+        now = time.monotonic()
+        if (
+            self.state == CircuitState.OPEN
+            and now - self.opened_at >= self.reset_timeout
+        ):
+            self.state = CircuitState.HALF_OPEN
+            self.probe_started_at = None
+
+        # Only one probe request is let through at a time.
+        # A probe that never reports back (e.g., because it was cancelled) is replaced after the reset timeout.
+        if self.state == CircuitState.HALF_OPEN and (
+            self.probe_started_at is None
+            or now - self.probe_started_at >= self.reset_timeout
+        ):
+            self.probe_started_at = now
+            return True
+
+        return False
+
+    def record_success(self):
+        """Record a successful request, closing the circuit if it was not already closed."""
+        if self.state != CircuitState.CLOSED:
+            logger.info(
+                f"Circuit for {self.name} closed after a successful request."
+            )
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probe_started_at = None
+
+    def record_failure(self):
+        """Record a failed request, opening the circuit if the probe failed or the failure threshold is reached."""
+        self.consecutive_failures += 1
+        if (
+            self.state == CircuitState.HALF_OPEN
+            or self.consecutive_failures >= self.failure_threshold
+        ):
+            if self.state != CircuitState.OPEN:
+                logger.warning(
+                    f"Circuit for {self.name} opened after {self.consecutive_failures} consecutive failed requests. "
+                    f"Requests will be skipped for {self.reset_timeout} seconds."
+                )
+            self.state = CircuitState.OPEN
+            self.opened_at = time.monotonic()
+            self.probe_started_at = None
@@ -1,19 +1,204 @@
 """CRUD functions called by path operations."""
 
 import asyncio
-from typing import TypeVar
+import functools
+import time
+from typing import Any, AsyncIterator, Callable, Coroutine, TypeVar
 
-from fastapi import HTTPException
+from fastapi import HTTPException, status
 from pydantic import BaseModel
 
-from . import models
+from . import metrics, models, timing, tracing
 from . import utility as util
+from .cache import TTLCache
 from .logger import get_logger
+from .planner import DatasetNodeIndex, NodeVocabularyIndex
+from .shared_store import SharedStore
+from .singleflight import SingleFlight
 
 logger = get_logger(__name__)
 
 QueryResponseT = TypeVar("QueryResponseT", bound=BaseModel)
 
+# Shares a single in-flight federated query between concurrent identical queries
+# NOTE: Only identical queries handled by the same worker process (see app.server) are coalesced.
+QUERY_SINGLE_FLIGHT = SingleFlight()
+
+# Caches the combined vocabulary of each attribute (e.g., available assessments) across all nodes, by attribute path
+# A stale vocabulary is kept for the (shorter) error TTL if its refresh fails on all nodes.
+VOCABULARY_CACHE = TTLCache(
+    ttl=util.VOCAB_CACHE_TTL.value,
+    retry_interval=min(
+        util.VOCAB_CACHE_ERROR_TTL.value, util.VOCAB_CACHE_TTL.value
+    ),
+)
+
+# Caches the combined available versions of each pipeline across all nodes, by pipeline term.
+# Entries are evicted once the pipelines vocabulary is refreshed, since the available versions may have changed with it.
+PIPELINE_VERSIONS_CACHE = TTLCache(
+    ttl=util.VOCAB_CACHE_TTL.value,
+    max_size=util.PIPELINE_VERSIONS_CACHE_MAX_SIZE.value,
+    retry_interval=min(
+        util.VOCAB_CACHE_ERROR_TTL.value, util.VOCAB_CACHE_TTL.value
+    ),
+)
+
+# Stores the vocabulary of each node as last fetched, which is used to skip nodes that cannot match a query
+NODE_VOCABULARY_INDEX = NodeVocabularyIndex(max_age=util.VOCAB_CACHE_TTL.value)
+
+# Stores the nodes that each dataset was found in by POST /datasets queries, which is used to route POST /subjects queries.
+# NOTE: This index and the query sessions below are kept per worker process (see app.server), so a POST /subjects query
+# is only narrowed down by POST /datasets queries handled by the same worker process, and is otherwise sent as is.
+DATASET_NODE_INDEX = DatasetNodeIndex(
+    max_age=util.DATASET_NODE_INDEX_MAX_AGE.value
+)
+
+# Caches the datasets matched in each node by recent POST /datasets queries, by query session key
+# (see get_query_session_key), in the form of {session_key: {node_url: {dataset_uuid, ...}, ...}, ...}
+QUERY_SESSION_CACHE = TTLCache(
+    ttl=util.QUERY_SESSION_TTL.value,
+    max_size=util.QUERY_SESSION_CACHE_MAX_SIZE.value,
+)
+
+
+# Key of the vocabulary of each node in the shared store (see share_node_vocabulary_index)
+NODE_VOCABULARY_INDEX_SHARED_KEY = "node_vocabulary_index"
+
+
+def share_caches(shared_store: SharedStore | None):
+    """
+    Share the vocabulary and pipeline versions caches with the other worker processes of the API
+    through a shared store (or stop sharing them if the store is None).
+    Whenever a vocabulary is taken from the shared store, the vocabulary of each node is loaded along with it
+    (see load_shared_node_vocabulary_index), so that the worker can still skip nodes that cannot match a query.
+    """
+    VOCABULARY_CACHE.share(
+        shared_store,
+        "vocabulary",
+        on_shared_hit=lambda key: load_shared_node_vocabulary_index(),
+    )
+    PIPELINE_VERSIONS_CACHE.share(
+        shared_store,
+        "pipeline_versions",
+        on_shared_hit=lambda key: load_shared_node_vocabulary_index(),
+    )
+
+
+async def load_shared_node_vocabulary_index():
+    """Update the vocabulary of each node with the more recent vocabularies fetched by other worker processes, if any."""
+    shared_entries = await util.get_shared_state(
+        NODE_VOCABULARY_INDEX_SHARED_KEY
+    )
+    if shared_entries is None:
+        return
+    # Ignore the vocabularies of any nodes that have since been removed from the node index
+    NODE_VOCABULARY_INDEX.load_entries(
+        {
+            name: [
+                entry for entry in entries if entry[0] in util.FEDERATION_NODES
+            ]
+            for name, entries in shared_entries.items()
+        }
+    )
+
+
+async def share_node_vocabulary_index():
+    """
+    Publish the vocabulary of each node, as last fetched by this or any other worker process,
+    for the other worker processes of the API (if there is a shared store).
+    The vocabularies are merged with the shared ones in a single update of the shared store,
+    so that vocabularies published concurrently by other worker processes are not overwritten.
+    """
+    if util.SHARED_STORE is None:
+        return
+    entries = NODE_VOCABULARY_INDEX.get_entries()
+    node_urls = set(util.FEDERATION_NODES)
+
+    def merge_shared_entries(shared_entries: dict | None) -> dict:
+        # Also drop the shared vocabularies of any nodes that have since been removed from the node index
+        merged_entries = NodeVocabularyIndex.merge_entries(
+            shared_entries or {}, entries
+        )
+        return {
+            name: [entry for entry in name_entries if entry[0] in node_urls]
+            for name, name_entries in merged_entries.items()
+        }
+
+    merged_entries = await util.update_shared_state(
+        NODE_VOCABULARY_INDEX_SHARED_KEY, merge_shared_entries
+    )
+    if merged_entries is not None:
+        NODE_VOCABULARY_INDEX.load_entries(merged_entries)
+
+
+async def forget_removed_nodes(node_urls: list[str]):
+    """
+    Drop the vocabularies and datasets stored for nodes removed from the node index,
+    and invalidate the vocabulary and pipeline versions caches (including any shared with other worker processes),
+    since their values combine the vocabularies of all nodes.
+    """
+    for node_url in node_urls:
+        NODE_VOCABULARY_INDEX.remove_node(node_url)
+        DATASET_NODE_INDEX.remove_node(node_url)
+    await VOCABULARY_CACHE.clear_shared()
+    await PIPELINE_VERSIONS_CACHE.clear_shared()
+
+
+util.NODE_REMOVAL_HANDLERS.append(forget_removed_nodes)
+
+
+def coalesce_identical_queries(path: str):
+    """
+    Decorate a CRUD function for a federated query so that concurrent calls with an identical query
+    (see utility.build_query_fingerprint) share the result of a single call, rather than each fanning out to the nodes.
+
+    The timing of the shared call (see timing.RequestTiming) is added to the timing of the request of every caller.
+    NOTE: The shared call runs in the context of the request that started it, so the requests sent to nodes
+    only carry the request ID of that request, under which the spans of the shared call are also recorded.
+    The request of each other caller instead gets a "coalesced" span, whose "shared_request_id" attribute
+    points to the trace of the shared call.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(
+            query: dict,
+            token: str | None = None,
+            time_budget: float | None = None,
+        ) -> dict:
+            query_fingerprint = util.build_query_fingerprint(
+                path=path, query=query, token=token, time_budget=time_budget
+            )
+
+            async def call() -> tuple[dict, timing.RequestTiming, str | None]:
+                # The call runs in its own task, so its timing can be recorded separately from the caller's request
+                call_timing = timing.RequestTiming()
+                timing.REQUEST_TIMING.set(call_timing)
+                result = await func(
+                    query=query, token=token, time_budget=time_budget
+                )
+                return result, call_timing, tracing.get_request_id()
+
+            started_at = time.time()
+            start = time.perf_counter()
+            result, call_timing, call_request_id = (
+                await QUERY_SINGLE_FLIGHT.do(query_fingerprint, call)
+            )
+            timing.record_all(call_timing)
+            if call_request_id != tracing.get_request_id():
+                tracing.export_span(
+                    "coalesced",
+                    started_at=started_at,
+                    duration=time.perf_counter() - start,
+                    parent_id=tracing.CURRENT_SPAN_ID.get(),
+                    attributes={"shared_request_id": call_request_id},
+                )
+            return result
+
+        return wrapper
+
+    return decorator
+
 
 # TODO: Consider removing in future -
 # this utility function is currently used by several CRUD functions,
@@ -30,55 +215,399 @@ def build_node_request_urls(node_urls: list, path: str) -> list:
 
 
 def build_combined_response(
-    total_nodes: int, cross_node_results: list | dict, node_errors: list
+    total_nodes: int,
+    cross_node_results: list | dict,
+    node_errors: list,
+    is_summary_logged: bool = True,
 ) -> dict:
-    """Return a combined response containing all the nodes' responses and errors. Logs to console a summary of the federated request."""
-    content = {"errors": node_errors, "responses": cross_node_results}
+    """
+    Return a combined response containing all the nodes' responses and errors.
+    Logs to console a summary of the federated request, unless is_summary_logged is False.
+    """
+    with tracing.span(
+        "merge", total_nodes=total_nodes, failed_nodes=len(node_errors)
+    ):
+        content = {"errors": node_errors, "responses": cross_node_results}
 
-    if node_errors:
-        logger.warning(
-            f"Requests to {len(node_errors)}/{total_nodes} nodes failed: {[node_error['node_name'] for node_error in node_errors]}."
-        )
-        if len(node_errors) == total_nodes:
-            # See https://fastapi.tiangolo.com/advanced/additional-responses/ for more info
-            content["nodes_response_status"] = "fail"
+        if node_errors:
+            if is_summary_logged:
+                logger.warning(
+                    f"Requests to {len(node_errors)}/{total_nodes} nodes failed: {[node_error['node_name'] for node_error in node_errors]}."
+                )
+            if len(node_errors) == total_nodes:
+                # See https://fastapi.tiangolo.com/advanced/additional-responses/ for more info
+                content["nodes_response_status"] = "fail"
+            else:
+                content["nodes_response_status"] = "partial success"
         else:
-            content["nodes_response_status"] = "partial success"
-    else:
-        logger.info(
-            f"Requests to all nodes succeeded ({total_nodes}/{total_nodes})."
-        )
-        content["nodes_response_status"] = "success"
+            if is_summary_logged:
+                logger.info(
+                    f"Requests to all nodes succeeded ({total_nodes}/{total_nodes})."
+                )
+            content["nodes_response_status"] = "success"
 
     return content
 
 
+async def iter_node_responses(
+    node_requests: dict[str, Coroutine], deadline: float | None = None
+) -> AsyncIterator[tuple[str, Any]]:
+    """
+    Concurrently send requests to nodes and yield each node URL with the node's response (or raised exception)
+    as soon as it arrives.
+    Any requests still pending at the deadline (time on the monotonic clock) are cancelled,
+    and a timeout error is yielded in place of their responses.
+    """
+    tasks = {
+        asyncio.ensure_future(request): node_url
+        for node_url, request in node_requests.items()
+    }
+    pending = set(tasks)
+    try:
+        while pending:
+            timeout = (
+                None
+                if deadline is None
+                else max(deadline - time.monotonic(), 0)
+            )
+            done, pending = await asyncio.wait(
+                pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                break
+            for task in done:
+                yield tasks[task], task.exception() or task.result()
+    finally:
+        # Also ensures no node requests are left running if the federated query itself is cancelled
+        for task in pending:
+            task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    for task in pending:
+        yield tasks[task], HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Request failed due to a timeout: the node did not respond before the federation deadline.",
+        )
+
+
+async def send_node_requests(
+    node_requests: dict[str, Coroutine], deadline: float | None = None
+) -> list:
+    """
+    Concurrently send requests to nodes and return the responses (or raised exceptions) in the order of the requests,
+    with a timeout error in place of the response of any node that did not respond before the deadline.
+    """
+    responses = {}
+    async for node_url, response in iter_node_responses(
+        node_requests, deadline=deadline
+    ):
+        responses[node_url] = response
+    return [responses[node_url] for node_url in node_requests]
+
+
 def gather_node_query_responses(
-    node_urls: list, responses: list, response_cls: type[QueryResponseT]
+    node_urls: list,
+    responses: list,
+    response_cls: type[QueryResponseT],
+    federation_nodes: dict | None = None,
 ) -> tuple[list[QueryResponseT], list[dict]]:
-    """Gather results and errors from a list of cohort query responses from multiple nodes."""
+    """
+    Gather results and errors from a list of cohort query responses from multiple nodes.
+    Node names are looked up in the given node index (by default, the current node index).
+    The time spent validating the results is added to the timing of the current request.
+    """
+    if federation_nodes is None:
+        federation_nodes = util.FEDERATION_NODES
     cross_node_results = []
     node_errors = []
-    for node_url, node_response in zip(node_urls, responses):
-        node_name = util.FEDERATION_NODES[node_url]
-        if isinstance(node_response, HTTPException):
-            node_errors.append(
-                {"node_name": node_name, "error": node_response.detail}
-            )
-            logger.warning(
-                f"Request to node {node_name} ({node_url}) did not succeed: {node_response.detail}"
+    with (
+        timing.measure("validate"),
+        tracing.span("validate", nodes=len(node_urls)),
+    ):
+        for node_url, node_response in zip(node_urls, responses):
+            node_name = federation_nodes[node_url]
+            if isinstance(node_response, HTTPException):
+                node_errors.append(
+                    {"node_name": node_name, "error": node_response.detail}
+                )
+                logger.warning(
+                    f"Request to node {node_name} ({node_url}) did not succeed: {node_response.detail}"
+                )
+            else:
+                for dataset_response in node_response:
+                    dataset_response["node_name"] = node_name
+                    dataset_result = response_cls.model_validate(
+                        dataset_response
+                    )
+                    cross_node_results.append(dataset_result)
+    return cross_node_results, node_errors
+
+
+async def stream_node_query_responses(
+    node_requests: dict[str, Coroutine],
+    response_cls: type[QueryResponseT],
+    deadline: float | None = None,
+    federation_nodes: dict | None = None,
+) -> AsyncIterator[dict]:
+    """
+    Yield the results of a federated query as soon as each node responds.
+
+    Each matching dataset is yielded as a {"event": "response", "data": {...}} event,
+    and once all nodes have responded (or the deadline has passed), a final
+    {"event": "summary", "data": {"errors": [...], "nodes_response_status": ...}} event is yielded.
+    """
+    node_errors = []
+    async for node_url, node_response in iter_node_responses(
+        node_requests, deadline=deadline
+    ):
+        node_results, errors = gather_node_query_responses(
+            node_urls=[node_url],
+            responses=[node_response],
+            response_cls=response_cls,
+            federation_nodes=federation_nodes,
+        )
+        node_errors.extend(errors)
+        for node_result in node_results:
+            yield {"event": "response", "data": node_result.model_dump()}
+
+    summary = build_combined_response(
+        total_nodes=len(node_requests),
+        cross_node_results=[],
+        node_errors=node_errors,
+    )
+    summary.pop("responses")
+    yield {"event": "summary", "data": summary}
+
+
+async def skip_node_request() -> list:
+    """Stand in for the request to a node that cannot match a query, returning an empty result."""
+    return []
+
+
+def plan_node_requests(node_urls: list, query: dict) -> list:
+    """
+    Return the node URLs that may have matches for a query, leaving out any node whose vocabulary is known
+    not to contain a queried term (see planner.NodeVocabularyIndex).
+    """
+    if not util.IS_QUERY_PLANNER_ENABLED.value:
+        return node_urls
+
+    nodes_to_query = []
+    for node_url in node_urls:
+        unmatched_params = NODE_VOCABULARY_INDEX.get_unmatched_params(
+            node_url, query
+        )
+        if unmatched_params:
+            logger.info(
+                f"Skipping request to node {util.FEDERATION_NODES.get(node_url, node_url)} ({node_url}): "
+                f"no matches possible for the queried {', '.join(unmatched_params)}."
             )
         else:
-            for dataset_response in node_response:
-                dataset_response["node_name"] = node_name
-                dataset_result = response_cls.model_validate(dataset_response)
-                cross_node_results.append(dataset_result)
-    return cross_node_results, node_errors
+            nodes_to_query.append(node_url)
+    return nodes_to_query
+
+
+def route_dataset_uuids(
+    query: dict, nodes_filter: list[dict]
+) -> tuple[dict, list[dict]]:
+    """
+    Narrow down the datasets queried in each node of a POST /subjects query to those that may belong to the node,
+    based on the nodes each dataset was found in by previous POST /datasets queries (see planner.DatasetNodeIndex).
+
+    Datasets requested across all nodes (through the top-level "dataset_uuids" of the query)
+    are assigned to the nodes they were found in, while unknown datasets are queried in all nodes.
+    Nodes left with no datasets to query are given an empty list of datasets.
+
+    Returns
+    -------
+    tuple[dict, list[dict]]
+        The query without any top-level "dataset_uuids", and the nodes to query with their assigned datasets.
+    """
+    dataset_uuids = query.get("dataset_uuids")
+    if dataset_uuids is not None:
+        query = {
+            key: value
+            for key, value in query.items()
+            if key != "dataset_uuids"
+        }
+        node_datasets = DATASET_NODE_INDEX.route(
+            [node["node_url"] for node in nodes_filter], dataset_uuids
+        )
+        return query, [
+            {"node_url": node_url, "dataset_uuids": node_dataset_uuids}
+            for node_url, node_dataset_uuids in node_datasets.items()
+        ]
+
+    routed_nodes_filter = []
+    for node in nodes_filter:
+        if node.get("dataset_uuids"):
+            node = {
+                **node,
+                "dataset_uuids": DATASET_NODE_INDEX.route(
+                    [node["node_url"]], node["dataset_uuids"]
+                )[node["node_url"]],
+            }
+        routed_nodes_filter.append(node)
+    return query, routed_nodes_filter
+
+
+def get_query_session_key(query: dict, token: str | None) -> str:
+    """
+    Return the key of the query session for a query, which is shared by queries to any POST endpoint
+    with the same filters (i.e., BaseQueryModel fields) from the same user.
+    """
+    query_filters = {
+        key: value
+        for key, value in query.items()
+        if key in models.BaseQueryModel.model_fields
+    }
+    return util.build_query_fingerprint(
+        path="session", query=query_filters, token=token
+    )
+
+
+def apply_query_session(
+    query: dict, nodes_filter: list[dict], token: str | None
+) -> list[dict]:
+    """
+    Narrow down the datasets queried in each node of a POST /subjects query using the datasets matched
+    in each node by a recent POST /datasets query with the same filters, if there was one.
+
+    Nodes that matched no datasets, or none of the datasets requested from them, are given an empty list of datasets.
+    Nodes that did not respond to the POST /datasets query are left as is.
+    """
+    if util.QUERY_SESSION_TTL.value <= 0:
+        return nodes_filter
+    session = QUERY_SESSION_CACHE.get(get_query_session_key(query, token))
+    if session is None or not session[1]:
+        return nodes_filter
 
+    node_matched_datasets = session[0]
+    session_nodes_filter = []
+    for node in nodes_filter:
+        matched_dataset_uuids = node_matched_datasets.get(node["node_url"])
+        if matched_dataset_uuids is not None:
+            if not matched_dataset_uuids:
+                node = {**node, "dataset_uuids": []}
+            elif node.get("dataset_uuids") is not None:
+                node = {
+                    **node,
+                    "dataset_uuids": [
+                        dataset_uuid
+                        for dataset_uuid in node["dataset_uuids"]
+                        if dataset_uuid in matched_dataset_uuids
+                    ],
+                }
+        session_nodes_filter.append(node)
+    return session_nodes_filter
 
+
+async def record_node_datasets(
+    node_url: str, request: Coroutine, session_key: str
+) -> Any:
+    """
+    Send a POST /datasets request to a node, and store the node of each dataset in its response
+    along with the datasets matched by the node in the query session.
+    """
+    response = await request
+    if isinstance(response, list):
+        dataset_uuids = [
+            dataset["dataset_uuid"]
+            for dataset in response
+            if isinstance(dataset, dict) and "dataset_uuid" in dataset
+        ]
+        DATASET_NODE_INDEX.update(node_url, dataset_uuids)
+
+        if util.QUERY_SESSION_TTL.value > 0:
+            session = QUERY_SESSION_CACHE.get(session_key)
+            node_matched_datasets = (
+                session[0] if session is not None and session[1] else {}
+            )
+            node_matched_datasets[node_url] = set(dataset_uuids)
+            QUERY_SESSION_CACHE.set(
+                session_key,
+                node_matched_datasets,
+                ttl=util.QUERY_SESSION_TTL.value,
+            )
+    return response
+
+
+def build_node_post_requests(
+    path: str, query: dict, token: str | None, deadline: float | None
+) -> dict[str, Coroutine]:
+    """
+    Validate the nodes specified in a query to a POST endpoint,
+    and return a dict mapping each node URL to the (not yet awaited) request to send to the node.
+    """
+    # NOTE: The 'nodes' field in a single request can only be ALL dicts
+    # Normalize trailing slashes in specified node URLs for downstream requests
+    nodes_filter = util.validate_and_format_queried_nodes(query.get("nodes"))
+    # Nodes explicitly given an empty list of datasets are still queried with it,
+    # unlike nodes narrowed down to no datasets below
+    requested_dataset_uuids = {
+        node["node_url"]: node.get("dataset_uuids", query.get("dataset_uuids"))
+        for node in nodes_filter
+    }
+    if path == "subjects":
+        query, nodes_filter = route_dataset_uuids(query, nodes_filter)
+        nodes_filter = apply_query_session(query, nodes_filter, token)
+
+    node_requests = util.build_node_requests_for_query(
+        path=path,
+        nodes_filter=nodes_filter,
+        query=query,
+    )
+    nodes_to_query = plan_node_requests(
+        [
+            node["node_url"]
+            for node in nodes_filter
+            # Nodes left without any datasets to query cannot have matches
+            if node.get("dataset_uuids") != []
+            or requested_dataset_uuids[node["node_url"]] == []
+        ],
+        query,
+    )
+    metrics.FEDERATION_FANOUT.observe(len(nodes_to_query), path)
+
+    node_post_requests = {
+        node["node_url"]: (
+            util.send_request(
+                method="POST",
+                url=request_url,
+                body=request_body,
+                token=token,
+                node_url=node["node_url"],
+                deadline=deadline,
+            )
+            if node["node_url"] in nodes_to_query
+            else skip_node_request()
+        )
+        for node, (request_url, request_body) in zip(
+            nodes_filter, node_requests.items()
+        )
+    }
+    if not query.get("nodes"):
+        # Report the nodes left out of a query to all nodes, like nodes skipped due to an open circuit
+        node_post_requests.update(
+            {
+                node_url: util.skip_unreachable_node_request()
+                for node_url in util.get_skipped_node_urls()
+            }
+        )
+    if path == "datasets":
+        session_key = get_query_session_key(query, token)
+        return {
+            node_url: record_node_datasets(node_url, request, session_key)
+            for node_url, request in node_post_requests.items()
+        }
+    return node_post_requests
+
+
+@coalesce_identical_queries(path="query")
 async def get(
     query: dict,
     token: str | None = None,
+    time_budget: float | None = None,
 ) -> dict:
     """
     Makes GET requests to one or more Neurobagel node APIs where the parameters are Neurobagel query parameters.
@@ -89,6 +618,9 @@ async def get(
         Dictionary of Neurobagel query parameters, including a node_url list.
     token : str, optional
         ID token for authentication, by default None
+    time_budget : float, optional
+        Time budget in seconds for the federated query, by default None (uses the server-wide default).
+        Nodes that have not responded when the budget is used up are reported as timed out.
 
     Returns
     -------
@@ -99,22 +631,48 @@ async def get(
     cross_node_results = []
     node_errors = []
 
+    # Keep the node index as it is when the query starts, in case it is updated while the query is in progress
+    federation_nodes = util.FEDERATION_NODES
+    deadline = util.calculate_deadline(time_budget)
+    skipped_node_urls = (
+        []
+        if any(query.get("node_url") or [])
+        else util.get_skipped_node_urls()
+    )
     node_urls = util.validate_query_node_url_list(query.get("node_url"))
 
     query.pop("node_url", None)
+    nodes_to_query = plan_node_requests(node_urls, query)
+    metrics.FEDERATION_FANOUT.observe(len(nodes_to_query), "query")
 
-    tasks = [
-        util.send_request(
-            method="GET", url=node_request_url, params=query, token=token
+    node_requests = {
+        node_url: (
+            util.send_request(
+                method="GET",
+                url=node_request_url,
+                params=query,
+                token=token,
+                node_url=node_url,
+                deadline=deadline,
+            )
+            if node_url in nodes_to_query
+            else skip_node_request()
         )
-        for node_request_url in build_node_request_urls(node_urls, "query")
-    ]
-    responses = await asyncio.gather(*tasks, return_exceptions=True)
+        for node_url, node_request_url in zip(
+            node_urls, build_node_request_urls(node_urls, "query")
+        )
+    }
+    # Report the nodes left out of a query to all nodes, like nodes skipped due to an open circuit
+    for node_url in skipped_node_urls:
+        node_requests[node_url] = util.skip_unreachable_node_request()
+    node_urls = list(node_requests)
+    responses = await send_node_requests(node_requests, deadline=deadline)
 
     cross_node_results, node_errors = gather_node_query_responses(
         node_urls=node_urls,
         responses=responses,
         response_cls=models.CohortQueryResponse,
+        federation_nodes=federation_nodes,
     )
 
     return build_combined_response(
@@ -124,11 +682,13 @@ async def get(
     )
 
 
+@coalesce_identical_queries(path="subjects")
 async def post_subjects(
     # We accept a dict instead of a Pydantic model to make it more flexible to inspect
     # and modify the node list as a list of dictionaries (rather than NodeDatasets model instances)
     query: dict,
     token: str | None = None,
+    time_budget: float | None = None,
 ) -> dict:
     """
     Makes POST requests to the /subjects route of one or more Neurobagel node APIs.
@@ -140,6 +700,9 @@ async def post_subjects(
         including a "nodes" list of dictionaries of node URLs and specific dataset UUIDs.
     token : str, optional
         ID token for authentication, by default None
+    time_budget : float, optional
+        Time budget in seconds for the federated query, by default None (uses the server-wide default).
+        Nodes that have not responded when the budget is used up are reported as timed out.
 
     Returns
     -------
@@ -147,45 +710,73 @@ async def post_subjects(
         A combined response containing all nodes' responses and errors.
 
     """
-    # NOTE: The 'nodes' field in a single request can only be ALL dicts
-    # Normalize trailing slashes in specified node URLs for downstream requests
-    nodes_filter = util.validate_and_format_queried_nodes(query.get("nodes"))
-    node_urls = [node["node_url"] for node in nodes_filter]
-
-    node_requests = util.build_node_requests_for_query(
-        path="subjects",
-        nodes_filter=nodes_filter,
-        query=query,
+    federation_nodes = util.FEDERATION_NODES
+    deadline = util.calculate_deadline(time_budget)
+    node_requests = build_node_post_requests(
+        path="subjects", query=query, token=token, deadline=deadline
     )
-
-    tasks = []
-    for request_url, request_body in node_requests.items():
-        tasks.append(
-            util.send_request(
-                method="POST",
-                url=request_url,
-                body=request_body,
-                token=token,
-            )
-        )
-    responses = await asyncio.gather(*tasks, return_exceptions=True)
+    responses = await send_node_requests(node_requests, deadline=deadline)
 
     cross_node_results, node_errors = gather_node_query_responses(
-        node_urls=node_urls,
+        node_urls=list(node_requests),
         responses=responses,
         response_cls=models.SubjectsQueryResponse,
+        federation_nodes=federation_nodes,
     )
 
     return build_combined_response(
-        total_nodes=len(nodes_filter),
+        total_nodes=len(node_requests),
         cross_node_results=cross_node_results,
         node_errors=node_errors,
     )
 
 
+def stream_subjects(
+    query: dict,
+    token: str | None = None,
+    time_budget: float | None = None,
+) -> AsyncIterator[dict]:
+    """
+    Makes POST requests to the /subjects route of one or more Neurobagel node APIs,
+    and returns an iterator over the results of each node in the order that the nodes respond.
+
+    The queried nodes are validated before the iterator is returned, so that invalid queries fail
+    before any results are streamed.
+    See stream_node_query_responses for the format of the yielded events.
+
+    Parameters
+    ----------
+    query : dict
+        Dictionary of Neurobagel query parameters,
+        including a "nodes" list of dictionaries of node URLs and specific dataset UUIDs.
+    token : str, optional
+        ID token for authentication, by default None
+    time_budget : float, optional
+        Time budget in seconds for the federated query, by default None (uses the server-wide default).
+        Nodes that have not responded when the budget is used up are reported as timed out.
+
+    Returns
+    -------
+    AsyncIterator[dict]
+        Iterator over the result events of each matching dataset, followed by a summary event.
+    """
+    deadline = util.calculate_deadline(time_budget)
+    node_requests = build_node_post_requests(
+        path="subjects", query=query, token=token, deadline=deadline
+    )
+    return stream_node_query_responses(
+        node_requests=node_requests,
+        response_cls=models.SubjectsQueryResponse,
+        deadline=deadline,
+        federation_nodes=util.FEDERATION_NODES,
+    )
+
+
+@coalesce_identical_queries(path="datasets")
 async def post_datasets(
     query: dict,
     token: str | None = None,
+    time_budget: float | None = None,
 ) -> dict:
     """
     Makes POST requests to the /datasets route of one or more Neurobagel node APIs.
@@ -197,6 +788,9 @@ async def post_datasets(
         including a "nodes" list of dictionaries of node URLs.
     token : str, optional
         ID token for authentication, by default None
+    time_budget : float, optional
+        Time budget in seconds for the federated query, by default None (uses the server-wide default).
+        Nodes that have not responded when the budget is used up are reported as timed out.
 
     Returns
     -------
@@ -204,44 +798,121 @@ async def post_datasets(
         A combined response containing all nodes' responses and errors.
 
     """
-    nodes_filter = util.validate_and_format_queried_nodes(query.get("nodes"))
-    node_urls = [node["node_url"] for node in nodes_filter]
-
-    query.pop("nodes", None)
-
-    node_requests = util.build_node_requests_for_query(
-        path="datasets",
-        nodes_filter=nodes_filter,
-        query=query,
+    federation_nodes = util.FEDERATION_NODES
+    deadline = util.calculate_deadline(time_budget)
+    node_requests = build_node_post_requests(
+        path="datasets", query=query, token=token, deadline=deadline
     )
-
-    tasks = []
-    for request_url, request_body in node_requests.items():
-        tasks.append(
-            util.send_request(
-                method="POST",
-                url=request_url,
-                body=request_body,
-                token=token,
-            )
-        )
-
-    responses = await asyncio.gather(*tasks, return_exceptions=True)
+    responses = await send_node_requests(node_requests, deadline=deadline)
 
     cross_node_results, node_errors = gather_node_query_responses(
-        node_urls=node_urls,
+        node_urls=list(node_requests),
         responses=responses,
         response_cls=models.DatasetsQueryResponse,
+        federation_nodes=federation_nodes,
     )
 
     return build_combined_response(
-        total_nodes=len(node_urls),
+        total_nodes=len(node_requests),
         cross_node_results=cross_node_results,
         node_errors=node_errors,
     )
 
 
+def stream_datasets(
+    query: dict,
+    token: str | None = None,
+    time_budget: float | None = None,
+) -> AsyncIterator[dict]:
+    """
+    Makes POST requests to the /datasets route of one or more Neurobagel node APIs,
+    and returns an iterator over the results of each node in the order that the nodes respond.
+
+    The queried nodes are validated before the iterator is returned, so that invalid queries fail
+    before any results are streamed.
+    See stream_node_query_responses for the format of the yielded events.
+
+    Parameters
+    ----------
+    query : dict
+        Dictionary of Neurobagel query parameters,
+        including a "nodes" list of dictionaries of node URLs.
+    token : str, optional
+        ID token for authentication, by default None
+    time_budget : float, optional
+        Time budget in seconds for the federated query, by default None (uses the server-wide default).
+        Nodes that have not responded when the budget is used up are reported as timed out.
+
+    Returns
+    -------
+    AsyncIterator[dict]
+        Iterator over the result events of each matching dataset, followed by a summary event.
+    """
+    deadline = util.calculate_deadline(time_budget)
+    node_requests = build_node_post_requests(
+        path="datasets", query=query, token=token, deadline=deadline
+    )
+    return stream_node_query_responses(
+        node_requests=node_requests,
+        response_cls=models.DatasetsQueryResponse,
+        deadline=deadline,
+        federation_nodes=util.FEDERATION_NODES,
+    )
+
+
+def get_vocabulary_cache_ttl(response: dict) -> float:
+    """
+    Return the time for which a combined vocabulary response should be cached, based on how many nodes responded.
+    Responses where all nodes failed are not cached (a TTL of 0),
+    although a stale cached response is then kept for the error TTL (see TTLCache).
+    """
+    if response["nodes_response_status"] == "fail":
+        return 0
+    if response["errors"]:
+        return min(
+            util.VOCAB_CACHE_ERROR_TTL.value, util.VOCAB_CACHE_TTL.value
+        )
+    return util.VOCAB_CACHE_TTL.value
+
+
 async def get_instances(attribute_path: str) -> dict:
+    """
+    Return all the available instances of the specified attribute across all available Neurobagel n-APIs,
+    from the vocabulary cache if possible (see fetch_instances).
+    A stale cached vocabulary is returned immediately, while it is refreshed in the background.
+
+    Parameters
+    ----------
+    attribute_path : str
+        Path corresponding to a specific Neurobagel class for which all the available instances should be retrieved, e.g., "assessments"
+
+    Returns
+    -------
+    dict
+        Dictionary where the key is the Neurobagel class and values correspond to all the unique terms representing available (i.e. used) instances of that class.
+    """
+    if util.VOCAB_CACHE_TTL.value <= 0:
+        return await fetch_instances(attribute_path)
+
+    return await VOCABULARY_CACHE.get_or_fetch(
+        attribute_path,
+        lambda: refresh_instances(attribute_path),
+        get_ttl=get_vocabulary_cache_ttl,
+    )
+
+
+async def refresh_instances(attribute_path: str) -> dict:
+    """
+    Fetch all the available instances of the specified attribute for the vocabulary cache.
+    When the pipelines vocabulary is refreshed, the cached pipeline versions are invalidated along with it.
+    """
+    response = await fetch_instances(attribute_path)
+    if attribute_path == "pipelines":
+        await PIPELINE_VERSIONS_CACHE.clear_shared()
+    return response
+
+
+async def fetch_instances(attribute_path: str) -> dict:
     """
     Makes a GET request to the root subpath of the specified attribute router of all available Neurobagel n-APIs.
 
@@ -263,17 +934,26 @@ async def get_instances(attribute_path: str) -> dict:
     # so we define it locally based on the requested attribute path.
     attribute_uri = util.RESOURCE_URI_MAP[attribute_path]
 
+    federation_nodes = util.FEDERATION_NODES
+    node_urls = list(federation_nodes)
+    skipped_node_urls = util.get_skipped_node_urls()
+
     tasks = [
-        util.send_request(method="GET", url=node_request_url)
-        for node_request_url in build_node_request_urls(
-            util.FEDERATION_NODES, attribute_path
+        (
+            util.skip_unreachable_node_request()
+            if node_url in skipped_node_urls
+            else util.send_request(
+                method="GET", url=node_request_url, node_url=node_url
+            )
+        )
+        for node_url, node_request_url in zip(
+            node_urls, build_node_request_urls(node_urls, attribute_path)
         )
     ]
     responses = await asyncio.gather(*tasks, return_exceptions=True)
 
-    for (node_url, node_name), response in zip(
-        util.FEDERATION_NODES.items(), responses
-    ):
+    for node_url, response in zip(node_urls, responses):
+        node_name = federation_nodes[node_url]
         is_response_valid, node_error = util.is_valid_dict_response(
             response=response, find_key=attribute_uri
         )
@@ -284,6 +964,14 @@ async def get_instances(attribute_path: str) -> dict:
             # only the last instance (+ term metadata) received from the nodes will be included in the response.
             for term_dict in response.get(attribute_uri):
                 unique_terms_dict[term_dict["TermURL"]] = term_dict
+            NODE_VOCABULARY_INDEX.update_terms(
+                node_url,
+                attribute_path,
+                [
+                    term_dict["TermURL"]
+                    for term_dict in response.get(attribute_uri)
+                ],
+            )
         else:
             node_errors.append({"node_name": node_name, "error": node_error})
             logger.warning(
@@ -291,15 +979,57 @@ async def get_instances(attribute_path: str) -> dict:
             )
 
     cross_node_results = {attribute_uri: list(unique_terms_dict.values())}
+    await share_node_vocabulary_index()
 
     return build_combined_response(
-        total_nodes=len(util.FEDERATION_NODES),
+        total_nodes=len(node_urls),
         cross_node_results=cross_node_results,
         node_errors=node_errors,
     )
 
 
+def get_pipeline_versions_cache_ttl(response: dict) -> float:
+    """
+    Return the time for which a combined pipeline versions response should be cached.
+    Responses where no node has any versions of the pipeline are cached for the negative TTL.
+    """
+    ttl = get_vocabulary_cache_ttl(response)
+    if (
+        ttl > 0
+        and not response["errors"]
+        and not any(response["responses"].values())
+    ):
+        return min(util.PIPELINE_VERSIONS_NEGATIVE_CACHE_TTL.value, ttl)
+    return ttl
+
+
 async def get_pipeline_versions(pipeline_term: str) -> dict:
+    """
+    Return the available versions of a specified pipeline across all available node APIs,
+    from the pipeline versions cache if possible (see fetch_pipeline_versions).
+    A stale cached response is returned immediately, while it is refreshed in the background.
+
+    Parameters
+    ----------
+    pipeline_term : str
+        Controlled term of pipeline for which all the available terms should be retrieved.
+
+    Returns
+    -------
+    dict
+        Dictionary where the key is the pipeline term and the value is the list of unique available (i.e. used) versions of the pipeline.
+    """
+    if util.VOCAB_CACHE_TTL.value <= 0:
+        return await fetch_pipeline_versions(pipeline_term)
+
+    return await PIPELINE_VERSIONS_CACHE.get_or_fetch(
+        pipeline_term,
+        lambda: fetch_pipeline_versions(pipeline_term),
+        get_ttl=get_pipeline_versions_cache_ttl,
+    )
+
+
+async def fetch_pipeline_versions(pipeline_term: str) -> dict:
     """
     Make a GET request to all available node APIs for available versions of a specified pipeline.
 
@@ -316,23 +1046,38 @@ async def get_pipeline_versions(pipeline_term: str) -> dict:
     node_errors = []
     all_pipe_versions = []
 
+    federation_nodes = util.FEDERATION_NODES
+    node_urls = list(federation_nodes)
+    skipped_node_urls = util.get_skipped_node_urls()
+
     # TODO: Consider refactoring out coroutine list definition
     tasks = [
-        util.send_request(method="GET", url=node_request_url)
-        for node_request_url in build_node_request_urls(
-            util.FEDERATION_NODES, f"pipelines/{pipeline_term}/versions"
+        (
+            util.skip_unreachable_node_request()
+            if node_url in skipped_node_urls
+            else util.send_request(
+                method="GET", url=node_request_url, node_url=node_url
+            )
+        )
+        for node_url, node_request_url in zip(
+            node_urls,
+            build_node_request_urls(
+                node_urls, f"pipelines/{pipeline_term}/versions"
+            ),
         )
     ]
     responses = await asyncio.gather(*tasks, return_exceptions=True)
 
-    for (node_url, node_name), response in zip(
-        util.FEDERATION_NODES.items(), responses
-    ):
+    for node_url, response in zip(node_urls, responses):
+        node_name = federation_nodes[node_url]
         response_valid, node_error = util.is_valid_dict_response(
             response=response, find_key=pipeline_term
         )
         if response_valid:
             all_pipe_versions.extend(response.get(pipeline_term))
+            NODE_VOCABULARY_INDEX.update_pipeline_versions(
+                node_url, pipeline_term, response.get(pipeline_term)
+            )
         else:
             node_errors.append({"node_name": node_name, "error": node_error})
             logger.warning(
@@ -340,9 +1085,258 @@ async def get_pipeline_versions(pipeline_term: str) -> dict:
             )
 
     cross_node_results = {pipeline_term: sorted(list(set(all_pipe_versions)))}
+    await share_node_vocabulary_index()
 
     return build_combined_response(
-        total_nodes=len(util.FEDERATION_NODES),
+        total_nodes=len(node_urls),
         cross_node_results=cross_node_results,
         node_errors=node_errors,
     )
+
+
+async def fetch_node_vocabularies(
+    node_url: str, is_skipped: bool = False
+) -> tuple[dict, dict]:
+    """
+    Concurrently request all attribute vocabularies from a single node, followed by (concurrently)
+    the available versions of each pipeline in the node's pipelines vocabulary.
+
+    Parameters
+    ----------
+    node_url : str
+        URL of the node.
+    is_skipped : bool, optional
+        Whether the node is skipped because it was unreachable at the last health check,
+        in which case an error is returned for each attribute without sending any request, by default False.
+
+    Returns
+    -------
+    tuple[dict, dict]
+        The node's response (or raised exception) for each attribute, in the form of {attribute_path: response, ...},
+        and for the versions of each of its pipelines, in the form of {pipeline_term: response, ...}.
+    """
+    attribute_paths = list(util.RESOURCE_URI_MAP)
+    if is_skipped:
+        unreachable_node_error = util.build_unreachable_node_error()
+        return {
+            attribute_path: unreachable_node_error
+            for attribute_path in attribute_paths
+        }, {}
+    attribute_responses = await asyncio.gather(
+        *(
+            util.send_request(
+                method="GET", url=node_url + attribute_path, node_url=node_url
+            )
+            for attribute_path in attribute_paths
+        ),
+        return_exceptions=True,
+    )
+    attribute_responses = dict(zip(attribute_paths, attribute_responses))
+
+    pipeline_terms = []
+    pipelines_response = attribute_responses["pipelines"]
+    is_response_valid, _ = util.is_valid_dict_response(
+        response=pipelines_response,
+        find_key=util.RESOURCE_URI_MAP["pipelines"],
+    )
+    if is_response_valid:
+        pipeline_terms = [
+            term_dict["TermURL"]
+            for term_dict in pipelines_response.get(
+                util.RESOURCE_URI_MAP["pipelines"]
+            )
+        ]
+    versions_responses = await asyncio.gather(
+        *(
+            util.send_request(
+                method="GET",
+                url=node_url + f"pipelines/{pipeline_term}/versions",
+                node_url=node_url,
+            )
+            for pipeline_term in pipeline_terms
+        ),
+        return_exceptions=True,
+    )
+
+    return attribute_responses, dict(zip(pipeline_terms, versions_responses))
+
+
+async def get_vocabularies() -> dict:
+    """
+    Return all attribute vocabularies and the available versions of every pipeline across all available nodes
+    in a single combined response, from the vocabulary cache if possible (see fetch_vocabularies).
+    """
+    if util.VOCAB_CACHE_TTL.value <= 0:
+        return await fetch_vocabularies()
+
+    return await VOCABULARY_CACHE.get_or_fetch(
+        "vocabularies",
+        fetch_vocabularies,
+        get_ttl=get_vocabulary_cache_ttl,
+    )
+
+
+async def fetch_vocabularies() -> dict:
+    """
+    Fetch all attribute vocabularies and the available versions of every pipeline from all available nodes,
+    in one concurrent pass over the nodes (see fetch_node_vocabularies).
+
+    Terms are deduplicated by TermURL as in fetch_instances, and the combined response for each attribute
+    and pipeline is also stored in the vocabulary and pipeline versions caches.
+
+    Returns
+    -------
+    dict
+        Combined response where "responses" contains the unique terms of each attribute, keyed by the attribute URI,
+        and the versions of each pipeline under "pipeline_versions", in the form of {pipeline_term: [version, ...], ...}.
+        "errors" contains at most one error per node, combining the errors of all of the node's failed requests.
+    """
+    federation_nodes = util.FEDERATION_NODES
+    node_urls = list(federation_nodes)
+    skipped_node_urls = util.get_skipped_node_urls()
+    node_responses = await asyncio.gather(
+        *(
+            fetch_node_vocabularies(
+                node_url, is_skipped=node_url in skipped_node_urls
+            )
+            for node_url in node_urls
+        )
+    )
+
+    # In the form of {attribute_path: {term_url: term_dict, ...}, ...}
+    unique_terms = {
+        attribute_path: {} for attribute_path in util.RESOURCE_URI_MAP
+    }
+    attribute_node_errors = {
+        attribute_path: [] for attribute_path in util.RESOURCE_URI_MAP
+    }
+    # In the form of {pipeline_term: {version, ...}, ...}
+    pipeline_versions = {}
+    pipeline_versions_node_errors = {}
+    # Nodes whose pipelines vocabulary could not be fetched may have versions of any pipeline
+    pipelines_failed_node_errors = []
+    node_errors = []
+
+    for node_url, (attribute_responses, versions_responses) in zip(
+        node_urls, node_responses
+    ):
+        node_name = federation_nodes[node_url]
+        node_error_messages = []
+
+        for attribute_path, response in attribute_responses.items():
+            attribute_uri = util.RESOURCE_URI_MAP[attribute_path]
+            is_response_valid, node_error = util.is_valid_dict_response(
+                response=response, find_key=attribute_uri
+            )
+            if is_response_valid:
+                for term_dict in response.get(attribute_uri):
+                    unique_terms[attribute_path][
+                        term_dict["TermURL"]
+                    ] = term_dict
+                NODE_VOCABULARY_INDEX.update_terms(
+                    node_url,
+                    attribute_path,
+                    [
+                        term_dict["TermURL"]
+                        for term_dict in response.get(attribute_uri)
+                    ],
+                )
+            else:
+                attribute_node_error = {
+                    "node_name": node_name,
+                    "error": node_error,
+                }
+                attribute_node_errors[attribute_path].append(
+                    attribute_node_error
+                )
+                if attribute_path == "pipelines":
+                    pipelines_failed_node_errors.append(attribute_node_error)
+                node_error_messages.append(f"/{attribute_path}: {node_error}")
+
+        for pipeline_term, response in versions_responses.items():
+            pipeline_versions.setdefault(pipeline_term, set())
+            is_response_valid, node_error = util.is_valid_dict_response(
+                response=response, find_key=pipeline_term
+            )
+            if is_response_valid:
+                pipeline_versions[pipeline_term].update(
+                    response.get(pipeline_term)
+                )
+                NODE_VOCABULARY_INDEX.update_pipeline_versions(
+                    node_url, pipeline_term, response.get(pipeline_term)
+                )
+            else:
+                pipeline_versions_node_errors.setdefault(
+                    pipeline_term, []
+                ).append({"node_name": node_name, "error": node_error})
+                node_error_messages.append(
+                    f"/pipelines/{pipeline_term}/versions: {node_error}"
+                )
+
+        if node_url in skipped_node_urls:
+            node_error = util.build_unreachable_node_error().detail
+            node_errors.append({"node_name": node_name, "error": node_error})
+        elif node_error_messages:
+            node_error = "; ".join(node_error_messages)
+            node_errors.append({"node_name": node_name, "error": node_error})
+            logger.warning(
+                f"Requests to node {node_name} ({node_url}) did not all succeed: {node_error}"
+            )
+
+    for attribute_path, attribute_uri in util.RESOURCE_URI_MAP.items():
+        await set_cached_response(
+            VOCABULARY_CACHE,
+            attribute_path,
+            build_combined_response(
+                total_nodes=len(node_urls),
+                cross_node_results={
+                    attribute_uri: list(unique_terms[attribute_path].values())
+                },
+                node_errors=attribute_node_errors[attribute_path],
+                is_summary_logged=False,
+            ),
+            get_ttl=get_vocabulary_cache_ttl,
+        )
+    await share_node_vocabulary_index()
+    # The versions cached before this refresh of the pipelines vocabulary may be outdated
+    await PIPELINE_VERSIONS_CACHE.clear_shared()
+    for pipeline_term, versions in pipeline_versions.items():
+        await set_cached_response(
+            PIPELINE_VERSIONS_CACHE,
+            pipeline_term,
+            build_combined_response(
+                total_nodes=len(node_urls),
+                cross_node_results={pipeline_term: sorted(versions)},
+                node_errors=pipelines_failed_node_errors
+                + pipeline_versions_node_errors.get(pipeline_term, []),
+                is_summary_logged=False,
+            ),
+            get_ttl=get_pipeline_versions_cache_ttl,
+        )
+
+    cross_node_results = {
+        attribute_uri: list(unique_terms[attribute_path].values())
+        for attribute_path, attribute_uri in util.RESOURCE_URI_MAP.items()
+    }
+    cross_node_results["pipeline_versions"] = {
+        pipeline_term: sorted(versions)
+        for pipeline_term, versions in pipeline_versions.items()
+    }
+
+    return build_combined_response(
+        total_nodes=len(node_urls),
+        cross_node_results=cross_node_results,
+        node_errors=node_errors,
+    )
+
+
+async def set_cached_response(
+    cache: TTLCache, key: str, response: dict, get_ttl: Callable
+):
+    """
+    Cache a combined response for the TTL returned by get_ttl, unless the TTL is <= 0 or caching is disabled,
+    including for the other worker processes of the API (if the cache is shared).
+    """
+    ttl = get_ttl(response)
+    if util.VOCAB_CACHE_TTL.value > 0 and ttl > 0:
+        await cache.set_and_share(key, response, ttl=ttl)
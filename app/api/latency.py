@@ -0,0 +1,117 @@
+"""Tracking of node response latencies, used to set adaptive per-node request timeouts."""
+
+import math
+from collections import deque
+
+
+def calculate_percentile(
+    sorted_values: list[float], percentile: float
+) -> float:
+    """Return the given percentile (0-100) of a list of sorted values, using the nearest-rank method."""
+    rank = math.ceil(percentile / 100 * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+class LatencyTracker:
+    """
+    Keeps a rolling window of the most recent response latencies (in seconds) for each node and request path,
+    and derives a request timeout for each node and path from the observed tail latency.
+
+    Requests that time out are recorded as latencies at their timeout (a lower bound of their actual latency),
+    and double the timeout of the node and path until responses are received again, so that the timeout
+    backs off for slow (but healthy) nodes rather than staying below their actual latency.
+
+    Parameters
+    ----------
+    window_size : int
+        Maximum number of recent latencies kept per node and path.
+    min_samples : int
+        Minimum number of latencies that must be observed for a node and path before an adaptive timeout is used.
+    timeout_multiplier : float
+        Multiple of the observed p99 latency used as the timeout.
+    min_timeout : float
+        Lower bound on the timeout, in seconds.
+    max_timeout : float
+        Upper bound on the timeout, in seconds.
+    default_timeout : float
+        Timeout used (along with any backoff after timeouts) until enough latencies have been observed, in seconds.
+    """
+
+    def __init__(
+        self,
+        window_size: int,
+        min_samples: int,
+        timeout_multiplier: float,
+        min_timeout: float,
+        max_timeout: float,
+        default_timeout: float,
+    ):
+        self.window_size = window_size
+        self.min_samples = min_samples
+        self.timeout_multiplier = timeout_multiplier
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.default_timeout = default_timeout
+        # In the form of {(node_url, path): deque([latency, ...]), ...}
+        self._latencies = {}
+        # Factor by which the timeout of a node and path is multiplied after timeouts,
+        # in the form of {(node_url, path): factor, ...}
+        self._backoffs = {}
+
+    def _add_sample(self, key: tuple, latency: float):
+        if key not in self._latencies:
+            self._latencies[key] = deque(maxlen=self.window_size)
+        self._latencies[key].append(latency)
+
+    def record(self, node_url: str, path: str, latency: float):
+        """
+        Record the latency of a response from a node to a request to a given path,
+        halving any backoff of the timeout of the node and path.
+        """
+        key = (node_url, path)
+        self._add_sample(key, latency)
+        backoff = self._backoffs.get(key)
+        if backoff is not None:
+            if backoff > 2:
+                self._backoffs[key] = backoff / 2
+            else:
+                del self._backoffs[key]
+
+    def record_timeout(self, node_url: str, path: str, timeout: float):
+        """
+        Record a request to a given path of a node that timed out after the given timeout,
+        as a latency of at least the timeout, and double the timeout of the node and path.
+        """
+        key = (node_url, path)
+        self._add_sample(key, timeout)
+        self._backoffs[key] = self._backoffs.get(key, 1) * 2
+
+    def get_timeout(self, node_url: str, path: str) -> float:
+        """
+        Return the timeout for a request to a given path of a node, as a multiple of the observed p99 latency
+        (multiplied by any backoff after timeouts) bounded by the configured minimum and maximum timeouts.
+        Until enough latencies have been observed for the node and path, the default timeout is used instead of the multiple of the p99 latency.
+        """
+        key = (node_url, path)
+        latencies = self._latencies.get(key)
+        if latencies is None or len(latencies) < self.min_samples:
+            base_timeout = self.default_timeout
+        else:
+            base_timeout = max(
+                calculate_percentile(sorted(latencies), 99)
+                * self.timeout_multiplier,
+                self.min_timeout,
+            )
+        return min(base_timeout * self._backoffs.get(key, 1), self.max_timeout)
+
+    def remove_node(self, node_url: str):
+        """Remove the recorded latencies and timeout backoffs of a node, for all request paths."""
+        for key in [key for key in self._latencies if key[0] == node_url]:
+            del self._latencies[key]
+        for key in [key for key in self._backoffs if key[0] == node_url]:
+            del self._backoffs[key]
+
+    def clear(self):
+        """Remove all recorded latencies and timeout backoffs."""
+        self._latencies.clear()
+        self._backoffs.clear()
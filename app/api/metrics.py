@@ -0,0 +1,368 @@
+"""
+In-process metrics of the API and its requests to nodes, exposed in the Prometheus text exposition format.
+
+Metrics are recorded per worker process. With multiple worker processes (see app.server), each worker publishes
+a snapshot of its metrics to the shared store (see snapshot_metrics), and the snapshots of all workers are merged
+when the metrics are rendered, so that every scrape of the /metrics endpoint reports the metrics of the whole API.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Callable
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds of the histogram buckets for durations in seconds and payload sizes in bytes
+DURATION_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+# Stores all registered metrics, in the order in which they are exposed
+METRICS = []
+
+
+def format_labels(label_names: tuple, label_values: tuple) -> str:
+    """Return the labels of a sample in the exposition format, e.g. '{node="Node 1",path="/query"}'."""
+    if not label_names:
+        return ""
+    labels = ",".join(
+        f'{name}="{_escape_label_value(value)}"'
+        for name, value in zip(label_names, label_values)
+    )
+    return f"{{{labels}}}"
+
+
+def _escape_label_value(value) -> str:
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return (
+        repr(float(value))
+        if not float(value).is_integer()
+        else str(int(value))
+    )
+
+
+class Metric:
+    """
+    Base class of a metric, identified by its name and the names of its labels, which is registered for exposition on creation.
+    Samples are stored by label values, which must be given in the same order as the label names.
+    """
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        METRICS.append(self)
+
+    def render(self, samples: dict | None = None) -> list[str]:
+        """Return the lines of the metric in the exposition format, for the given samples (by default, the current samples)."""
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+            *self.render_samples(
+                self.get_samples() if samples is None else samples
+            ),
+        ]
+
+    def get_samples(self) -> dict:
+        """Return the current samples, in the form of {label_values: value, ...}."""
+        raise NotImplementedError
+
+    def merge_samples(self, samples_list: list[dict]) -> dict:
+        """Merge the samples of the metric recorded in several processes, by summing the values of each label values."""
+        merged_samples = {}
+        for samples in samples_list:
+            for label_values, value in samples.items():
+                merged_samples[label_values] = (
+                    merged_samples.get(label_values, 0) + value
+                )
+        return merged_samples
+
+    def render_samples(self, samples: dict) -> list[str]:
+        return [
+            f"{self.name}{format_labels(self.label_names, label_values)} {_format_value(value)}"
+            for label_values, value in samples.items()
+        ]
+
+    def clear(self):
+        """Remove all recorded samples."""
+
+
+class Counter(Metric):
+    """Monotonically increasing count, e.g. of requests."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = ()):
+        super().__init__(name, documentation, label_names)
+        # In the form of {label_values: count, ...}
+        self._values = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        """Increase the count for the given label values."""
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def get(self, *label_values) -> float:
+        """Return the count for the given label values."""
+        return self._values.get(label_values, 0)
+
+    def get_samples(self) -> dict:
+        return dict(self._values)
+
+    def clear(self):
+        self._values.clear()
+
+
+class Gauge(Metric):
+    """
+    Value that can go up and down, e.g. the number of requests in flight.
+    The values are collected when the metric is rendered, by calling the collect function.
+
+    Parameters
+    ----------
+    collect : Callable[[], dict]
+        Function returning the current values, in the form of {label_values: value, ...}.
+    is_summed : bool, optional
+        Whether the values recorded in several processes are summed (e.g., requests in flight),
+        rather than taking the highest value (e.g., for values that are the same in every process), by default True.
+    """
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        collect: Callable[[], dict],
+        label_names: tuple = (),
+        is_summed: bool = True,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.collect = collect
+        self.is_summed = is_summed
+
+    def get_samples(self) -> dict:
+        return self.collect()
+
+    def merge_samples(self, samples_list: list[dict]) -> dict:
+        if self.is_summed:
+            return super().merge_samples(samples_list)
+        merged_samples = {}
+        for samples in samples_list:
+            for label_values, value in samples.items():
+                merged_samples[label_values] = max(
+                    merged_samples.get(label_values, value), value
+                )
+        return merged_samples
+
+
+class Histogram(Metric):
+    """Distribution of observed values (e.g., request latencies) over a fixed set of buckets."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple = (),
+        buckets: tuple = DURATION_BUCKETS,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # In the form of {label_values: [count_per_bucket, ..., count_above_last_bucket, sum], ...}
+        self._values = {}
+
+    def observe(self, value: float, *label_values):
+        """Record an observed value for the given label values."""
+        counts = self._values.get(label_values)
+        if counts is None:
+            counts = self._values[label_values] = [0] * (len(self.buckets) + 2)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def get_count(self, *label_values) -> int:
+        """Return the number of observed values for the given label values."""
+        counts = self._values.get(label_values)
+        return 0 if counts is None else sum(counts[:-1])
+
+    def get_samples(self) -> dict:
+        return {
+            label_values: list(counts)
+            for label_values, counts in self._values.items()
+        }
+
+    def merge_samples(self, samples_list: list[dict]) -> dict:
+        merged_samples = {}
+        for samples in samples_list:
+            for label_values, counts in samples.items():
+                merged_counts = merged_samples.get(label_values)
+                merged_samples[label_values] = (
+                    list(counts)
+                    if merged_counts is None
+                    else [
+                        merged_count + count
+                        for merged_count, count in zip(merged_counts, counts)
+                    ]
+                )
+        return merged_samples
+
+    def render_samples(self, samples: dict) -> list[str]:
+        label_names = (*self.label_names, "le")
+        lines = []
+        for label_values, counts in samples.items():
+            cumulative_count = 0
+            for upper_bound, count in zip(
+                (*self.buckets, float("inf")), counts[:-1]
+            ):
+                cumulative_count += count
+                lines.append(
+                    f"{self.name}_bucket{format_labels(label_names, (*label_values, _format_value(upper_bound)))} "
+                    f"{cumulative_count}"
+                )
+            labels = format_labels(self.label_names, label_values)
+            lines.append(
+                f"{self.name}_sum{labels} {_format_value(counts[-1])}"
+            )
+            lines.append(f"{self.name}_count{labels} {cumulative_count}")
+        return lines
+
+    def clear(self):
+        self._values.clear()
+
+
+def snapshot_metrics() -> dict:
+    """
+    Return the current samples of all registered metrics in a JSON-serializable form
+    (e.g., to share them with other processes), in the form of {metric_name: [[[label_value, ...], value], ...], ...}.
+    """
+    return {
+        metric.name: [
+            [list(label_values), value]
+            for label_values, value in metric.get_samples().items()
+        ]
+        for metric in METRICS
+    }
+
+
+def render_metrics(snapshots: list[dict] | None = None) -> str:
+    """
+    Return all registered metrics in the exposition format, either with their current samples
+    or with the samples of the given snapshots merged together (see snapshot_metrics).
+    """
+    lines = []
+    for metric in METRICS:
+        if snapshots is None:
+            lines.extend(metric.render())
+        else:
+            lines.extend(
+                metric.render(
+                    metric.merge_samples(
+                        [
+                            {
+                                tuple(label_values): value
+                                for label_values, value in snapshot.get(
+                                    metric.name, []
+                                )
+                            }
+                            for snapshot in snapshots
+                        ]
+                    )
+                )
+            )
+    return "\n".join(lines) + "\n"
+
+
+def clear_metrics():
+    """Remove all samples recorded by the registered metrics."""
+    for metric in METRICS:
+        metric.clear()
+
+
+NODE_REQUEST_DURATION = Histogram(
+    "nb_fapi_node_request_duration_seconds",
+    "Duration of requests to nodes that received a response.",
+    label_names=("node", "path"),
+)
+NODE_REQUESTS = Counter(
+    "nb_fapi_node_requests_total",
+    "Requests to nodes by outcome (success, error, timeout or cancelled) and error class.",
+    label_names=("node", "path", "outcome", "error_class"),
+)
+NODE_RESPONSE_SIZE = Histogram(
+    "nb_fapi_node_response_size_bytes",
+    "Size of the response payloads received from nodes.",
+    label_names=("node", "path"),
+    buckets=SIZE_BUCKETS,
+)
+FEDERATION_FANOUT = Histogram(
+    "nb_fapi_federation_fanout_nodes",
+    "Number of nodes sent requests for each federated query (excluding skipped nodes).",
+    label_names=("path",),
+    buckets=COUNT_BUCKETS,
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "nb_fapi_http_request_duration_seconds",
+    "End-to-end duration of requests to the API, by route.",
+    label_names=("route", "method", "status"),
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the end-to-end duration of each HTTP request to the API, including any streamed response body."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        request_start = time.perf_counter()
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - request_start,
+                # Use the path template of the matched route to keep the number of label values bounded
+                getattr(route, "path", "unmatched"),
+                scope["method"],
+                status_code,
+            )
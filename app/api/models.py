@@ -2,7 +2,7 @@
 
 from enum import Enum
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 CONTROLLED_TERM_REGEX = r"^[a-zA-Z]+[:]\S+$"
 
@@ -57,6 +57,20 @@ class SubjectsQueryModel(BaseQueryModel):
     """Data model a for POST /subjects query."""
 
     nodes: list[NodeDatasets] | None = None
+    dataset_uuids: list[str] | None = Field(
+        default=None,
+        description="Specific datasets to query, in whichever nodes they belong to. "
+        "Cannot be combined with nodes.",
+    )
+
+    @model_validator(mode="after")
+    def check_nodes_or_dataset_uuids(self) -> "SubjectsQueryModel":
+        """Ensure that datasets are either specified per node or across nodes, but not both."""
+        if self.nodes is not None and self.dataset_uuids is not None:
+            raise ValueError(
+                "Specify either 'nodes' or 'dataset_uuids', not both."
+            )
+        return self
 
 
 class NodeUrl(BaseModel):
@@ -0,0 +1,232 @@
+"""Planning of federated queries using the vocabulary of each node, to skip nodes that cannot match a query."""
+
+import time
+
+# Query parameters that must be found in a node's vocabulary for the corresponding attribute for the node to match a query
+QUERY_PARAM_ATTRIBUTE_MAP = {
+    "diagnosis": "diagnoses",
+    "assessment": "assessments",
+    "image_modal": "imaging-modalities",
+    "pipeline_name": "pipelines",
+}
+
+# Healthy controls are queried through the diagnosis parameter, but are not part of the nodes' diagnosis vocabularies
+HEALTHY_CONTROL_TERM = "ncit:C94342"
+
+
+class NodeVocabularyIndex:
+    """
+    Keeps the terms found in the vocabulary of each node for each attribute, and the versions of each pipeline
+    found in each node, as last fetched from the nodes.
+
+    Entries older than the maximum age are treated as unknown, so a node is only ruled out of a query
+    based on a recently fetched vocabulary.
+
+    Parameters
+    ----------
+    max_age : float
+        Time in seconds after which an entry is no longer used to rule out nodes.
+    """
+
+    def __init__(self, max_age: float):
+        self.max_age = max_age
+        # In the form of {(node_url, attribute_path): ({term_url, ...}, updated_at), ...}
+        self._terms = {}
+        # In the form of {(node_url, pipeline_term): ({version, ...}, updated_at), ...}
+        self._pipeline_versions = {}
+
+    def update_terms(self, node_url: str, attribute_path: str, terms: list):
+        """Store the term URLs found in the vocabulary of a node for an attribute."""
+        self._terms[(node_url, attribute_path)] = (
+            set(terms),
+            time.monotonic(),
+        )
+
+    def update_pipeline_versions(
+        self, node_url: str, pipeline_term: str, versions: list
+    ):
+        """Store the versions of a pipeline found in a node."""
+        self._pipeline_versions[(node_url, pipeline_term)] = (
+            set(versions),
+            time.monotonic(),
+        )
+
+    def get_terms(self, node_url: str, attribute_path: str) -> set | None:
+        """Return the term URLs in the vocabulary of a node for an attribute, or None if they are unknown or outdated."""
+        return self._get_fresh(self._terms, (node_url, attribute_path))
+
+    def get_pipeline_versions(
+        self, node_url: str, pipeline_term: str
+    ) -> set | None:
+        """Return the versions of a pipeline found in a node, or None if they are unknown or outdated."""
+        return self._get_fresh(
+            self._pipeline_versions, (node_url, pipeline_term)
+        )
+
+    def get_unmatched_params(self, node_url: str, query: dict) -> list[str]:
+        """
+        Return the query parameters whose value is known not to be in the vocabulary of a node,
+        meaning that the node cannot have any matches for the query.
+        An empty list means that the node may match the query.
+        """
+        unmatched_params = []
+        for query_param, attribute_path in QUERY_PARAM_ATTRIBUTE_MAP.items():
+            term = query.get(query_param)
+            if term is None or term == HEALTHY_CONTROL_TERM:
+                continue
+            node_terms = self.get_terms(node_url, attribute_path)
+            if node_terms is not None and term not in node_terms:
+                unmatched_params.append(query_param)
+
+        pipeline_name = query.get("pipeline_name")
+        pipeline_version = query.get("pipeline_version")
+        if (
+            pipeline_name is not None
+            and pipeline_version is not None
+            and "pipeline_name" not in unmatched_params
+        ):
+            node_versions = self.get_pipeline_versions(node_url, pipeline_name)
+            if (
+                node_versions is not None
+                and pipeline_version not in node_versions
+            ):
+                unmatched_params.append("pipeline_version")
+
+        return unmatched_params
+
+    def get_entries(self) -> dict:
+        """
+        Return all stored vocabularies and pipeline versions as JSON-serializable entries
+        (e.g., to share them with other processes), along with the time they were stored on the wall clock, in the form of
+        {"terms": [[node_url, attribute_path, [term_url, ...], updated_at], ...], "pipeline_versions": [...]}.
+        """
+        wall_clock_offset = time.time() - time.monotonic()
+        return {
+            name: [
+                [*key, sorted(values), updated_at + wall_clock_offset]
+                for key, (values, updated_at) in entries.items()
+            ]
+            for name, entries in self._get_entry_types()
+        }
+
+    def load_entries(self, entries: dict):
+        """Store the vocabularies and pipeline versions from entries returned by get_entries, unless more recent ones are stored."""
+        wall_clock_offset = time.time() - time.monotonic()
+        for name, stored_entries in self._get_entry_types():
+            for node_url, key, values, updated_at in entries.get(name, []):
+                updated_at -= wall_clock_offset
+                stored_entry = stored_entries.get((node_url, key))
+                if stored_entry is None or stored_entry[1] < updated_at:
+                    stored_entries[(node_url, key)] = (set(values), updated_at)
+
+    @staticmethod
+    def merge_entries(entries: dict, other_entries: dict) -> dict:
+        """Return the entries returned by get_entries for two indexes combined, keeping the more recent entry of each key."""
+        merged_entries = {}
+        for name in ("terms", "pipeline_versions"):
+            latest_entries = {}
+            for entry in [
+                *entries.get(name, []),
+                *other_entries.get(name, []),
+            ]:
+                node_url, key, _, updated_at = entry
+                latest_entry = latest_entries.get((node_url, key))
+                if latest_entry is None or latest_entry[3] < updated_at:
+                    latest_entries[(node_url, key)] = entry
+            merged_entries[name] = list(latest_entries.values())
+        return merged_entries
+
+    def remove_node(self, node_url: str):
+        """Remove the stored vocabulary and pipeline versions of a node."""
+        for _, entries in self._get_entry_types():
+            for key in [key for key in entries if key[0] == node_url]:
+                del entries[key]
+
+    def clear(self):
+        """Remove all stored vocabularies."""
+        self._terms.clear()
+        self._pipeline_versions.clear()
+
+    def _get_entry_types(self) -> tuple[tuple[str, dict], ...]:
+        return (
+            ("terms", self._terms),
+            ("pipeline_versions", self._pipeline_versions),
+        )
+
+    def _get_fresh(self, entries: dict, key: tuple) -> set | None:
+        """Return the stored value for a key if it is not older than the maximum age."""
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        values, updated_at = entry
+        if time.monotonic() - updated_at > self.max_age:
+            return None
+        return values
+
+
+class DatasetNodeIndex:
+    """
+    Keeps the nodes that each dataset (by dataset UUID) was last found in.
+
+    Entries older than the maximum age are treated as unknown, so a node is only ruled out of a query
+    based on a recently seen dataset.
+
+    Parameters
+    ----------
+    max_age : float
+        Time in seconds after which an entry is no longer used to route queries.
+    """
+
+    def __init__(self, max_age: float):
+        self.max_age = max_age
+        # In the form of {dataset_uuid: {node_url: updated_at, ...}, ...}
+        self._dataset_nodes = {}
+
+    def __len__(self) -> int:
+        return len(self._dataset_nodes)
+
+    def update(self, node_url: str, dataset_uuids: list[str]):
+        """Store that the given datasets were found in a node."""
+        now = time.monotonic()
+        for dataset_uuid in dataset_uuids:
+            self._dataset_nodes.setdefault(dataset_uuid, {})[node_url] = now
+
+    def get_nodes(self, dataset_uuid: str) -> set | None:
+        """Return the URLs of the nodes that a dataset was recently found in, or None if the dataset is unknown."""
+        now = time.monotonic()
+        node_urls = {
+            node_url
+            for node_url, updated_at in self._dataset_nodes.get(
+                dataset_uuid, {}
+            ).items()
+            if now - updated_at <= self.max_age
+        }
+        return node_urls or None
+
+    def route(
+        self, node_urls: list[str], dataset_uuids: list[str]
+    ) -> dict[str, list[str]]:
+        """
+        Return the datasets to query in each of the given nodes, in the form of {node_url: [dataset_uuid, ...], ...}.
+        Known datasets are only queried in the nodes they were found in, while unknown datasets are queried in all nodes.
+        Nodes that cannot have any of the datasets are given an empty list.
+        """
+        node_datasets = {node_url: [] for node_url in node_urls}
+        for dataset_uuid in dataset_uuids:
+            dataset_node_urls = self.get_nodes(dataset_uuid)
+            for node_url in node_urls:
+                if dataset_node_urls is None or node_url in dataset_node_urls:
+                    node_datasets[node_url].append(dataset_uuid)
+        return node_datasets
+
+    def remove_node(self, node_url: str):
+        """Remove a node from the nodes that each dataset was found in."""
+        for dataset_uuid in list(self._dataset_nodes):
+            dataset_nodes = self._dataset_nodes[dataset_uuid]
+            dataset_nodes.pop(node_url, None)
+            if not dataset_nodes:
+                del self._dataset_nodes[dataset_uuid]
+
+    def clear(self):
+        """Remove all stored datasets."""
+        self._dataset_nodes.clear()
@@ -0,0 +1,44 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.security import OAuth2
+
+from .. import security, tracing
+from .. import utility as util
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+oauth2_scheme = OAuth2(
+    flows={
+        "implicit": {
+            "authorizationUrl": "https://neurobagel.ca.auth0.com/authorize",
+        }
+    },
+    # Don't automatically error out when request is not authenticated, to support optional authentication
+    auto_error=False,
+)
+
+
+@router.get("/traces")
+async def get_traces(
+    request_id: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=10000)] = 1000,
+    token: str | None = Depends(oauth2_scheme),
+):
+    """
+    Returns the most recently recorded trace spans (up to the limit), from oldest to newest,
+    optionally only those of the request with the given request ID (as returned in the X-Request-ID response header).
+    Spans are read from the trace file if one is configured (covering all worker processes writing to it),
+    or otherwise from the in-memory trace buffer of the worker process handling the request.
+    Returns an empty list if neither is configured.
+
+    The endpoint is disabled unless NB_FAPI_ENABLE_TRACES_ENDPOINT is set, and requires a valid ID token
+    when authentication is enabled.
+    """
+    if not util.IS_TRACES_ENDPOINT_ENABLED.value:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="The traces endpoint is disabled (see NB_FAPI_ENABLE_TRACES_ENDPOINT).",
+        )
+    await security.authenticate(token)
+    return await tracing.get_spans(request_id=request_id, limit=limit)
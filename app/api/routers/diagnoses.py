@@ -1,9 +1,12 @@
 from fastapi import APIRouter
 
 from ..models import CombinedAttributeResponse
+from ..timing import TimedRoute
 from . import route_factory
 
-router = APIRouter(prefix="/diagnoses", tags=["diagnoses"])
+router = APIRouter(
+    prefix="/diagnoses", tags=["diagnoses"], route_class=TimedRoute
+)
 
 router.add_api_route(
     path="",
@@ -1,9 +1,14 @@
 from fastapi import APIRouter
 
 from ..models import CombinedAttributeResponse
+from ..timing import TimedRoute
 from . import route_factory
 
-router = APIRouter(prefix="/imaging-modalities", tags=["imaging-modalities"])
+router = APIRouter(
+    prefix="/imaging-modalities",
+    tags=["imaging-modalities"],
+    route_class=TimedRoute,
+)
 
 router.add_api_route(
     path="",
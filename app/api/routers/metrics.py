@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from fastapi.security import OAuth2
+
+from .. import metrics, security
+from .. import utility as util
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+oauth2_scheme = OAuth2(
+    flows={
+        "implicit": {
+            "authorizationUrl": "https://neurobagel.ca.auth0.com/authorize",
+        }
+    },
+    # Don't automatically error out when request is not authenticated, to support optional authentication
+    auto_error=False,
+)
+
+
+@router.get("", response_class=PlainTextResponse)
+async def get_metrics(token: str | None = Depends(oauth2_scheme)):
+    """
+    Returns the metrics of the API and its requests to nodes in the Prometheus text exposition format,
+    including the latency, outcome and response size of requests to each node, the number of nodes each federated query
+    was sent to, the requests to nodes in flight, and the end-to-end latency of requests to each API route.
+    The metrics of all worker processes of the API are included.
+    Requires a valid ID token when authentication is enabled.
+    """
+    if not util.IS_METRICS_ENABLED.value:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Metrics are disabled (see NB_FAPI_ENABLE_METRICS).",
+        )
+    await security.authenticate(token)
+    return PlainTextResponse(
+        await util.render_all_worker_metrics(), media_type=metrics.CONTENT_TYPE
+    )
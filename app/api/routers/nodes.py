@@ -11,3 +11,33 @@ async def get_nodes():
     return [
         {"NodeName": v, "ApiURL": k} for k, v in util.FEDERATION_NODES.items()
     ]
+
+
+@router.get("/health")
+async def get_nodes_health():
+    """
+    Returns a list of all available nodes with the result of their most recent health check,
+    and the number of requests to each node currently in flight or queued waiting for a free slot.
+    Nodes that have not yet been checked have null health values.
+    """
+    nodes_health = []
+    for node_url, node_name in util.FEDERATION_NODES.items():
+        node_health = util.NODE_HEALTH.get(node_url, {})
+        node_bulkhead = util.NODE_BULKHEADS.get(node_url)
+        nodes_health.append(
+            {
+                "NodeName": node_name,
+                "ApiURL": node_url,
+                "IsReachable": node_health.get("is_reachable"),
+                "LatencySeconds": node_health.get("latency"),
+                "LastChecked": node_health.get("last_checked"),
+                "Error": node_health.get("error"),
+                "InFlightRequests": (
+                    node_bulkhead.in_flight if node_bulkhead else 0
+                ),
+                "QueuedRequests": (
+                    node_bulkhead.waiting if node_bulkhead else 0
+                ),
+            }
+        )
+    return nodes_health
@@ -3,9 +3,12 @@ from typing_extensions import Annotated
 
 from .. import crud
 from ..models import CONTROLLED_TERM_REGEX, CombinedAttributeResponse
+from ..timing import TimedRoute
 from . import route_factory
 
-router = APIRouter(prefix="/pipelines", tags=["pipelines"])
+router = APIRouter(
+    prefix="/pipelines", tags=["pipelines"], route_class=TimedRoute
+)
 
 router.add_api_route(
     path="",
@@ -2,17 +2,26 @@
 
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+    status,
+)
 from fastapi.security import OAuth2
 
 from .. import crud, security
 from ..models import CombinedCohortQueryResponse, QueryModel
 from ..security import verify_token
+from ..timing import TimedRoute
 
 # from fastapi.security import open_id_connect_url
 
 
-router = APIRouter(prefix="/query", tags=["query"])
+router = APIRouter(prefix="/query", tags=["query"], route_class=TimedRoute)
 
 # Adapted from info in https://github.com/tiangolo/fastapi/discussions/9137#discussioncomment-5157382
 # I believe for us this is purely for documentatation/a nice looking interactive API docs page,
@@ -43,6 +52,13 @@ async def get_query(
     response: Response,
     query: Annotated[QueryModel, Query()],
     token: str | None = Depends(oauth2_scheme),
+    x_federation_deadline: Annotated[
+        float | None,
+        Header(
+            gt=0,
+            description="Time budget in seconds for the federated query, overriding the server default.",
+        ),
+    ] = None,
 ):
     """When a GET request is sent, return list of dicts corresponding to subject-level metadata aggregated by dataset."""
     # NOTE: Currently, when the request is unauthenticated (missing or malformed authorization header -> missing token),
@@ -65,7 +81,7 @@ async def get_query(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not authenticated",
             )
-        token = verify_token(token)
+        token = await verify_token(token)
 
     response_dict = await crud.get(
         # Remove fields set to None (default value) from the dict
@@ -73,6 +89,7 @@ async def get_query(
         # (e.g., the value an n-API receives for min_age must be a float and cannot be null/None)
         query=query.model_dump(exclude_none=True),
         token=token,
+        time_budget=x_federation_deadline,
     )
 
     if response_dict["errors"]:
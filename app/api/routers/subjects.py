@@ -1,13 +1,28 @@
 """Router for /subjects path operations."""
 
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from typing import Annotated
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2
 
 from .. import crud, security
+from .. import utility as util
 from ..models import CombinedSubjectsQueryResponse, SubjectsQueryModel
 from ..security import verify_token
+from ..timing import TimedRoute
 
-router = APIRouter(prefix="/subjects", tags=["subjects"])
+router = APIRouter(
+    prefix="/subjects", tags=["subjects"], route_class=TimedRoute
+)
 
 oauth2_scheme = OAuth2(
     flows={
@@ -27,19 +42,57 @@ async def post_subjects_query(
     response: Response,
     query: SubjectsQueryModel,
     token: str | None = Depends(oauth2_scheme),
+    x_federation_deadline: Annotated[
+        float | None,
+        Header(
+            gt=0,
+            description="Time budget in seconds for the federated query, overriding the server default.",
+        ),
+    ] = None,
+    stream: Annotated[
+        bool,
+        Query(
+            description="Stream the results of each node as newline-delimited JSON as soon as the node responds. "
+            f"Streaming can also be requested using the header 'Accept: {util.NDJSON_MEDIA_TYPE}', "
+            f"or 'Accept: {util.SSE_MEDIA_TYPE}' for server-sent events.",
+        ),
+    ] = False,
+    accept: Annotated[str | None, Header(include_in_schema=False)] = None,
 ):
-    """When a POST request is sent, return list of dicts corresponding to subject-level metadata aggregated by dataset."""
+    """
+    When a POST request is sent, return list of dicts corresponding to subject-level metadata aggregated by dataset.
+
+    When streaming is requested, each matching dataset is instead sent as a
+    {"event": "response", "data": {...}} line as soon as its node responds, followed by a final
+    {"event": "summary", "data": {"errors": [...], "nodes_response_status": ...}} line
+    (or as server-sent events of the same names, if requested).
+    """
     if security.AUTH_ENABLED:
         if token is None:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not authenticated",
             )
-        token = verify_token(token)
+        token = await verify_token(token)
+
+    stream_media_type = util.get_stream_media_type(stream, accept)
+    if stream_media_type is not None:
+        return StreamingResponse(
+            util.encode_stream(
+                crud.stream_subjects(
+                    query=query.model_dump(exclude_none=True),
+                    token=token,
+                    time_budget=x_federation_deadline,
+                ),
+                media_type=stream_media_type,
+            ),
+            media_type=stream_media_type,
+        )
 
     response_dict = await crud.post_subjects(
         query=query.model_dump(exclude_none=True),
         token=token,
+        time_budget=x_federation_deadline,
     )
 
     if response_dict["errors"]:
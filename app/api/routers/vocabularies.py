@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Response, status
+
+from .. import crud
+from ..models import CombinedAttributeResponse
+from ..timing import TimedRoute
+
+router = APIRouter(
+    prefix="/vocabularies", tags=["vocabularies"], route_class=TimedRoute
+)
+
+
+@router.get("", response_model=CombinedAttributeResponse)
+async def get_vocabularies(response: Response):
+    """
+    When a GET request is sent, return in a single response the unique available instances of every Neurobagel attribute
+    (assessments, diagnoses, imaging modalities and pipelines), keyed by the attribute URI,
+    along with all available versions of each pipeline under "pipeline_versions", across all nodes known to the f-API.
+    """
+    response_dict = await crud.get_vocabularies()
+
+    if response_dict["errors"]:
+        response.status_code = status.HTTP_207_MULTI_STATUS
+
+    return response_dict
@@ -1,21 +1,39 @@
+import asyncio
+import hashlib
 import os
+import time
 
+import httpx
 import jwt
 from fastapi import HTTPException, status
 from fastapi.security.utils import get_authorization_scheme_param
-from jwt import PyJWKClient, PyJWTError
+from jwt import PyJWKClientConnectionError, PyJWKClientError, PyJWTError
 
+from . import utility as util
+from .cache import TTLCache
 from .logger import get_logger, log_and_raise_error
+from .singleflight import SingleFlight
 
 AUTH_ENABLED = os.environ.get("NB_ENABLE_AUTH", "False").lower() == "true"
 CLIENT_ID = os.environ.get("NB_QUERY_CLIENT_ID", None)
 
 KEYS_URL = "https://neurobagel.ca.auth0.com/.well-known/jwks.json"
 ISSUER = "https://neurobagel.ca.auth0.com/"
-# We only need to define the JWKS client once because get_signing_key_from_jwt will handle key rotations
-# by automatically fetching updated keys when needed
-# See https://github.com/jpadilla/pyjwt/blob/3ebbb22f30f2b1b41727b269a08b427e9a85d6bb/jwt/jwks_client.py#L96-L115
-JWKS_CLIENT = PyJWKClient(KEYS_URL)
+# Minimum time in seconds between re-fetches of the public keys triggered by tokens signed with an unknown key,
+# so that tokens with made-up key IDs cannot be used to flood the identity provider with requests
+JWKS_UNKNOWN_KEY_REFETCH_INTERVAL = 60
+
+# Stores the last fetched public keys of the identity provider (as a jwt.PyJWKSet), along with when they were fetched.
+# The keys are refreshed in the background, and re-fetched early when a token is signed with a key that is not in the set
+# (e.g., after a key rotation).
+JWK_SET = None
+JWK_SET_FETCHED_AT = None
+JWKS_FETCHES = SingleFlight()
+
+# Caches the hashes of already verified tokens until the tokens expire, to skip re-verifying their signatures
+VERIFIED_TOKEN_CACHE = TTLCache(
+    ttl=0, max_size=max(util.VERIFIED_TOKEN_CACHE_MAX_SIZE.value, 0)
+)
 
 logger = get_logger(__name__)
 
@@ -44,19 +62,109 @@ def extract_token(token: str) -> str:
     return extracted_token
 
 
-def verify_token(token: str) -> str:
+async def fetch_jwks() -> jwt.PyJWKSet:
+    """Fetch the public keys of the identity provider, and store them for verifying tokens."""
+    global JWK_SET, JWK_SET_FETCHED_AT
+
+    try:
+        async with httpx.AsyncClient(
+            timeout=util.JWKS_TIMEOUT.value
+        ) as client:
+            response = await client.get(KEYS_URL)
+            response.raise_for_status()
+    except httpx.HTTPError as exc:
+        raise PyJWKClientConnectionError(
+            f'Failed to fetch the public keys from "{KEYS_URL}": {type(exc).__name__}: {exc}'
+        ) from exc
+
+    JWK_SET = jwt.PyJWKSet.from_dict(response.json())
+    JWK_SET_FETCHED_AT = time.monotonic()
+    return JWK_SET
+
+
+async def refresh_jwks() -> jwt.PyJWKSet:
+    """Re-fetch the public keys, sharing a single fetch between concurrent callers."""
+    return await JWKS_FETCHES.do("jwks", fetch_jwks)
+
+
+async def run_jwks_refreshes():
+    """
+    Fetch the public keys right away, then re-fetch them every refresh interval (if the interval is > 0),
+    so that requests do not have to wait for the keys to be fetched.
+    """
+    while True:
+        try:
+            await refresh_jwks()
+        except (PyJWTError, ValueError) as exc:
+            logger.warning(
+                f"Unable to refresh the identity provider public keys. The current keys will be kept. Details of the error: {exc}"
+            )
+        if util.JWKS_REFRESH_INTERVAL.value <= 0:
+            break
+        await asyncio.sleep(util.JWKS_REFRESH_INTERVAL.value)
+
+
+async def get_signing_key(token: str) -> jwt.PyJWK:
+    """
+    Return the public key that was used to sign a token, based on the key ID in the token header.
+    The public keys are only fetched if none have been fetched yet, or if the key is not among the current keys
+    and the keys were not fetched very recently.
+    """
+    key_id = jwt.get_unverified_header(token).get("kid")
+    signing_key = _find_key(JWK_SET, key_id)
+    if signing_key is None and (
+        JWK_SET is None
+        or time.monotonic() - JWK_SET_FETCHED_AT
+        >= JWKS_UNKNOWN_KEY_REFETCH_INTERVAL
+    ):
+        signing_key = _find_key(await refresh_jwks(), key_id)
+
+    if signing_key is None:
+        raise PyJWKClientError(
+            f'Unable to find a signing key that matches: "{key_id}"'
+        )
+    return signing_key
+
+
+def _find_key(jwk_set: jwt.PyJWKSet | None, key_id: str) -> jwt.PyJWK | None:
+    """Return the key with the given ID from a key set, or None if there is no such key."""
+    if jwk_set is None:
+        return None
+    for key in jwk_set.keys:
+        if key.key_id == key_id:
+            return key
+    return None
+
+
+def hash_token(token: str) -> str:
+    """Return a hash of a token, so that the cache of verified tokens does not hold the tokens themselves."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+async def verify_token(token: str) -> str:
     """
     Verify the ID token against the identity provider public keys, and return the token with the authorization scheme stripped.
     Raise an HTTPException if the token is invalid.
+
+    Verified tokens are cached until they expire, so that the signature of a token is only verified once.
+    The signature verification itself is run in a worker thread to avoid blocking the event loop.
     """
     try:
         extracted_token = extract_token(token)
+        token_hash = hash_token(extracted_token)
+        cached = VERIFIED_TOKEN_CACHE.get(token_hash)
+        if cached is not None:
+            _, is_fresh = cached
+            if is_fresh:
+                return extracted_token
+            VERIFIED_TOKEN_CACHE.invalidate(token_hash)
+
         # Determine which key was used to sign the token
-        # Adapted from https://pyjwt.readthedocs.io/en/stable/usage.html#retrieve-rsa-signing-keys-from-a-jwks-endpoint
-        signing_key = JWKS_CLIENT.get_signing_key_from_jwt(extracted_token)
+        signing_key = await get_signing_key(extracted_token)
 
         # https://pyjwt.readthedocs.io/en/stable/api.html#jwt.decode
-        jwt.decode(
+        claims = await asyncio.to_thread(
+            jwt.decode,
             jwt=extracted_token,
             key=signing_key,
             options={
@@ -66,6 +174,10 @@ def verify_token(token: str) -> str:
             audience=CLIENT_ID,
             issuer=ISSUER,
         )
+        if VERIFIED_TOKEN_CACHE.max_size:
+            expires_in = claims["exp"] - time.time()
+            if expires_in > 0:
+                VERIFIED_TOKEN_CACHE.set(token_hash, True, ttl=expires_in)
         return extracted_token
     except (PyJWTError, ValueError) as exc:
         raise HTTPException(
@@ -73,3 +185,18 @@ def verify_token(token: str) -> str:
             detail=f"Invalid token: {exc}",
             headers={"WWW-Authenticate": "Bearer"},
         ) from exc
+
+
+async def authenticate(token: str | None) -> str | None:
+    """
+    Require a valid ID token if authentication is enabled (see verify_token),
+    and return the token with the authorization scheme stripped (or the token as is if authentication is disabled).
+    """
+    if not AUTH_ENABLED:
+        return token
+    if token is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authenticated",
+        )
+    return await verify_token(token)
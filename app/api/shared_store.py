@@ -0,0 +1,201 @@
+"""Key-value store shared by the worker processes of the API, backed by a SQLite database file."""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import orjson
+
+
+class SharedStore:
+    """
+    Stores JSON-serializable values by namespace and key in a SQLite database, so that state such as the node index,
+    node health and cached responses can be shared by all worker processes of the API on the same host.
+    Values can be stored with a time-to-live (TTL), after which they are no longer returned.
+
+    Also provides leases, which let a single worker at a time take on a periodic task (e.g., node health checks)
+    and publish its results for the other workers.
+
+    NOTE: The methods of the store block on disk I/O, so they should be called from a worker thread
+    (e.g., using asyncio.to_thread) when used from the event loop.
+
+    Parameters
+    ----------
+    path : Path
+        Path of the SQLite database file, which is created if it does not exist.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._connection = None
+        self._connection_pid = None
+
+    def get(self, namespace: str, key: str) -> tuple[Any, float | None] | None:
+        """
+        Return the stored value of a key along with its remaining TTL in seconds (None if it has no TTL),
+        or None if the key is not stored or has expired.
+        """
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?",
+                    (namespace, key),
+                )
+                .fetchone()
+            )
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is None:
+            return orjson.loads(value), None
+        expires_in = expires_at - time.time()
+        if expires_in <= 0:
+            return None
+        return orjson.loads(value), expires_in
+
+    def get_all(self, namespace: str) -> dict[str, Any]:
+        """Return all stored values in a namespace that have not expired, in the form of {key: value, ...}."""
+        with self._lock:
+            rows = (
+                self._connect()
+                .execute(
+                    "SELECT key, value FROM entries WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+                    (namespace, time.time()),
+                )
+                .fetchall()
+            )
+        return {key: orjson.loads(value) for key, value in rows}
+
+    def set(
+        self, namespace: str, key: str, value: Any, ttl: float | None = None
+    ):
+        """Store a value for a key, for the given TTL in seconds (or indefinitely if the TTL is None)."""
+        expires_at = None if ttl is None else time.time() + ttl
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (namespace, key, orjson.dumps(value), expires_at),
+                )
+
+    def update(
+        self,
+        namespace: str,
+        key: str,
+        func: Callable[[Any | None], Any],
+        ttl: float | None = None,
+    ) -> Any:
+        """
+        Replace the stored value of a key with the result of func called with the value (or None if the key is not stored
+        or has expired), for the given TTL in seconds (or indefinitely if the TTL is None), and return the new value.
+        The value is read and written in a single transaction that holds the write lock of the database,
+        so that concurrent updates of the key by other worker processes are not lost.
+        """
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                row = connection.execute(
+                    "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?",
+                    (namespace, key),
+                ).fetchone()
+                now = time.time()
+                value = (
+                    orjson.loads(row[0])
+                    if row is not None and (row[1] is None or row[1] > now)
+                    else None
+                )
+                value = func(value)
+                connection.execute(
+                    "INSERT OR REPLACE INTO entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (
+                        namespace,
+                        key,
+                        orjson.dumps(value),
+                        None if ttl is None else now + ttl,
+                    ),
+                )
+        return value
+
+    def clear(self, namespace: str | None = None):
+        """Remove all stored values in a namespace, or in all namespaces along with expired leases if no namespace is given."""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                if namespace is None:
+                    connection.execute("DELETE FROM entries")
+                    connection.execute(
+                        "DELETE FROM leases WHERE expires_at <= ?",
+                        (time.time(),),
+                    )
+                else:
+                    connection.execute(
+                        "DELETE FROM entries WHERE namespace = ?",
+                        (namespace,),
+                    )
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """
+        Try to take (or renew) the lease with the given name for the given TTL in seconds.
+        The lease is only granted if it is free, expired or already held by the same owner.
+        Returns whether the lease was granted.
+        """
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                cursor = connection.execute(
+                    "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                    "WHERE leases.owner = excluded.owner OR leases.expires_at <= ?",
+                    (name, owner, now + ttl, now),
+                )
+        return cursor.rowcount > 0
+
+    def close(self):
+        """Close the connection to the database of the current process."""
+        with self._lock:
+            if (
+                self._connection is not None
+                and self._connection_pid == os.getpid()
+            ):
+                self._connection.close()
+            self._connection = None
+            self._connection_pid = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Return the connection to the database for the current process, opening it (and creating the tables) if needed.
+        A connection inherited from a parent process is never reused.
+        """
+        if self._connection is not None and self._connection_pid == (
+            os.getpid()
+        ):
+            return self._connection
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(
+            self.path, timeout=5, check_same_thread=False
+        )
+        # Write-ahead logging lets readers in other processes proceed while one process writes
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, expires_at REAL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                "name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+        self._connection = connection
+        self._connection_pid = os.getpid()
+        return connection
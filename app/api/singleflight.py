@@ -0,0 +1,35 @@
+"""Coalescing of identical concurrent calls into a single in-flight call."""
+
+import asyncio
+from typing import Any, Awaitable, Callable
+
+
+class SingleFlight:
+    """
+    Ensures that only one call per key is in flight at a time.
+    Callers that arrive with the same key while a call is in flight wait for and share its result
+    (or its raised exception), instead of starting a call of their own.
+    """
+
+    def __init__(self):
+        # In the form of {key: asyncio.Task, ...}
+        self._calls = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the result of the in-flight call for the key, starting a call of func if there is none."""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        # Shield the shared call so that one caller being cancelled (e.g., on a client disconnect)
+        # does not cancel the call for the other callers waiting on it
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        """Remove a completed call, so that later callers with the same key start a new call."""
+        if self._calls.get(key) is task:
+            del self._calls[key]
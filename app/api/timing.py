@@ -0,0 +1,223 @@
+"""
+Per-request timing breakdown of federated requests, reported in the Server-Timing header of responses
+(see https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/Server-Timing).
+"""
+
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator
+
+import orjson
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class RequestTiming:
+    """
+    Collects the time spent in each step of handling a request, in seconds:
+    the network time of the requests to each node, and the total time spent decoding node responses,
+    validating node results and serializing the response.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.endpoint_ended_at = None
+        # In the form of {node_name: duration, ...}
+        self.node_durations = {}
+        # In the form of {step_name: duration, ...}
+        self.durations = {}
+
+    def add(self, name: str, duration: float):
+        """Add time spent in a step of handling the request."""
+        self.durations[name] = self.durations.get(name, 0) + duration
+
+    def add_node(self, node_name: str, duration: float):
+        """Add network time spent on requests to a node."""
+        self.node_durations[node_name] = (
+            self.node_durations.get(node_name, 0) + duration
+        )
+
+    def merge(self, other: "RequestTiming"):
+        """Add the time spent in each step (and on requests to each node) recorded in another timing."""
+        for node_name, duration in other.node_durations.items():
+            self.add_node(node_name, duration)
+        for name, duration in other.durations.items():
+            self.add(name, duration)
+
+    def to_dict(self) -> dict:
+        """Return the timing breakdown in milliseconds, e.g. for embedding in a response body."""
+        return {
+            "nodes": {
+                node_name: round(duration * 1000, 3)
+                for node_name, duration in self.node_durations.items()
+            },
+            **{
+                name: round(duration * 1000, 3)
+                for name, duration in self.durations.items()
+            },
+        }
+
+    def to_header(self) -> str:
+        """Return the timing breakdown as the value of a Server-Timing header."""
+        metrics = [
+            f'node-{index};desc="{_escape_description(node_name)}";dur={duration * 1000:.3f}'
+            for index, (node_name, duration) in enumerate(
+                self.node_durations.items(), start=1
+            )
+        ]
+        metrics.extend(
+            f"{name};dur={duration * 1000:.3f}"
+            for name, duration in self.durations.items()
+        )
+        return ", ".join(metrics)
+
+
+def _escape_description(description: str) -> str:
+    return description.replace("\\", "\\\\").replace('"', '\\"')
+
+
+# Stores the timing of the request being handled, which is shared with the tasks started while handling it
+REQUEST_TIMING: ContextVar[RequestTiming | None] = ContextVar(
+    "request_timing", default=None
+)
+
+
+def record(name: str, duration: float):
+    """Add time spent in a step to the timing of the current request, if there is one."""
+    request_timing = REQUEST_TIMING.get()
+    if request_timing is not None:
+        request_timing.add(name, duration)
+
+
+def record_node(node_name: str, duration: float):
+    """Add network time spent on a request to a node to the timing of the current request, if there is one."""
+    request_timing = REQUEST_TIMING.get()
+    if request_timing is not None:
+        request_timing.add_node(node_name, duration)
+
+
+def record_all(other: RequestTiming):
+    """
+    Add the timing of work shared with other requests (e.g., a coalesced federated query)
+    to the timing of the current request, if there is one.
+    """
+    request_timing = REQUEST_TIMING.get()
+    if request_timing is not None:
+        request_timing.merge(other)
+
+
+@contextmanager
+def measure(name: str) -> Iterator[None]:
+    """Add the time spent in the context to the timing of the current request under the given step name."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def time_endpoint(endpoint: Callable) -> Callable:
+    """
+    Wrap an async path operation function to record when it returns, so that the time until the response is sent
+    can be attributed to serializing the response.
+    """
+    if not inspect.iscoroutinefunction(endpoint):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def timed_endpoint(*args, **kwargs):
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            request_timing = REQUEST_TIMING.get()
+            if request_timing is not None:
+                request_timing.endpoint_ended_at = time.perf_counter()
+
+    return timed_endpoint
+
+
+class TimedRoute(APIRoute):
+    """Route whose path operation function is timed (see time_endpoint), for the serialization time in the Server-Timing header."""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, time_endpoint(endpoint), **kwargs)
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware timing each HTTP request to the API and adding the timing breakdown to the Server-Timing header of the response.
+
+    If timing debugging is enabled, the timing breakdown is also embedded in JSON object response bodies under "timing".
+    Streamed responses only report the timing up to when the response starts.
+
+    Parameters
+    ----------
+    app : ASGIApp
+        The wrapped application.
+    is_debug_enabled : Callable[[], bool]
+        Function returning whether timing debugging is enabled, checked for each request.
+    """
+
+    def __init__(self, app: ASGIApp, is_debug_enabled: Callable[[], bool]):
+        self.app = app
+        self.is_debug_enabled = is_debug_enabled
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_timing = RequestTiming()
+        timing_token = REQUEST_TIMING.set(request_timing)
+        is_body_embedded = self.is_debug_enabled()
+        response_start = None
+        body_chunks = []
+
+        async def send_with_timing(message: Message):
+            nonlocal response_start, is_body_embedded
+            if message["type"] == "http.response.start":
+                now = time.perf_counter()
+                if request_timing.endpoint_ended_at is not None:
+                    request_timing.add(
+                        "serialize", now - request_timing.endpoint_ended_at
+                    )
+                request_timing.add("total", now - request_timing.started_at)
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", request_timing.to_header())
+                is_body_embedded = is_body_embedded and (
+                    headers.get("content-type", "").startswith(
+                        "application/json"
+                    )
+                )
+                if is_body_embedded:
+                    response_start = message
+                    return
+            elif message["type"] == "http.response.body" and is_body_embedded:
+                body_chunks.append(message.get("body", b""))
+                if message.get("more_body", False):
+                    return
+                await send_embedded_timing(b"".join(body_chunks))
+                return
+            await send(message)
+
+        async def send_embedded_timing(body: bytes):
+            try:
+                content = orjson.loads(body) if body else None
+            except orjson.JSONDecodeError:
+                content = None
+            if isinstance(content, dict):
+                content["timing"] = request_timing.to_dict()
+                body = orjson.dumps(content)
+                headers = MutableHeaders(scope=response_start)
+                headers["content-length"] = str(len(body))
+            await send(response_start)
+            await send({"type": "http.response.body", "body": body})
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            REQUEST_TIMING.reset(timing_token)
@@ -0,0 +1,305 @@
+"""
+Lightweight tracing of requests to the API, correlated with the requests sent to nodes through a request ID.
+
+Each request to the API is assigned a request ID (or keeps the one it was sent with in the X-Request-ID header),
+which is returned in the response and forwarded to the nodes. The steps of handling the request are recorded as spans
+and exported to an in-memory ring buffer and/or a JSON lines file, which are readable through the /admin/traces endpoint.
+
+NOTE: The ring buffer is kept per worker process, so with multiple worker processes (see app.server)
+it only holds the spans of the requests handled by the worker process that reads it.
+The JSON lines file can be shared by all worker processes, and is read instead of the ring buffer when configured.
+"""
+
+import asyncio
+import re
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Iterator
+
+import orjson
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import timing
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Request IDs sent by clients are only accepted if they are reasonably short and cannot break log lines or headers
+VALID_REQUEST_ID_REGEX = re.compile(r"^[A-Za-z0-9._:\-]{1,128}$")
+
+# Stores the ID of the request being handled and the ID of the innermost span in progress,
+# which are shared with the tasks started while handling the request
+REQUEST_ID: ContextVar[str | None] = ContextVar("request_id", default=None)
+CURRENT_SPAN_ID: ContextVar[str | None] = ContextVar(
+    "current_span_id", default=None
+)
+
+
+class RingBufferExporter:
+    """
+    Keeps the most recently finished spans in memory, dropping the oldest spans once full.
+
+    Parameters
+    ----------
+    max_size : int
+        Maximum number of spans kept.
+    """
+
+    def __init__(self, max_size: int):
+        self._spans = deque(maxlen=max_size)
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    def export(self, span: dict):
+        """Store a finished span."""
+        self._spans.append(span)
+
+    def get_spans(
+        self, request_id: str | None = None, limit: int | None = None
+    ) -> list[dict]:
+        """Return the most recent spans (optionally only those of a request), from oldest to newest."""
+        spans = [
+            span
+            for span in self._spans
+            if request_id is None or span["request_id"] == request_id
+        ]
+        return spans if limit is None else spans[-limit:]
+
+    def close(self):
+        """Remove all stored spans."""
+        self._spans.clear()
+
+
+class JsonLinesExporter:
+    """
+    Appends finished spans to a file, with one JSON object per line.
+
+    Parameters
+    ----------
+    path : Path
+        Path of the file, which is created if it does not exist.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = None
+
+    def export(self, span: dict):
+        """
+        Append a finished span to the file.
+        Each span is written in a single unbuffered write, so that several processes can append to the same file
+        without interleaving their spans, and the spans of each process can be read by the others right away.
+        """
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = self.path.open("ab", buffering=0)
+        self._file.write(orjson.dumps(span) + b"\n")
+
+    def get_spans(
+        self, request_id: str | None = None, limit: int | None = None
+    ) -> list[dict]:
+        """
+        Return the most recent spans in the file (optionally only those of a request), from oldest to newest.
+        The whole file is read, skipping any lines that cannot be parsed (e.g., a span still being written).
+        """
+        spans = deque(maxlen=limit)
+        try:
+            with self.path.open("rb") as file:
+                for line in file:
+                    try:
+                        span = orjson.loads(line)
+                    except orjson.JSONDecodeError:
+                        continue
+                    if request_id is None or span.get("request_id") == (
+                        request_id
+                    ):
+                        spans.append(span)
+        except FileNotFoundError:
+            return []
+        return list(spans)
+
+    def close(self):
+        """Close the file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# Stores the exporters that finished spans are sent to. Spans are not recorded at all if there are none.
+EXPORTERS = []
+# Stores the ring buffer exporter and the JSON lines file exporter, if configured
+RING_BUFFER = None
+FILE_EXPORTER = None
+
+
+def configure_exporters(buffer_size: int, file_path: str):
+    """
+    Set up the exporters of finished spans: a ring buffer of the given size (if the size is > 0)
+    and a JSON lines file at the given path (if the path is not empty).
+    """
+    global RING_BUFFER, FILE_EXPORTER
+
+    close_exporters()
+    if buffer_size > 0:
+        RING_BUFFER = RingBufferExporter(buffer_size)
+        EXPORTERS.append(RING_BUFFER)
+    if file_path:
+        FILE_EXPORTER = JsonLinesExporter(Path(file_path))
+        EXPORTERS.append(FILE_EXPORTER)
+
+
+def close_exporters():
+    """Close and remove all exporters."""
+    global RING_BUFFER, FILE_EXPORTER
+
+    for exporter in EXPORTERS:
+        exporter.close()
+    EXPORTERS.clear()
+    RING_BUFFER = None
+    FILE_EXPORTER = None
+
+
+async def get_spans(
+    request_id: str | None = None, limit: int | None = None
+) -> list[dict]:
+    """
+    Return the most recently recorded spans (optionally only those of a request), from oldest to newest,
+    from the JSON lines file if configured (which holds the spans of all worker processes sharing it),
+    or otherwise from the ring buffer of this worker process. Returns an empty list if neither is configured.
+    The file is read in a worker thread to avoid blocking the event loop.
+    """
+    if FILE_EXPORTER is not None:
+        return await asyncio.to_thread(
+            FILE_EXPORTER.get_spans, request_id=request_id, limit=limit
+        )
+    if RING_BUFFER is not None:
+        return RING_BUFFER.get_spans(request_id=request_id, limit=limit)
+    return []
+
+
+def get_request_id() -> str | None:
+    """Return the ID of the request being handled, if any."""
+    return REQUEST_ID.get()
+
+
+def export_span(
+    name: str,
+    started_at: float,
+    duration: float,
+    parent_id: str | None,
+    span_id: str | None = None,
+    attributes: dict | None = None,
+):
+    """Send a finished span, with its start time (as a Unix timestamp) and duration in seconds, to all exporters."""
+    finished_span = {
+        "request_id": REQUEST_ID.get(),
+        "span_id": span_id or uuid.uuid4().hex[:16],
+        "parent_id": parent_id,
+        "name": name,
+        "start_time": started_at,
+        "duration_ms": round(duration * 1000, 3),
+        "attributes": attributes or {},
+    }
+    for exporter in EXPORTERS:
+        try:
+            exporter.export(finished_span)
+        except (OSError, TypeError) as exc:
+            logger.warning(f"Failed to export a trace span: {exc}")
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[dict]:
+    """
+    Record the context as a span with the given name and attributes, nested in the span in progress (if any).
+    Yields the attributes of the span, so that more attributes can be added to it (e.g., the status of a response).
+    The type of any exception raised in the context is recorded as the "error" attribute.
+    """
+    if not EXPORTERS:
+        yield attributes
+        return
+
+    span_id = uuid.uuid4().hex[:16]
+    parent_id = CURRENT_SPAN_ID.get()
+    span_token = CURRENT_SPAN_ID.set(span_id)
+    started_at = time.time()
+    start = time.perf_counter()
+    try:
+        yield attributes
+    except BaseException as exc:
+        attributes["error"] = type(exc).__name__
+        raise
+    finally:
+        CURRENT_SPAN_ID.reset(span_token)
+        export_span(
+            name,
+            started_at=started_at,
+            duration=time.perf_counter() - start,
+            parent_id=parent_id,
+            span_id=span_id,
+            attributes=attributes,
+        )
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware assigning a request ID to each HTTP request to the API (or accepting a valid one sent by the client),
+    returning it in the X-Request-ID header of the response, and recording the request as the root span of its trace.
+    The time from the path operation function returning to the response starting is recorded as a "serialize" span.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = Headers(scope=scope).get(REQUEST_ID_HEADER)
+        if request_id is None or not VALID_REQUEST_ID_REGEX.match(request_id):
+            request_id = uuid.uuid4().hex
+        request_id_token = REQUEST_ID.set(request_id)
+
+        try:
+            with span(
+                "request", method=scope["method"], path=scope["path"]
+            ) as request_attributes:
+
+                async def send_with_request_id(message: Message):
+                    if message["type"] == "http.response.start":
+                        MutableHeaders(scope=message)[REQUEST_ID_HEADER] = (
+                            request_id
+                        )
+                        request_attributes["status_code"] = message["status"]
+                        self.export_serialize_span()
+                    await send(message)
+
+                await self.app(scope, receive, send_with_request_id)
+        finally:
+            REQUEST_ID.reset(request_id_token)
+
+    @staticmethod
+    def export_serialize_span():
+        """Record the time since the path operation function returned (see timing.TimedRoute) as a span."""
+        request_timing = timing.REQUEST_TIMING.get()
+        if (
+            not EXPORTERS
+            or request_timing is None
+            or request_timing.endpoint_ended_at is None
+        ):
+            return
+        duration = time.perf_counter() - request_timing.endpoint_ended_at
+        export_span(
+            "serialize",
+            started_at=time.time() - duration,
+            duration=duration,
+            parent_id=CURRENT_SPAN_ID.get(),
+        )
@@ -1,18 +1,32 @@
 """Constants and utility functions for federation."""
 
+import asyncio
+import hashlib
+import importlib.util
 import json
 import os
+import sqlite3
+import tempfile
+import time
 from collections import namedtuple
+from contextlib import asynccontextmanager, nullcontext
 from copy import deepcopy
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, AsyncIterator, Callable
 
 import httpx
 import jsonschema
+import orjson
 from fastapi import HTTPException, status
 from jsonschema import validate
 
+from . import metrics, timing, tracing
+from .bulkhead import Bulkhead
+from .circuit_breaker import CircuitBreaker
+from .latency import LatencyTracker
 from .logger import get_logger, log_and_raise_error
+from .shared_store import SharedStore
 
 logger = get_logger(__name__)
 
@@ -27,11 +41,337 @@ IS_FEDERATE_REMOTE_PUBLIC_NODES = EnvVar(
     == "true",
 )
 
+# Connection pool settings for the long-lived HTTP client kept for each node
+MAX_CONNECTIONS_PER_NODE = EnvVar(
+    "NB_FAPI_MAX_CONNECTIONS_PER_NODE",
+    int(os.environ.get("NB_FAPI_MAX_CONNECTIONS_PER_NODE", "100")),
+)
+MAX_KEEPALIVE_CONNECTIONS_PER_NODE = EnvVar(
+    "NB_FAPI_MAX_KEEPALIVE_CONNECTIONS_PER_NODE",
+    int(os.environ.get("NB_FAPI_MAX_KEEPALIVE_CONNECTIONS_PER_NODE", "20")),
+)
+KEEPALIVE_EXPIRY = EnvVar(
+    "NB_FAPI_KEEPALIVE_EXPIRY",
+    float(os.environ.get("NB_FAPI_KEEPALIVE_EXPIRY", "30")),
+)
+
+# Limits on the number of concurrent requests to nodes, across all nodes and for any single node
+MAX_CONCURRENT_NODE_REQUESTS = EnvVar(
+    "NB_FAPI_MAX_CONCURRENT_NODE_REQUESTS",
+    int(os.environ.get("NB_FAPI_MAX_CONCURRENT_NODE_REQUESTS", "200")),
+)
+MAX_CONCURRENT_REQUESTS_PER_NODE = EnvVar(
+    "NB_FAPI_MAX_CONCURRENT_REQUESTS_PER_NODE",
+    int(os.environ.get("NB_FAPI_MAX_CONCURRENT_REQUESTS_PER_NODE", "20")),
+)
+
+# Opt-in HTTP/2 for requests to nodes, negotiated per node via ALPN (nodes without HTTP/2 support fall back to HTTP/1.1).
+# Requires the optional h2 package (e.g., installed via the 'http2' extra).
+IS_HTTP2_ENABLED = EnvVar(
+    "NB_FAPI_ENABLE_HTTP2",
+    os.environ.get("NB_FAPI_ENABLE_HTTP2", "False").lower() == "true",
+)
+IS_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Settings for the adaptive timeouts of requests to nodes, which are derived from the recently observed latencies of each node.
+# The default timeout (that of httpx) is used until enough latencies have been observed for a node.
+NODE_TIMEOUT_DEFAULT = EnvVar(
+    "NB_FAPI_NODE_TIMEOUT_DEFAULT",
+    float(os.environ.get("NB_FAPI_NODE_TIMEOUT_DEFAULT", "5")),
+)
+NODE_TIMEOUT_MIN = EnvVar(
+    "NB_FAPI_NODE_TIMEOUT_MIN",
+    float(os.environ.get("NB_FAPI_NODE_TIMEOUT_MIN", "2")),
+)
+NODE_TIMEOUT_MAX = EnvVar(
+    "NB_FAPI_NODE_TIMEOUT_MAX",
+    float(os.environ.get("NB_FAPI_NODE_TIMEOUT_MAX", "30")),
+)
+NODE_TIMEOUT_LATENCY_MULTIPLIER = EnvVar(
+    "NB_FAPI_NODE_TIMEOUT_LATENCY_MULTIPLIER",
+    float(os.environ.get("NB_FAPI_NODE_TIMEOUT_LATENCY_MULTIPLIER", "3")),
+)
+NODE_LATENCY_WINDOW_SIZE = EnvVar(
+    "NB_FAPI_NODE_LATENCY_WINDOW_SIZE",
+    int(os.environ.get("NB_FAPI_NODE_LATENCY_WINDOW_SIZE", "200")),
+)
+NODE_LATENCY_MIN_SAMPLES = EnvVar(
+    "NB_FAPI_NODE_LATENCY_MIN_SAMPLES",
+    int(os.environ.get("NB_FAPI_NODE_LATENCY_MIN_SAMPLES", "10")),
+)
+
+# Default time budget (in seconds) for a federated query, after which any nodes that have not yet responded are reported as timed out.
+# A value <= 0 disables the deadline.
+FEDERATION_DEADLINE = EnvVar(
+    "NB_FAPI_FEDERATION_DEADLINE",
+    float(os.environ.get("NB_FAPI_FEDERATION_DEADLINE", "60")),
+)
+# Media types of streamed federated query responses (newline-delimited JSON or server-sent events)
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+
+# Header used both to override the deadline of an incoming query
+# and to tell each node how much of the time budget remains when the request is sent
+DEADLINE_HEADER = "X-Federation-Deadline"
+
+# Settings for the circuit breaker of each node, which skips requests to a node after repeated failures
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = EnvVar(
+    "NB_FAPI_CIRCUIT_BREAKER_FAILURE_THRESHOLD",
+    int(os.environ.get("NB_FAPI_CIRCUIT_BREAKER_FAILURE_THRESHOLD", "5")),
+)
+CIRCUIT_BREAKER_RESET_TIMEOUT = EnvVar(
+    "NB_FAPI_CIRCUIT_BREAKER_RESET_TIMEOUT",
+    float(os.environ.get("NB_FAPI_CIRCUIT_BREAKER_RESET_TIMEOUT", "30")),
+)
+
+# Settings for the background health checks of all nodes.
+# Nodes found unreachable at the last health check are left out of federated requests by default.
+HEALTH_CHECK_INTERVAL = EnvVar(
+    "NB_FAPI_HEALTH_CHECK_INTERVAL",
+    float(os.environ.get("NB_FAPI_HEALTH_CHECK_INTERVAL", "60")),
+)
+HEALTH_CHECK_TIMEOUT = EnvVar(
+    "NB_FAPI_HEALTH_CHECK_TIMEOUT",
+    float(os.environ.get("NB_FAPI_HEALTH_CHECK_TIMEOUT", "5")),
+)
+IS_SKIP_UNHEALTHY_NODES = EnvVar(
+    "NB_FAPI_SKIP_UNHEALTHY_NODES",
+    os.environ.get("NB_FAPI_SKIP_UNHEALTHY_NODES", "True").lower() == "true",
+)
+
+# Settings for the in-process cache of the attribute vocabularies (e.g., available assessments) across all nodes.
+# Stale vocabularies are served while being refreshed in the background. A TTL <= 0 disables the cache.
+# Vocabularies that only some nodes returned are cached for the (shorter) error TTL, to retry the failed nodes sooner.
+# If all nodes fail to return a vocabulary being refreshed, the stale vocabulary is kept for the error TTL.
+VOCAB_CACHE_TTL = EnvVar(
+    "NB_FAPI_VOCAB_CACHE_TTL",
+    float(os.environ.get("NB_FAPI_VOCAB_CACHE_TTL", "3600")),
+)
+VOCAB_CACHE_ERROR_TTL = EnvVar(
+    "NB_FAPI_VOCAB_CACHE_ERROR_TTL",
+    float(os.environ.get("NB_FAPI_VOCAB_CACHE_ERROR_TTL", "60")),
+)
+# Settings for the cache of the available versions of each pipeline, which shares the TTLs of the vocabulary cache.
+# Pipelines that no node has any versions of are cached for the (shorter) negative TTL.
+PIPELINE_VERSIONS_CACHE_MAX_SIZE = EnvVar(
+    "NB_FAPI_PIPELINE_VERSIONS_CACHE_MAX_SIZE",
+    int(os.environ.get("NB_FAPI_PIPELINE_VERSIONS_CACHE_MAX_SIZE", "1000")),
+)
+PIPELINE_VERSIONS_NEGATIVE_CACHE_TTL = EnvVar(
+    "NB_FAPI_PIPELINE_VERSIONS_NEGATIVE_CACHE_TTL",
+    float(
+        os.environ.get("NB_FAPI_PIPELINE_VERSIONS_NEGATIVE_CACHE_TTL", "300")
+    ),
+)
+
+# Whether to skip nodes whose vocabulary (as last fetched for the vocabulary endpoints) cannot match a query
+IS_QUERY_PLANNER_ENABLED = EnvVar(
+    "NB_FAPI_ENABLE_QUERY_PLANNER",
+    os.environ.get("NB_FAPI_ENABLE_QUERY_PLANNER", "True").lower() == "true",
+)
+
+# Time in seconds for which the node a dataset was found in (in a POST /datasets response)
+# is used to route POST /subjects queries for the dataset to only that node
+DATASET_NODE_INDEX_MAX_AGE = EnvVar(
+    "NB_FAPI_DATASET_NODE_INDEX_MAX_AGE",
+    float(os.environ.get("NB_FAPI_DATASET_NODE_INDEX_MAX_AGE", "3600")),
+)
+
+# Settings for the short-lived query sessions, which remember the datasets matched in each node by a POST /datasets query
+# so that a follow-up POST /subjects query with the same filters skips the nodes that cannot match it.
+# A TTL <= 0 disables the query sessions.
+QUERY_SESSION_TTL = EnvVar(
+    "NB_FAPI_QUERY_SESSION_TTL",
+    float(os.environ.get("NB_FAPI_QUERY_SESSION_TTL", "300")),
+)
+QUERY_SESSION_CACHE_MAX_SIZE = EnvVar(
+    "NB_FAPI_QUERY_SESSION_CACHE_MAX_SIZE",
+    int(os.environ.get("NB_FAPI_QUERY_SESSION_CACHE_MAX_SIZE", "1000")),
+)
+
+# Settings for reloading the node index while the API is running:
+# the local node file is checked for changes every watch interval, and the public node directory is re-fetched
+# every refresh interval. An interval <= 0 disables the corresponding reloads.
+LOCAL_NODE_INDEX_WATCH_INTERVAL = EnvVar(
+    "NB_FAPI_LOCAL_NODE_INDEX_WATCH_INTERVAL",
+    float(os.environ.get("NB_FAPI_LOCAL_NODE_INDEX_WATCH_INTERVAL", "5")),
+)
+NODE_DIRECTORY_REFRESH_INTERVAL = EnvVar(
+    "NB_FAPI_NODE_DIRECTORY_REFRESH_INTERVAL",
+    float(os.environ.get("NB_FAPI_NODE_DIRECTORY_REFRESH_INTERVAL", "3600")),
+)
+
+NODE_DIRECTORY_URL = "https://raw.githubusercontent.com/neurobagel/menu/main/node_directory/neurobagel_public_nodes.json"
+
+# Settings for fetching the public node directory. The last successfully fetched directory is saved to the snapshot file,
+# from which the public nodes are loaded on startup.
+NODE_DIRECTORY_TIMEOUT = EnvVar(
+    "NB_FAPI_NODE_DIRECTORY_TIMEOUT",
+    float(os.environ.get("NB_FAPI_NODE_DIRECTORY_TIMEOUT", "10")),
+)
+NODE_DIRECTORY_SNAPSHOT_PATH = EnvVar(
+    "NB_FAPI_NODE_DIRECTORY_SNAPSHOT_PATH",
+    Path(
+        os.environ.get(
+            "NB_FAPI_NODE_DIRECTORY_SNAPSHOT_PATH",
+            Path(tempfile.gettempdir())
+            / "nb_fapi_public_nb_nodes_snapshot.json",
+        )
+    ),
+)
+
+# Settings for verifying ID tokens when authentication is enabled: the identity provider public keys (JWKS) are re-fetched
+# every refresh interval, and verified tokens are cached until they expire. A max size <= 0 disables the token cache.
+JWKS_REFRESH_INTERVAL = EnvVar(
+    "NB_FAPI_JWKS_REFRESH_INTERVAL",
+    float(os.environ.get("NB_FAPI_JWKS_REFRESH_INTERVAL", "3600")),
+)
+JWKS_TIMEOUT = EnvVar(
+    "NB_FAPI_JWKS_TIMEOUT",
+    float(os.environ.get("NB_FAPI_JWKS_TIMEOUT", "10")),
+)
+VERIFIED_TOKEN_CACHE_MAX_SIZE = EnvVar(
+    "NB_FAPI_VERIFIED_TOKEN_CACHE_MAX_SIZE",
+    int(os.environ.get("NB_FAPI_VERIFIED_TOKEN_CACHE_MAX_SIZE", "10000")),
+)
+
+# Whether to embed the timing breakdown reported in the Server-Timing header of each response in JSON response bodies (under "timing")
+IS_TIMING_DEBUG_ENABLED = EnvVar(
+    "NB_FAPI_ENABLE_TIMING_DEBUG",
+    os.environ.get("NB_FAPI_ENABLE_TIMING_DEBUG", "False").lower() == "true",
+)
+
+# Settings for request tracing: finished spans are kept in an in-memory ring buffer of the given size
+# and/or appended to a JSON lines file at the given path (both readable through the /admin/traces endpoint).
+# A buffer size <= 0 or an empty path disables the corresponding exporter.
+TRACE_BUFFER_SIZE = EnvVar(
+    "NB_FAPI_TRACE_BUFFER_SIZE",
+    int(os.environ.get("NB_FAPI_TRACE_BUFFER_SIZE", "1000")),
+)
+TRACE_FILE_PATH = EnvVar(
+    "NB_FAPI_TRACE_FILE_PATH",
+    os.environ.get("NB_FAPI_TRACE_FILE_PATH", ""),
+)
+# The /admin/traces endpoint exposes the paths and timings of recent requests, so it is disabled unless enabled explicitly
+IS_TRACES_ENDPOINT_ENABLED = EnvVar(
+    "NB_FAPI_ENABLE_TRACES_ENDPOINT",
+    os.environ.get("NB_FAPI_ENABLE_TRACES_ENDPOINT", "False").lower()
+    == "true",
+)
+
+# Settings for the /metrics endpoint, which can be disabled. With a shared store, each worker process publishes
+# its metrics to the store every publish interval (and when handling a scrape), to be merged with those of the other workers.
+IS_METRICS_ENABLED = EnvVar(
+    "NB_FAPI_ENABLE_METRICS",
+    os.environ.get("NB_FAPI_ENABLE_METRICS", "True").lower() == "true",
+)
+METRICS_PUBLISH_INTERVAL = EnvVar(
+    "NB_FAPI_METRICS_PUBLISH_INTERVAL",
+    float(os.environ.get("NB_FAPI_METRICS_PUBLISH_INTERVAL", "5")),
+)
+
+# Path of the SQLite database shared by the worker processes of the API (see app.server), through which they share
+# the public node directory, node health, cached vocabularies and metrics. An empty path disables the shared store.
+SHARED_STORE_PATH = EnvVar(
+    "NB_FAPI_SHARED_STORE_PATH",
+    os.environ.get("NB_FAPI_SHARED_STORE_PATH", ""),
+)
+
 LOCAL_NODE_INDEX_PATH = Path(__file__).parents[2] / "local_nb_nodes.json"
 
-# Stores the names and URLs of all Neurobagel nodes known to the API instance, in the form of {node_url: node_name, ...}
+# Stores the names and URLs of all Neurobagel nodes known to the API instance, in the form of {node_url: node_name, ...}.
+# NOTE: This dict is never modified once created. Instead, the index is updated by replacing it with a new dict
+# (see update_federation_node_index), so that requests can keep using the index as it was when they started.
 FEDERATION_NODES = {}
 
+# Stores the public nodes from the last successful fetch of the public node directory, in the form of {node_url: node_name, ...}
+PUBLIC_NODES = {}
+
+# Stores the ETag and Last-Modified headers of the last successful response from the public node directory,
+# in the form of {"etag": ..., "last_modified": ...}
+NODE_DIRECTORY_VALIDATORS = {}
+
+# Stores the long-lived (pooled) HTTP clients used to send requests to each node, in the form of {node_url: httpx.AsyncClient, ...}
+NODE_HTTP_CLIENTS = {}
+
+# Stores the tasks closing the pooled HTTP clients of removed nodes once their in-flight requests are complete,
+# so that they are not garbage collected before they are done (see update_federation_node_index)
+NODE_HTTP_CLIENT_CLOSE_TASKS = set()
+
+# Stores the HTTP protocol version used in the most recent response from each node, in the form of {node_url: "HTTP/2", ...}
+NODE_HTTP_VERSIONS = {}
+
+# Stores the result of the most recent health check of each node, in the form of
+# {node_url: {"is_reachable": bool, "latency": float | None, "last_checked": str, "error": str | None}, ...}
+NODE_HEALTH = {}
+
+# Stores the store shared with the other worker processes of the API, or None if the shared store is disabled
+SHARED_STORE = None
+
+# Bounds the number of concurrent requests to all nodes
+OUTBOUND_REQUESTS_BULKHEAD = Bulkhead(MAX_CONCURRENT_NODE_REQUESTS.value)
+
+# Stores the bulkhead bounding the number of concurrent requests to each node, in the form of {node_url: Bulkhead, ...}
+NODE_BULKHEADS = {}
+
+metrics.Gauge(
+    "nb_fapi_outbound_requests_in_flight",
+    "Requests to nodes currently in flight, across all nodes.",
+    collect=lambda: {(): OUTBOUND_REQUESTS_BULKHEAD.in_flight},
+)
+metrics.Gauge(
+    "nb_fapi_outbound_requests_queued",
+    "Requests to nodes currently waiting for a free slot shared across all nodes.",
+    collect=lambda: {(): OUTBOUND_REQUESTS_BULKHEAD.waiting},
+)
+metrics.Gauge(
+    "nb_fapi_node_requests_in_flight",
+    "Requests to each node currently in flight.",
+    collect=lambda: {
+        (FEDERATION_NODES.get(node_url, node_url),): node_bulkhead.in_flight
+        for node_url, node_bulkhead in NODE_BULKHEADS.items()
+    },
+    label_names=("node",),
+)
+metrics.Gauge(
+    "nb_fapi_node_requests_queued",
+    "Requests to each node currently waiting for a free slot.",
+    collect=lambda: {
+        (FEDERATION_NODES.get(node_url, node_url),): node_bulkhead.waiting
+        for node_url, node_bulkhead in NODE_BULKHEADS.items()
+    },
+    label_names=("node",),
+)
+metrics.Gauge(
+    "nb_fapi_node_http_version",
+    "HTTP protocol version negotiated with each node in its most recent response (always 1).",
+    collect=lambda: {
+        (FEDERATION_NODES.get(node_url, node_url), http_version): 1
+        for node_url, http_version in NODE_HTTP_VERSIONS.items()
+    },
+    label_names=("node", "http_version"),
+    is_summed=False,
+)
+
+# Stores the functions awaited with the URLs of the nodes removed from the node index whenever it is updated,
+# to drop any state derived from the removed nodes that is kept outside of this module (e.g., cached vocabularies)
+NODE_REMOVAL_HANDLERS = []
+
+# Stores the circuit breaker of each node, in the form of {node_url: CircuitBreaker, ...}.
+# NOTE: Circuit breakers and node latencies (below) are kept per worker process (see app.server),
+# so each worker process opens circuits and adapts timeouts based on its own requests to the nodes.
+NODE_CIRCUIT_BREAKERS = {}
+
+# Tracks the recent response latencies of each node per request path, used to set adaptive request timeouts
+NODE_LATENCY_TRACKER = LatencyTracker(
+    window_size=NODE_LATENCY_WINDOW_SIZE.value,
+    min_samples=NODE_LATENCY_MIN_SAMPLES.value,
+    timeout_multiplier=NODE_TIMEOUT_LATENCY_MULTIPLIER.value,
+    min_timeout=NODE_TIMEOUT_MIN.value,
+    max_timeout=NODE_TIMEOUT_MAX.value,
+    default_timeout=NODE_TIMEOUT_DEFAULT.value,
+)
+
 # We use this schema to validate the local_nb_nodes.json file
 # We allow both array type input and a single JSON object
 # Therefore the schema supports both
@@ -134,55 +474,314 @@ def parse_nodes_as_dict(path: Path) -> dict:
     return {}
 
 
-async def create_federation_node_index():
+def load_node_directory_snapshot() -> dict:
+    """
+    Load the public nodes from the snapshot of the last successfully fetched public node directory (if available),
+    along with the validators (ETag and Last-Modified) of the directory response they came from.
+    Returns the public nodes in the snapshot, or an empty dict if there is no valid snapshot.
+    """
+    global NODE_DIRECTORY_VALIDATORS
+
+    snapshot_path = NODE_DIRECTORY_SNAPSHOT_PATH.value
+    if not snapshot_path.is_file():
+        return {}
+    try:
+        snapshot = orjson.loads(snapshot_path.read_bytes())
+        public_nodes = {
+            add_trailing_slash(node["ApiURL"]): node["NodeName"]
+            for node in snapshot["nodes"]
+        }
+    except (OSError, orjson.JSONDecodeError, KeyError, TypeError) as exc:
+        logger.warning(
+            f"Unable to load the public node directory snapshot at {snapshot_path}: {exc}"
+        )
+        return {}
+
+    NODE_DIRECTORY_VALIDATORS = snapshot.get("validators", {})
+    return public_nodes
+
+
+def save_node_directory_snapshot(public_nodes: dict):
+    """
+    Save the public nodes and the validators of the directory response they came from to the snapshot file,
+    replacing any previous snapshot in a single step so that a partially written snapshot is never loaded.
+    """
+    snapshot_path = NODE_DIRECTORY_SNAPSHOT_PATH.value
+    temp_snapshot_path = snapshot_path.with_name(snapshot_path.name + ".tmp")
+    try:
+        temp_snapshot_path.write_bytes(
+            orjson.dumps(
+                {
+                    "validators": NODE_DIRECTORY_VALIDATORS,
+                    "nodes": [
+                        {"NodeName": node_name, "ApiURL": node_url}
+                        for node_url, node_name in public_nodes.items()
+                    ],
+                },
+                option=orjson.OPT_INDENT_2,
+            )
+        )
+        os.replace(temp_snapshot_path, snapshot_path)
+    except OSError as exc:
+        logger.warning(
+            f"Unable to save the public node directory snapshot to {snapshot_path}: {exc}"
+        )
+
+
+async def fetch_public_nodes() -> tuple[dict | None, str]:
+    """
+    Fetch the names and URLs of public Neurobagel nodes from the remote directory file, within the directory timeout.
+    If the public nodes are already known, the request is conditional on the directory having changed
+    (using the ETag and Last-Modified validators of the last response), and the known public nodes are returned
+    if it has not.
+    Successfully fetched directories are saved to the snapshot file.
+
+    Returns the public nodes (or None if the directory could not be fetched) and a warning
+    with the details of the failure if the fetch failed.
+    """
+    global NODE_DIRECTORY_VALIDATORS
+
+    headers = {}
+    if PUBLIC_NODES:
+        if NODE_DIRECTORY_VALIDATORS.get("etag"):
+            headers["If-None-Match"] = NODE_DIRECTORY_VALIDATORS["etag"]
+        if NODE_DIRECTORY_VALIDATORS.get("last_modified"):
+            headers["If-Modified-Since"] = NODE_DIRECTORY_VALIDATORS[
+                "last_modified"
+            ]
+
+    failed_get_warning_lines = [
+        "IS_FEDERATE_REMOTE_PUBLIC_NODES is set to True, but",
+        f"unable to fetch directory of public Neurobagel nodes from {NODE_DIRECTORY_URL}.",
+    ]
+    try:
+        async with httpx.AsyncClient(
+            timeout=NODE_DIRECTORY_TIMEOUT.value
+        ) as client:
+            node_directory_response = await client.get(
+                url=NODE_DIRECTORY_URL,
+                headers=headers,
+                follow_redirects=True,
+            )
+    except httpx.HTTPError as exc:
+        return None, "\n".join(
+            failed_get_warning_lines
+            + [f"Details of the error: {type(exc).__name__}: {exc}\n"]
+        )
+
+    if node_directory_response.status_code == status.HTTP_304_NOT_MODIFIED:
+        return PUBLIC_NODES, ""
+
+    if node_directory_response.is_success:
+        try:
+            public_nodes = {
+                add_trailing_slash(node["ApiURL"]): node["NodeName"]
+                for node in node_directory_response.json()
+            }
+        except (ValueError, KeyError, TypeError, AttributeError) as exc:
+            return None, "\n".join(
+                failed_get_warning_lines
+                + [
+                    "The directory does not have the expected format of a list of nodes with an ApiURL and NodeName.",
+                    f"Details of the error: {type(exc).__name__}: {exc}\n",
+                ]
+            )
+        NODE_DIRECTORY_VALIDATORS = {
+            "etag": node_directory_response.headers.get("ETag"),
+            "last_modified": node_directory_response.headers.get(
+                "Last-Modified"
+            ),
+        }
+        await asyncio.to_thread(save_node_directory_snapshot, public_nodes)
+        return public_nodes, ""
+
+    return None, "\n".join(
+        failed_get_warning_lines
+        + [
+            "Details of the response from the source:",
+            f"Status code {node_directory_response.status_code}: {node_directory_response.reason_phrase}\n",
+        ]
+    )
+
+
+def open_shared_store():
+    """Open the store shared with the other worker processes of the API, if a shared store path is set."""
+    global SHARED_STORE
+
+    if SHARED_STORE_PATH.value:
+        SHARED_STORE = SharedStore(Path(SHARED_STORE_PATH.value))
+
+
+def close_shared_store():
+    """Close the connection of this worker process to the shared store."""
+    global SHARED_STORE
+
+    if SHARED_STORE is not None:
+        SHARED_STORE.close()
+    SHARED_STORE = None
+
+
+async def acquire_shared_lease(name: str, ttl: float) -> bool:
+    """
+    Try to take (or renew) a lease in the shared store for this worker process, returning whether it was granted.
+    Without a shared store (or if the store cannot be reached), every worker process is granted the lease.
+    """
+    if SHARED_STORE is None:
+        return True
+    try:
+        return await asyncio.to_thread(
+            SHARED_STORE.acquire_lease, name, str(os.getpid()), ttl
+        )
+    except sqlite3.Error as exc:
+        logger.warning(f"Failed to acquire the shared lease {name}: {exc}")
+        return True
+
+
+async def get_shared_state(key: str) -> Any | None:
+    """Return a value stored in the shared store by any worker process, or None if there is none."""
+    if SHARED_STORE is None:
+        return None
+    try:
+        shared = await asyncio.to_thread(SHARED_STORE.get, "state", key)
+    except sqlite3.Error as exc:
+        logger.warning(f"Failed to read {key} from the shared store: {exc}")
+        return None
+    return None if shared is None else shared[0]
+
+
+async def set_shared_state(key: str, value: Any):
+    """Store a value in the shared store for the other worker processes, if there is a shared store."""
+    if SHARED_STORE is None:
+        return
+    try:
+        await asyncio.to_thread(SHARED_STORE.set, "state", key, value)
+    except sqlite3.Error as exc:
+        logger.warning(f"Failed to write {key} to the shared store: {exc}")
+
+
+async def update_shared_state(
+    key: str, func: Callable[[Any | None], Any]
+) -> Any | None:
+    """
+    Atomically replace a value in the shared store with the result of func called with the stored value
+    (see SharedStore.update), returning the new value, or None if there is no shared store or it cannot be reached.
+    NOTE: func is called from a worker thread, so it should not modify any state of the event loop.
+    """
+    if SHARED_STORE is None:
+        return None
+    try:
+        return await asyncio.to_thread(SHARED_STORE.update, "state", key, func)
+    except sqlite3.Error as exc:
+        logger.warning(f"Failed to update {key} in the shared store: {exc}")
+        return None
+
+
+async def publish_worker_metrics():
+    """
+    Publish a snapshot of the metrics of this worker process to the shared store, if there is one.
+    Snapshots expire after a few publish intervals, so that the metrics of stopped worker processes are dropped.
+    """
+    if SHARED_STORE is None:
+        return
+    try:
+        await asyncio.to_thread(
+            SHARED_STORE.set,
+            "metrics",
+            str(os.getpid()),
+            metrics.snapshot_metrics(),
+            3 * max(METRICS_PUBLISH_INTERVAL.value, 1),
+        )
+    except (sqlite3.Error, TypeError) as exc:
+        logger.warning(f"Failed to publish the worker metrics: {exc}")
+
+
+async def render_all_worker_metrics() -> str:
+    """
+    Return the metrics of the API in the exposition format, merging the metrics of all worker processes
+    published to the shared store (including the current metrics of this worker process), if there is a shared store.
+    """
+    if SHARED_STORE is None:
+        return metrics.render_metrics()
+    await publish_worker_metrics()
+    try:
+        worker_snapshots = await asyncio.to_thread(
+            SHARED_STORE.get_all, "metrics"
+        )
+    except sqlite3.Error as exc:
+        logger.warning(
+            f"Failed to read the metrics of the other worker processes: {exc}"
+        )
+        return metrics.render_metrics()
+    worker_snapshots[str(os.getpid())] = metrics.snapshot_metrics()
+    return metrics.render_metrics(list(worker_snapshots.values()))
+
+
+async def run_worker_metrics_publishing():
+    """Publish the metrics of this worker process to the shared store every publish interval (see publish_worker_metrics)."""
+    while True:
+        try:
+            await publish_worker_metrics()
+        except Exception:
+            logger.exception(
+                "Failed to publish the metrics of this worker process."
+            )
+        await asyncio.sleep(METRICS_PUBLISH_INTERVAL.value)
+
+
+async def create_federation_node_index() -> bool:
     """
     Creates an index of nodes for federation, which is a dict
     where the keys are the node URLs, and the values are the node names.
-    Fetches the names and URLs of public Neurobagel nodes from a remote
-    directory file, and combines them with the user-defined local nodes.
+    Combines the names and URLs of public Neurobagel nodes with the user-defined local nodes.
+
+    To avoid delaying startup, the public nodes are taken from the snapshot of the last fetched
+    public node directory when one is available, and otherwise federation starts with the local nodes alone
+    (in both cases, the directory is then fetched in the background, see run_node_directory_refreshes).
+    The directory is only fetched right away if there is neither a snapshot nor any local nodes.
+
+    Returns
+    -------
+    bool
+        Whether the directory still needs to be fetched.
     """
-    node_directory_url = "https://raw.githubusercontent.com/neurobagel/menu/main/node_directory/neurobagel_public_nodes.json"
+    global FEDERATION_NODES, PUBLIC_NODES
+
     local_nodes = parse_nodes_as_dict(LOCAL_NODE_INDEX_PATH)
 
     if not local_nodes:
         logger.warning(
             "No local Neurobagel nodes defined or found. Federation "
             " will be limited to nodes available from the "
-            f"Neurobagel public node directory {node_directory_url}. "
+            f"Neurobagel public node directory {NODE_DIRECTORY_URL}. "
             "(To specify one or more local nodes to federate over, "
             "define them in a 'local_nb_nodes.json' file in the "
             "current directory and relaunch the API.)\n"
         )
 
-    node_directory_response = {}
     public_nodes = {}
-    failed_get_warning = ""
+    is_directory_fetch_pending = False
 
     if IS_FEDERATE_REMOTE_PUBLIC_NODES.value:
-        node_directory_response = httpx.get(
-            url=node_directory_url,
-        )
-        # TODO: Handle network errors gracefully
-        if node_directory_response.is_success:
-            public_nodes = {
-                add_trailing_slash(node["ApiURL"]): node["NodeName"]
-                for node in node_directory_response.json()
-            }
+        public_nodes = load_node_directory_snapshot()
+        if public_nodes:
+            is_directory_fetch_pending = True
+            logger.info(
+                f"Loaded {len(public_nodes)} public nodes from the node directory snapshot at "
+                f"{NODE_DIRECTORY_SNAPSHOT_PATH.value}. The directory will be updated in the background."
+            )
+        elif local_nodes:
+            is_directory_fetch_pending = True
+            logger.info(
+                f"No node directory snapshot found at {NODE_DIRECTORY_SNAPSHOT_PATH.value}. "
+                "Federation will start with the local nodes, and the public nodes will be added "
+                "once the directory is fetched in the background."
+            )
         else:
-            failed_get_warning = "\n".join(
-                [
-                    "IS_FEDERATE_REMOTE_PUBLIC_NODES is set to True, but",
-                    f"unable to fetch directory of public Neurobagel nodes from {node_directory_url}.",
-                    "Details of the response from the source:",
-                    f"Status code {node_directory_response.status_code}: {node_directory_response.reason_phrase}\n",
-                ]
+            fetched_public_nodes, failed_get_warning = (
+                await fetch_public_nodes()
             )
-
-            if local_nodes:
-                logger.warning(
-                    failed_get_warning
-                    + f"Federation will be limited to the nodes defined locally for this API: {local_nodes}."
-                )
+            if fetched_public_nodes is not None:
+                public_nodes = fetched_public_nodes
             else:
                 logger.warning(failed_get_warning)
                 log_and_raise_error(
@@ -194,15 +793,511 @@ async def create_federation_node_index():
                     "current directory and try again.",
                 )
 
+    PUBLIC_NODES = public_nodes
     # This step will remove any duplicate keys from the local and public node dicts, giving priority to the local nodes.
-    FEDERATION_NODES.update(
-        {
-            **public_nodes,
-            **local_nodes,
-        }
+    FEDERATION_NODES = {
+        **FEDERATION_NODES,
+        **public_nodes,
+        **local_nodes,
+    }
+    return is_directory_fetch_pending
+
+
+async def update_federation_node_index(nodes: dict):
+    """
+    Replace the node index with a new one, opening pooled HTTP clients for any added nodes
+    and closing those of any removed nodes in the background once their in-flight requests are complete.
+    All other state kept for the removed nodes (e.g., health, circuit breakers and latencies) is dropped,
+    including state kept outside of this module (see NODE_REMOVAL_HANDLERS).
+    Requests that started before the update keep using the previous index.
+    """
+    global FEDERATION_NODES
+
+    previous_nodes = FEDERATION_NODES
+    FEDERATION_NODES = dict(nodes)
+
+    added_node_urls = [
+        node_url
+        for node_url in FEDERATION_NODES
+        if node_url not in previous_nodes
+    ]
+    removed_node_urls = [
+        node_url
+        for node_url in previous_nodes
+        if node_url not in FEDERATION_NODES
+    ]
+    if added_node_urls or removed_node_urls:
+        logger.info(
+            f"Updated the node index: added nodes {added_node_urls}, removed nodes {removed_node_urls}."
+        )
+
+    open_node_http_clients(added_node_urls)
+    removed_clients = {}
+    for node_url in removed_node_urls:
+        NODE_HEALTH.pop(node_url, None)
+        NODE_CIRCUIT_BREAKERS.pop(node_url, None)
+        NODE_HTTP_VERSIONS.pop(node_url, None)
+        NODE_LATENCY_TRACKER.remove_node(node_url)
+        if node_url in NODE_HTTP_CLIENTS:
+            removed_clients[node_url] = NODE_HTTP_CLIENTS.pop(node_url)
+    for node_url, client in removed_clients.items():
+        close_task = asyncio.create_task(
+            close_http_client_when_idle(node_url, client)
+        )
+        NODE_HTTP_CLIENT_CLOSE_TASKS.add(close_task)
+        close_task.add_done_callback(NODE_HTTP_CLIENT_CLOSE_TASKS.discard)
+    if removed_node_urls:
+        for handle_node_removal in NODE_REMOVAL_HANDLERS:
+            await handle_node_removal(removed_node_urls)
+
+
+async def close_http_client_when_idle(
+    node_url: str, client: httpx.AsyncClient, poll_interval: float = 0.5
+):
+    """
+    Close the pooled HTTP client of a removed node once no more requests to the node are in flight
+    (or right away, if cancelled while waiting).
+    """
+    node_bulkhead = NODE_BULKHEADS.get(node_url)
+    try:
+        while node_bulkhead is not None and (
+            node_bulkhead.in_flight or node_bulkhead.waiting
+        ):
+            await asyncio.sleep(poll_interval)
+    finally:
+        await client.aclose()
+    if NODE_BULKHEADS.get(node_url) is node_bulkhead and (
+        node_url not in FEDERATION_NODES
+    ):
+        NODE_BULKHEADS.pop(node_url, None)
+
+
+async def refresh_federation_node_index(is_directory_fetched: bool = False):
+    """
+    Rebuild the node index from the local node file and the public nodes, re-fetching the public node directory
+    if requested (otherwise, the public nodes from the last successful fetch are used).
+    The index is only replaced if it changed, and is kept as is if no nodes would be left.
+    """
+    global PUBLIC_NODES
+
+    local_nodes = parse_nodes_as_dict(LOCAL_NODE_INDEX_PATH)
+    if is_directory_fetched and IS_FEDERATE_REMOTE_PUBLIC_NODES.value:
+        fetched_public_nodes, failed_get_warning = (
+            await fetch_shared_public_nodes()
+        )
+        if fetched_public_nodes is not None:
+            PUBLIC_NODES = fetched_public_nodes
+        elif PUBLIC_NODES:
+            logger.warning(
+                failed_get_warning
+                + "The public nodes from the last successful fetch will be kept."
+            )
+        else:
+            logger.warning(
+                failed_get_warning
+                + f"Federation will be limited to the nodes defined locally for this API: {local_nodes}."
+            )
+
+    nodes = {**PUBLIC_NODES, **local_nodes}
+    if not nodes:
+        logger.warning(
+            "No local or public Neurobagel nodes found when reloading the node index. "
+            "The current node index will be kept."
+        )
+        return
+    if nodes != FEDERATION_NODES:
+        await update_federation_node_index(nodes)
+
+
+async def fetch_shared_public_nodes() -> tuple[dict | None, str]:
+    """
+    Fetch the public nodes as in fetch_public_nodes, sharing them with the other worker processes of the API.
+    Only the worker process holding the node directory lease fetches the directory, while the others use the public nodes
+    it last fetched (or fetch the directory themselves if there are none yet).
+    """
+    lease_ttl = 2 * max(
+        NODE_DIRECTORY_REFRESH_INTERVAL.value, NODE_DIRECTORY_TIMEOUT.value
+    )
+    if not await acquire_shared_lease("node_directory_refreshes", lease_ttl):
+        shared_public_nodes = await get_shared_state("public_nodes")
+        if shared_public_nodes is not None:
+            return shared_public_nodes, ""
+
+    public_nodes, failed_get_warning = await fetch_public_nodes()
+    if public_nodes is not None:
+        await set_shared_state("public_nodes", public_nodes)
+    return public_nodes, failed_get_warning
+
+
+def get_local_node_index_mtime() -> float | None:
+    """Return the last modification time of the local node file, or None if it does not exist."""
+    try:
+        return LOCAL_NODE_INDEX_PATH.stat().st_mtime
+    except OSError:
+        return None
+
+
+async def watch_local_node_index():
+    """Check the local node file for changes every watch interval, and reload the node index when it changes."""
+    last_mtime = get_local_node_index_mtime()
+    while True:
+        await asyncio.sleep(LOCAL_NODE_INDEX_WATCH_INTERVAL.value)
+        mtime = get_local_node_index_mtime()
+        if mtime != last_mtime:
+            logger.info(
+                f"Local node file {LOCAL_NODE_INDEX_PATH} changed, reloading the node index."
+            )
+            try:
+                await refresh_federation_node_index()
+            except Exception:
+                # The reload is retried at the next check
+                logger.exception("Failed to reload the node index.")
+            else:
+                last_mtime = mtime
+
+
+async def run_node_directory_refreshes(is_refreshed_immediately: bool = False):
+    """
+    Re-fetch the public node directory and reload the node index every refresh interval
+    (if the interval is > 0), optionally starting with an immediate refresh.
+    """
+    if is_refreshed_immediately:
+        await refresh_node_directory()
+    while NODE_DIRECTORY_REFRESH_INTERVAL.value > 0:
+        await asyncio.sleep(NODE_DIRECTORY_REFRESH_INTERVAL.value)
+        await refresh_node_directory()
+
+
+async def refresh_node_directory():
+    """Re-fetch the public node directory and reload the node index, logging (rather than raising) any error."""
+    try:
+        await refresh_federation_node_index(is_directory_fetched=True)
+    except Exception:
+        logger.exception(
+            "Failed to refresh the node index from the public node directory."
+        )
+
+
+def check_http2_support():
+    """Check if the h2 package needed for HTTP/2 is installed when HTTP/2 has been enabled."""
+    if IS_HTTP2_ENABLED.value and not IS_HTTP2_AVAILABLE:
+        logger.warning(
+            f"HTTP/2 has been enabled ({IS_HTTP2_ENABLED.name}) but the 'h2' package is not installed. "
+            "Requests to nodes will use HTTP/1.1. "
+            "To use HTTP/2, install the federation API with the 'http2' extra."
+        )
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Create an async HTTP client with a keep-alive connection pool,
+    sized according to the configured connection limits.
+    HTTP/2 is only offered to nodes if it has been enabled and the h2 package is available.
+    """
+    return httpx.AsyncClient(
+        http2=IS_HTTP2_ENABLED.value and IS_HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS_PER_NODE.value,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS_PER_NODE.value,
+            keepalive_expiry=KEEPALIVE_EXPIRY.value,
+        ),
+    )
+
+
+def open_node_http_clients(node_urls: list | dict):
+    """Create a pooled HTTP client for each of the specified nodes that does not already have one."""
+    for node_url in node_urls:
+        if node_url not in NODE_HTTP_CLIENTS:
+            NODE_HTTP_CLIENTS[node_url] = create_http_client()
+
+
+async def close_node_http_clients(node_urls: list | dict | None = None):
+    """
+    Close the pooled HTTP clients of the specified nodes (or of all nodes, if none are specified),
+    releasing any open connections.
+    When closing the clients of all nodes, the clients of removed nodes still waiting for in-flight requests are also closed.
+    """
+    if node_urls is None:
+        node_urls = list(NODE_HTTP_CLIENTS)
+        for close_task in NODE_HTTP_CLIENT_CLOSE_TASKS:
+            close_task.cancel()
+        await asyncio.gather(
+            *NODE_HTTP_CLIENT_CLOSE_TASKS, return_exceptions=True
+        )
+    for node_url in node_urls:
+        client = NODE_HTTP_CLIENTS.pop(node_url, None)
+        if client is not None:
+            await client.aclose()
+
+
+@asynccontextmanager
+async def get_node_http_client(
+    node_url: str | None,
+) -> AsyncIterator[httpx.AsyncClient]:
+    """
+    Yield the pooled HTTP client of a node.
+    If the node has no pooled client (e.g., the app lifespan has not been started), fall back to
+    a short-lived client that is closed once the request is complete.
+    """
+    client = NODE_HTTP_CLIENTS.get(node_url)
+    async with (
+        nullcontext(client) if client is not None else create_http_client()
+    ) as client:
+        yield client
+
+
+def record_node_http_version(node_url: str | None, http_version: str):
+    """
+    Store the HTTP protocol version used in a response from a node,
+    logging when it is first seen or differs from the previous response of the node.
+    """
+    if node_url is None:
+        return
+    previous_http_version = NODE_HTTP_VERSIONS.get(node_url)
+    if http_version != previous_http_version:
+        NODE_HTTP_VERSIONS[node_url] = http_version
+        logger.info(
+            f"Requests to node {FEDERATION_NODES.get(node_url, node_url)} ({node_url}) are using {http_version}."
+        )
+
+
+async def check_node_health(node_url: str):
+    """
+    Send a cheap request to the root of a node API and record whether the node is reachable and how long it took to respond.
+    Any response that is not a server-side error is considered reachable.
+    """
+    error = None
+    request_start = time.perf_counter()
+    async with get_node_http_client(node_url) as client:
+        try:
+            response = await client.get(
+                node_url,
+                timeout=HEALTH_CHECK_TIMEOUT.value,
+                follow_redirects=True,
+            )
+            if response.status_code >= 500:
+                error = f"{response.status_code} {response.reason_phrase}"
+        except httpx.HTTPError as exc:
+            error = f"{type(exc).__name__}: {exc}"
+    latency = time.perf_counter() - request_start
+
+    is_reachable = error is None
+    previous_health = NODE_HEALTH.get(node_url)
+    if previous_health is None or previous_health["is_reachable"] != (
+        is_reachable
+    ):
+        node_name = FEDERATION_NODES.get(node_url, node_url)
+        if is_reachable:
+            logger.info(f"Node {node_name} ({node_url}) is reachable.")
+        else:
+            logger.warning(
+                f"Node {node_name} ({node_url}) is unreachable: {error}"
+            )
+    NODE_HEALTH[node_url] = {
+        "is_reachable": is_reachable,
+        "latency": latency if is_reachable else None,
+        "last_checked": datetime.now(timezone.utc).isoformat(),
+        "error": error,
+    }
+
+
+async def check_all_nodes_health():
+    """Check the health of all nodes known to the API concurrently, dropping results for nodes no longer in the index."""
+    node_urls = list(FEDERATION_NODES)
+    for node_url in set(NODE_HEALTH) - set(node_urls):
+        del NODE_HEALTH[node_url]
+    await asyncio.gather(
+        *(check_node_health(node_url) for node_url in node_urls)
+    )
+
+
+async def run_node_health_checks():
+    """
+    Periodically check the health of all nodes, until cancelled.
+    When there is a shared store, only the worker process holding the health check lease checks the nodes,
+    and the other worker processes use the node health it last recorded.
+    """
+    while True:
+        try:
+            if await acquire_shared_lease(
+                "node_health_checks", 2 * HEALTH_CHECK_INTERVAL.value
+            ):
+                await check_all_nodes_health()
+                await set_shared_state("node_health", NODE_HEALTH)
+            else:
+                load_shared_node_health(await get_shared_state("node_health"))
+        except Exception:
+            logger.exception("Failed to check the health of the nodes.")
+        await asyncio.sleep(HEALTH_CHECK_INTERVAL.value)
+
+
+def load_shared_node_health(shared_node_health: dict | None):
+    """Replace the recorded health of the nodes in the node index with the node health shared by another worker process."""
+    if shared_node_health is None:
+        return
+    for node_url in list(NODE_HEALTH):
+        if node_url not in FEDERATION_NODES:
+            del NODE_HEALTH[node_url]
+    for node_url in FEDERATION_NODES:
+        if node_url in shared_node_health:
+            NODE_HEALTH[node_url] = shared_node_health[node_url]
+
+
+def get_skipped_node_urls() -> list[str]:
+    """
+    Return the URLs of the nodes found unreachable at the last health check, which are skipped in requests to all nodes
+    (none, if this has been disabled or no node is currently reachable).
+    """
+    node_urls = list(FEDERATION_NODES)
+    if not IS_SKIP_UNHEALTHY_NODES.value:
+        return []
+
+    skipped_node_urls = [
+        node_url
+        for node_url in node_urls
+        if not NODE_HEALTH.get(node_url, {}).get("is_reachable", True)
+    ]
+    if len(skipped_node_urls) == len(node_urls):
+        return []
+    return skipped_node_urls
+
+
+def get_available_node_urls() -> list[str]:
+    """
+    Return the URLs of all nodes known to the API, leaving out nodes found unreachable at the last health check
+    (unless this has been disabled or no node is currently reachable).
+    """
+    skipped_node_urls = get_skipped_node_urls()
+    if skipped_node_urls:
+        logger.info(
+            "Skipping nodes found unreachable at the last health check: "
+            f"{[FEDERATION_NODES[node_url] for node_url in skipped_node_urls]}."
+        )
+    return [
+        node_url
+        for node_url in FEDERATION_NODES
+        if node_url not in skipped_node_urls
+    ]
+
+
+def build_unreachable_node_error() -> HTTPException:
+    """Return the error reported for a node skipped because it was unreachable at the last health check."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Request skipped: unreachable at last health check.",
     )
 
 
+async def skip_unreachable_node_request():
+    """Stand in for the request to a node skipped because it was unreachable at the last health check."""
+    raise build_unreachable_node_error()
+
+
+def get_node_circuit_breaker(node_url: str) -> CircuitBreaker:
+    """Return the circuit breaker of a node, creating it if it does not yet exist."""
+    if node_url not in NODE_CIRCUIT_BREAKERS:
+        NODE_CIRCUIT_BREAKERS[node_url] = CircuitBreaker(
+            name=node_url,
+            failure_threshold=CIRCUIT_BREAKER_FAILURE_THRESHOLD.value,
+            reset_timeout=CIRCUIT_BREAKER_RESET_TIMEOUT.value,
+        )
+    return NODE_CIRCUIT_BREAKERS[node_url]
+
+
+def get_node_bulkhead(node_url: str) -> Bulkhead:
+    """Return the bulkhead of a node, creating it if it does not yet exist."""
+    if node_url not in NODE_BULKHEADS:
+        NODE_BULKHEADS[node_url] = Bulkhead(
+            MAX_CONCURRENT_REQUESTS_PER_NODE.value
+        )
+    return NODE_BULKHEADS[node_url]
+
+
+@asynccontextmanager
+async def node_request_slot(node_url: str | None) -> AsyncIterator[None]:
+    """
+    Wait until a request can be sent without exceeding the concurrency limits of the node
+    and of all outbound requests, and hold the slot for the duration of the context.
+    """
+    # The node slot is acquired first, so that requests queued for a slow node do not hold up slots
+    # shared with requests to other nodes
+    async with (
+        get_node_bulkhead(node_url).slot()
+        if node_url is not None
+        else nullcontext()
+    ):
+        async with OUTBOUND_REQUESTS_BULKHEAD.slot():
+            yield
+
+
+def calculate_deadline(time_budget: float | None = None) -> float | None:
+    """
+    Return the time (on the monotonic clock) by which a federated query must be complete,
+    given a time budget in seconds (defaulting to the server-wide budget), or None if no deadline applies.
+    """
+    if time_budget is None:
+        time_budget = FEDERATION_DEADLINE.value
+    if time_budget <= 0:
+        return None
+    return time.monotonic() + time_budget
+
+
+def build_query_fingerprint(
+    path: str,
+    query: dict,
+    token: str | None = None,
+    time_budget: float | None = None,
+) -> str:
+    """
+    Return a canonical string representation of a federated query, such that identical queries from the same user
+    (i.e., to the same path, with the same query parameters, queried nodes and datasets, time budget and token)
+    have the same fingerprint regardless of the order in which nodes, datasets or parameters were given.
+    The token itself is hashed, so it is not exposed in the fingerprint.
+    """
+    canonical_query = deepcopy(query)
+    if canonical_query.get("nodes"):
+        for node in canonical_query["nodes"]:
+            node["node_url"] = add_trailing_slash(node["node_url"])
+            if node.get("dataset_uuids") is not None:
+                node["dataset_uuids"] = sorted(node["dataset_uuids"])
+        canonical_query["nodes"] = sorted(
+            canonical_query["nodes"], key=lambda node: node["node_url"]
+        )
+    if canonical_query.get("dataset_uuids"):
+        canonical_query["dataset_uuids"] = sorted(
+            canonical_query["dataset_uuids"]
+        )
+    if canonical_query.get("node_url"):
+        canonical_query["node_url"] = sorted(
+            add_trailing_slash(node_url)
+            for node_url in canonical_query["node_url"]
+            if node_url
+        )
+
+    return orjson.dumps(
+        {
+            "path": path,
+            "query": canonical_query,
+            "time_budget": time_budget,
+            "identity": (
+                hashlib.sha256(token.encode()).hexdigest() if token else None
+            ),
+        },
+        option=orjson.OPT_SORT_KEYS,
+    ).decode()
+
+
+def get_node_request_path(url: str, node_url: str) -> str:
+    """
+    Return the path of a request URL relative to the node URL, e.g. "subjects",
+    with any pipeline term replaced by a placeholder so that all pipeline version requests share a single path.
+    """
+    path = url.removeprefix(node_url)
+    if path.startswith("pipelines/") and path.endswith("/versions"):
+        return "pipelines/{pipeline_term}/versions"
+    return path
+
+
 def check_nodes_are_recognized(node_urls: list):
     """
     Check that all node URLs specified in the query exist in the node index for the API instance.
@@ -233,8 +1328,8 @@ def validate_query_node_url_list(node_urls: list) -> list:
         node_urls = list(dict.fromkeys(node_urls))
         check_nodes_are_recognized(node_urls)
     else:
-        # default to searching over all known nodes
-        node_urls = list(FEDERATION_NODES.keys())
+        # default to searching over all known (and reachable) nodes
+        node_urls = get_available_node_urls()
     return node_urls
 
 
@@ -277,7 +1372,7 @@ def validate_and_format_queried_nodes(
         check_nodes_are_recognized(cleaned_node_urls)
         return nodes_to_query
 
-    return [{"node_url": node_url} for node_url in FEDERATION_NODES]
+    return [{"node_url": node_url} for node_url in get_available_node_urls()]
 
 
 async def send_request(
@@ -287,12 +1382,16 @@ async def send_request(
     body: dict | None = None,
     token: str | None = None,
     timeout: float | None = None,
+    node_url: str | None = None,
+    deadline: float | None = None,
 ) -> dict:
     """
     Makes a request to one or more Neurobagel nodes.
 
     Parameters
     ----------
+    method : str
+        HTTP method of the request.
     url : str
         URL of Neurobagel node API.
     params : dict, optional
@@ -303,6 +1402,13 @@ async def send_request(
         Authorization token for the request, by default None.
     timeout : float, optional
         Timeout for the request, by default None.
+        If None and the node URL is provided, an adaptive timeout based on the recently observed latencies of the node is used.
+    node_url : str, optional
+        Base URL of the node the request is sent to, used to reuse the pooled HTTP client of the node
+        and to track the latencies and failures of the node, by default None.
+    deadline : float, optional
+        Time (on the monotonic clock) by which the federated query must be complete, by default None.
+        If provided, the timeout is capped by the remaining time budget, which is also sent to the node in a header.
 
     Returns
     -------
@@ -315,55 +1421,209 @@ async def send_request(
     HTTPException
         _description_
     """
-    async with httpx.AsyncClient() as client:
-        headers = {
-            "Content-Type": "application/json",
-            **({"Authorization": f"Bearer {token}"} if token else {}),
-        }
+    circuit_breaker = None
+    request_path = None
+    adaptive_timeout = None
+    if node_url is not None:
+        circuit_breaker = get_node_circuit_breaker(node_url)
+        request_path = get_node_request_path(url, node_url)
+        if not circuit_breaker.allow_request():
+            record_node_request(
+                node_url, request_path, "error", "circuit_open"
+            )
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Request skipped due to circuit open: the node has failed repeatedly and will be retried after a cooldown.",
+            )
+        if timeout is None:
+            adaptive_timeout = NODE_LATENCY_TRACKER.get_timeout(
+                node_url, request_path
+            )
+            timeout = adaptive_timeout
+
+    headers = {
+        "Content-Type": "application/json",
+        **({"Authorization": f"Bearer {token}"} if token else {}),
+    }
+    # Forward the ID of the request being handled, so that the request can be correlated with the node's own logs
+    request_id = tracing.get_request_id()
+    if request_id is not None:
+        headers[tracing.REQUEST_ID_HEADER] = request_id
+
+    async with (
+        node_request_slot(node_url),
+        get_node_http_client(node_url) as client,
+    ):
+        # The remaining time budget is only calculated once the request can be sent,
+        # to account for any time spent waiting for a free slot
+        if deadline is not None:
+            remaining_time = max(deadline - time.monotonic(), 0)
+            headers[DEADLINE_HEADER] = f"{remaining_time:.3f}"
+            timeout = (
+                remaining_time
+                if timeout is None
+                else min(timeout, remaining_time)
+            )
         try:
-            response = await client.request(
+            request_start = time.perf_counter()
+            with tracing.span(
+                "node_request",
+                node=FEDERATION_NODES.get(node_url, node_url),
                 method=method,
-                url=url,
-                params=params,  # used for GET, ignored for POST
-                json=body,  # used for POST, ignored for GET
-                headers=headers,
-                timeout=timeout,
-                # Enable redirect following (off by default) so
-                # APIs behind a proxy can be reached
-                follow_redirects=True,
-            )
+                path=request_path,
+            ) as span_attributes:
+                response = await client.request(
+                    method=method,
+                    url=url,
+                    params=params,  # used for GET, ignored for POST
+                    json=body,  # used for POST, ignored for GET
+                    headers=headers,
+                    timeout=timeout,
+                    # Enable redirect following (off by default) so
+                    # APIs behind a proxy can be reached
+                    follow_redirects=True,
+                )
+                span_attributes["status_code"] = response.status_code
+            if node_url is not None:
+                request_duration = time.perf_counter() - request_start
+                NODE_LATENCY_TRACKER.record(
+                    node_url, request_path, request_duration
+                )
+                node_name = FEDERATION_NODES.get(node_url, node_url)
+                metrics.NODE_REQUEST_DURATION.observe(
+                    request_duration, node_name, request_path
+                )
+                metrics.NODE_RESPONSE_SIZE.observe(
+                    len(response.content), node_name, request_path
+                )
+                timing.record_node(node_name, request_duration)
+            record_node_http_version(node_url, response.http_version)
+            if circuit_breaker is not None:
+                # Only server-side errors indicate that the node itself is unhealthy
+                if response.status_code >= 500:
+                    circuit_breaker.record_failure()
+                else:
+                    circuit_breaker.record_success()
             if not response.is_success:
+                record_node_request(
+                    node_url,
+                    request_path,
+                    "error",
+                    f"http_{response.status_code // 100}xx",
+                )
                 raise HTTPException(
                     status_code=response.status_code,
                     detail=f"{response.reason_phrase}: {response.text}",
                 )
-            return response.json()
+            with timing.measure("decode"):
+                response_json = response.json()
+            record_node_request(node_url, request_path, "success")
+            return response_json
         # Make sure that any HTTPException raised by us is not then caught by the most generic Exception block below
         # (from https://stackoverflow.com/a/16123643)
         except HTTPException:
             raise
+        except asyncio.CancelledError:
+            # E.g., the federation deadline passed before the node responded
+            record_node_request(node_url, request_path, "cancelled")
+            raise
         except httpx.NetworkError as exc:
+            record_node_request(node_url, request_path, "error", "network")
+            if circuit_breaker is not None:
+                circuit_breaker.record_failure()
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail=f"Request failed due to a network error or because the node API could not be reached: {exc}",
             ) from exc
         except httpx.TimeoutException as exc:
+            record_node_request(
+                node_url, request_path, "timeout", type(exc).__name__
+            )
+            adaptive_timeout_expired = (
+                adaptive_timeout is not None and timeout == adaptive_timeout
+            )
+            if adaptive_timeout_expired:
+                NODE_LATENCY_TRACKER.record_timeout(
+                    node_url, request_path, timeout
+                )
+            # A timeout shortened below the default timeout by the observed latencies of the node
+            # is not counted as a failure of the node, as the node may just be slower than usual (the timeout is backed off instead)
+            if circuit_breaker is not None and not (
+                adaptive_timeout_expired
+                and timeout < NODE_LATENCY_TRACKER.default_timeout
+            ):
+                circuit_breaker.record_failure()
             raise HTTPException(
                 status_code=status.HTTP_504_GATEWAY_TIMEOUT,
                 detail=f"Request failed due to a timeout: {exc}",
             ) from exc
         except httpx.RequestError as exc:
+            record_node_request(
+                node_url, request_path, "error", type(exc).__name__
+            )
+            if circuit_breaker is not None:
+                circuit_breaker.record_failure()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Request failed due to an error: {exc}",
             ) from exc
         except Exception as exc:
+            record_node_request(
+                node_url, request_path, "error", type(exc).__name__
+            )
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"An unexpected error was encountered: {exc}",
             ) from exc
 
 
+def record_node_request(
+    node_url: str | None,
+    request_path: str | None,
+    outcome: str,
+    error_class: str = "",
+):
+    """Count a request to a node by its outcome and, for failed requests, the class of error."""
+    if node_url is not None:
+        metrics.NODE_REQUESTS.inc(
+            FEDERATION_NODES.get(node_url, node_url),
+            request_path,
+            outcome,
+            error_class,
+        )
+
+
+def get_stream_media_type(stream: bool, accept: str | None) -> str | None:
+    """
+    Return the media type in which streamed results were requested, either via the stream flag (newline-delimited JSON)
+    or the Accept header of a request (newline-delimited JSON or server-sent events), or None if no streaming was requested.
+    """
+    accept = accept or ""
+    if SSE_MEDIA_TYPE in accept:
+        return SSE_MEDIA_TYPE
+    if stream or NDJSON_MEDIA_TYPE in accept:
+        return NDJSON_MEDIA_TYPE
+    return None
+
+
+async def encode_stream(
+    events: AsyncIterator[dict], media_type: str
+) -> AsyncIterator[bytes]:
+    """
+    Serialize each event from an iterator in the given streaming media type, i.e.
+    as a line of newline-delimited JSON, or as a server-sent event named after the event type.
+    """
+    async for event in events:
+        if media_type == SSE_MEDIA_TYPE:
+            yield (
+                f"event: {event['event']}\ndata: ".encode()
+                + orjson.dumps(event["data"])
+                + b"\n\n"
+            )
+        else:
+            yield orjson.dumps(event) + b"\n"
+
+
 def is_valid_dict_response(
     response: Any, find_key: str | None = None
 ) -> tuple[bool, str]:
@@ -1,7 +1,8 @@
 """Main app."""
 
+import asyncio
 import logging
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 
 import uvicorn
 from fastapi import FastAPI, Request
@@ -9,18 +10,24 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
 from fastapi.responses import HTMLResponse, ORJSONResponse, RedirectResponse
 
+from .api import crud, security, tracing
 from .api import utility as util
+from .api.metrics import MetricsMiddleware
 from .api.routers import (
+    admin,
     assessments,
     datasets,
     diagnoses,
     imaging_modalities,
+    metrics,
     nodes,
     pipelines,
     query,
     subjects,
+    vocabularies,
 )
-from .api.security import check_client_id
+from .api.timing import ServerTimingMiddleware
+from .api.tracing import TracingMiddleware
 
 # Configure root logging once so all loggers (including the httpx logger and custom app logger)
 # inherit same formatting
@@ -36,12 +43,71 @@ favicon_url = "https://raw.githubusercontent.com/neurobagel/documentation/main/d
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
-    Collect and store locally defined and public node details for federation upon startup and clears the index upon shutdown.
+    Collect and store locally defined and public node details for federation, open a pooled HTTP client for each node,
+    and start periodic node health checks, node index reloads and identity provider public key refreshes upon startup.
+    Stop the background tasks, close the clients and clear the index and caches upon shutdown.
     """
-    check_client_id()
-    await util.create_federation_node_index()
+    security.check_client_id()
+    util.check_http2_support()
+    util.open_shared_store()
+    tracing.configure_exporters(
+        buffer_size=util.TRACE_BUFFER_SIZE.value,
+        file_path=util.TRACE_FILE_PATH.value,
+    )
+    crud.share_caches(util.SHARED_STORE)
+    is_directory_fetch_pending = await util.create_federation_node_index()
+    util.open_node_http_clients(util.FEDERATION_NODES)
+    background_tasks = []
+    if util.HEALTH_CHECK_INTERVAL.value > 0:
+        background_tasks.append(
+            asyncio.create_task(util.run_node_health_checks())
+        )
+    if util.LOCAL_NODE_INDEX_WATCH_INTERVAL.value > 0:
+        background_tasks.append(
+            asyncio.create_task(util.watch_local_node_index())
+        )
+    if util.IS_FEDERATE_REMOTE_PUBLIC_NODES.value and (
+        is_directory_fetch_pending
+        or util.NODE_DIRECTORY_REFRESH_INTERVAL.value > 0
+    ):
+        # The directory is fetched right away if startup went ahead without it (from the snapshot or the local nodes alone)
+        background_tasks.append(
+            asyncio.create_task(
+                util.run_node_directory_refreshes(
+                    is_refreshed_immediately=is_directory_fetch_pending
+                )
+            )
+        )
+    if (
+        util.SHARED_STORE is not None
+        and util.IS_METRICS_ENABLED.value
+        and util.METRICS_PUBLISH_INTERVAL.value > 0
+    ):
+        background_tasks.append(
+            asyncio.create_task(util.run_worker_metrics_publishing())
+        )
+    if security.AUTH_ENABLED and util.JWKS_REFRESH_INTERVAL.value > 0:
+        background_tasks.append(
+            asyncio.create_task(security.run_jwks_refreshes())
+        )
     yield
-    util.FEDERATION_NODES.clear()
+    for task in background_tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await util.close_node_http_clients()
+    util.NODE_HEALTH.clear()
+    crud.VOCABULARY_CACHE.clear()
+    crud.PIPELINE_VERSIONS_CACHE.clear()
+    crud.NODE_VOCABULARY_INDEX.clear()
+    crud.DATASET_NODE_INDEX.clear()
+    crud.QUERY_SESSION_CACHE.clear()
+    util.FEDERATION_NODES = {}
+    security.VERIFIED_TOKEN_CACHE.clear()
+    security.JWK_SET = None
+    crud.share_caches(None)
+    util.close_shared_store()
+    tracing.close_exporters()
 
 
 app = FastAPI(
@@ -60,6 +126,12 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(
+    ServerTimingMiddleware,
+    is_debug_enabled=lambda: util.IS_TIMING_DEBUG_ENABLED.value,
+)
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -156,6 +228,9 @@ app.include_router(diagnoses.router)
 app.include_router(pipelines.router)
 app.include_router(imaging_modalities.router)
 app.include_router(nodes.router)
+app.include_router(vocabularies.router)
+app.include_router(metrics.router)
+app.include_router(admin.router)
 
 # Automatically start uvicorn server on execution of main.py
 if __name__ == "__main__":
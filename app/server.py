@@ -0,0 +1,80 @@
+"""
+Production server entry point, which runs the API in one or more uvicorn worker processes.
+
+Run with `python -m app.server`. With more than one worker process (set with NB_FAPI_WORKERS),
+the worker processes share the public node directory, node health, cached vocabularies and metrics
+through a SQLite-backed shared store (see app.api.shared_store).
+All other state is kept per worker process: the coalescing of identical concurrent queries, the node circuit breakers
+and latencies, and the datasets found in each node by POST /datasets queries (used to narrow down POST /subjects queries).
+"""
+
+import importlib.util
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+import uvicorn
+
+from .api.utility import EnvVar
+
+logger = logging.getLogger(__name__)
+
+HOST = EnvVar("NB_API_HOST", os.environ.get("NB_API_HOST", "0.0.0.0"))
+PORT = EnvVar("NB_API_PORT", int(os.environ.get("NB_API_PORT", "8000")))
+# Number of worker processes, which defaults to a single process.
+# The CPU count of the host is not used as the default, since it is usually not the CPU quota of a container.
+WORKERS = EnvVar(
+    "NB_FAPI_WORKERS",
+    int(os.environ.get("NB_FAPI_WORKERS", "1")),
+)
+SHARED_STORE_PATH = EnvVar(
+    "NB_FAPI_SHARED_STORE_PATH",
+    os.environ.get(
+        "NB_FAPI_SHARED_STORE_PATH",
+        str(Path(tempfile.gettempdir()) / "nb_fapi_shared_store.sqlite3"),
+    ),
+)
+
+# The faster uvloop event loop and httptools HTTP parser are used when installed (e.g., with uvicorn[standard])
+IS_UVLOOP_AVAILABLE = importlib.util.find_spec("uvloop") is not None
+IS_HTTPTOOLS_AVAILABLE = importlib.util.find_spec("httptools") is not None
+
+
+def reset_shared_store(path: Path):
+    """Remove any shared store left over from a previous run, so that the worker processes start from an empty store."""
+    for leftover_path in (
+        path,
+        path.with_name(path.name + "-wal"),
+        path.with_name(path.name + "-shm"),
+    ):
+        leftover_path.unlink(missing_ok=True)
+
+
+def main():
+    """Start the API server with the configured number of worker processes."""
+    logging.basicConfig(level=logging.INFO)
+
+    workers = max(WORKERS.value, 1)
+    if workers > 1 and SHARED_STORE_PATH.value:
+        reset_shared_store(Path(SHARED_STORE_PATH.value))
+        # The worker processes read their settings from the environment when importing the app
+        os.environ[SHARED_STORE_PATH.name] = SHARED_STORE_PATH.value
+        logger.info(
+            f"Starting {workers} worker processes sharing the store at {SHARED_STORE_PATH.value}."
+        )
+
+    uvicorn.run(
+        "app.main:app",
+        host=HOST.value,
+        port=PORT.value,
+        workers=workers,
+        loop="uvloop" if IS_UVLOOP_AVAILABLE else "asyncio",
+        http="httptools" if IS_HTTPTOOLS_AVAILABLE else "h11",
+        proxy_headers=True,
+        forwarded_allow_ips="*",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Tools for benchmarking the federation API against simulated Neurobagel nodes."""
@@ -0,0 +1,567 @@
+"""
+Load benchmark of the federation API against simulated nodes (see benchmarks.stub_node).
+
+Each scenario drives the app (including its lifespan, middleware and node HTTP clients) with a number of
+concurrent clients sending requests back-to-back to one endpoint, and measures the throughput, the latency
+percentiles of the responses, the event loop lag and the peak resident memory (RSS) of the process.
+Scenarios are swept over the endpoints, number of nodes, subjects per dataset (payload size) and client concurrency,
+and the results are written to a JSON file which can be compared with the results of another commit, e.g.:
+
+    python -m benchmarks.load_test run --nodes 1,10,50,200 --subjects 10,100 --concurrency 1,10,50 --output new.json
+    python -m benchmarks.load_test compare old.json new.json
+
+NOTE: To get reproducible numbers without any network access, the app, the stub nodes and the clients all run in the
+same process and event loop (requests are passed in memory through ASGI transports), so the measurements exclude
+socket I/O and include the time spent by the clients and stub nodes. Each scenario runs in a fresh process,
+so that caches and memory usage do not carry over between scenarios.
+App settings can be changed through the usual environment variables (e.g., NB_FAPI_VOCAB_CACHE_TTL=0).
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator
+
+import httpx
+import orjson
+
+from app.api.latency import calculate_percentile
+from benchmarks.stub_node import (
+    LatencyDistribution,
+    build_stub_node_settings,
+    create_in_process_stub_nodes,
+    write_local_node_index,
+)
+
+# Requests sent to each benchmarked endpoint, in the form of {endpoint: (method, path), ...}
+ENDPOINT_REQUESTS = {
+    "query": ("GET", "/query"),
+    "datasets": ("POST", "/datasets"),
+    "subjects": ("POST", "/subjects"),
+    "assessments": ("GET", "/assessments"),
+    "diagnoses": ("GET", "/diagnoses"),
+    "imaging-modalities": ("GET", "/imaging-modalities"),
+    "pipelines": ("GET", "/pipelines"),
+}
+# Endpoints taking Neurobagel query parameters, for which the clients cycle through QUERIES
+QUERY_ENDPOINTS = ("query", "datasets", "subjects")
+# Varied queries, so that the results do not only reflect identical queries being coalesced
+QUERIES = [
+    {},
+    {"min_age": 30},
+    {"min_age": 60, "max_age": 80},
+    {"sex": "snomed:248152002"},
+    {"diagnosis": "snomed:49049000"},
+    {"diagnosis": "ncit:C94342", "min_num_imaging_sessions": 1},
+    {"assessment": "cogatlas:trm_4d559bcd67c18"},
+    {"image_modal": "nidm:T1Weighted", "pipeline_name": "np:fmriprep"},
+]
+
+# App settings for benchmarking, unless set otherwise in the environment:
+# only the stub nodes are federated over, and the local node index is not reloaded during the benchmark
+APP_ENVIRONMENT_DEFAULTS = {
+    "NB_FEDERATE_REMOTE_PUBLIC_NODES": "False",
+    "NB_ENABLE_AUTH": "False",
+    "NB_FAPI_LOCAL_NODE_INDEX_WATCH_INTERVAL": "0",
+}
+
+# Interval in seconds at which the event loop lag is sampled
+EVENT_LOOP_LAG_SAMPLE_INTERVAL = 0.01
+
+
+def summarize(values: list[float], scale: float = 1) -> dict | None:
+    """Return the mean, p50, p95, p99 and maximum of a list of values multiplied by a scale, or None if there are no values."""
+    if not values:
+        return None
+    sorted_values = sorted(values)
+    return {
+        "mean": round(sum(sorted_values) / len(sorted_values) * scale, 3),
+        **{
+            f"p{percentile}": round(
+                calculate_percentile(sorted_values, percentile) * scale, 3
+            )
+            for percentile in (50, 95, 99)
+        },
+        "max": round(sorted_values[-1] * scale, 3),
+    }
+
+
+def get_peak_rss() -> int:
+    """Return the peak resident memory of the current process so far, in bytes."""
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # The peak RSS is reported in bytes on macOS and in kilobytes on Linux
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+class LoadRecorder:
+    """Records the latency, status code and size of the responses to the benchmark requests, and the event loop lag."""
+
+    def __init__(self):
+        self.latencies = []
+        self.response_sizes = []
+        # In the form of {status_code: count, ...}, where failed requests have the status code "error"
+        self.status_counts = {}
+        self.event_loop_lags = []
+
+    def record_response(
+        self, latency: float, status_code: int | str, response_size: int
+    ):
+        self.latencies.append(latency)
+        self.response_sizes.append(response_size)
+        status_code = str(status_code)
+        self.status_counts[status_code] = (
+            self.status_counts.get(status_code, 0) + 1
+        )
+
+    def get_error_count(self) -> int:
+        """Return the number of requests that failed or received a server-side error response."""
+        return sum(
+            count
+            for status_code, count in self.status_counts.items()
+            if not status_code.isdigit() or int(status_code) >= 500
+        )
+
+
+async def sample_event_loop_lag(recorder: LoadRecorder):
+    """Record how late the event loop wakes up from short sleeps, i.e. how long it is blocked, until cancelled."""
+    while True:
+        sleep_start = time.perf_counter()
+        await asyncio.sleep(EVENT_LOOP_LAG_SAMPLE_INTERVAL)
+        recorder.event_loop_lags.append(
+            max(
+                time.perf_counter()
+                - sleep_start
+                - EVENT_LOOP_LAG_SAMPLE_INTERVAL,
+                0,
+            )
+        )
+
+
+async def send_requests(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    queries: itertools.cycle,
+    stop_at: float,
+    recorder: LoadRecorder,
+):
+    """Send requests to an endpoint one after the other until the stop time, recording each response."""
+    method, path = ENDPOINT_REQUESTS[endpoint]
+    while time.perf_counter() < stop_at:
+        request_kwargs = {}
+        if endpoint in QUERY_ENDPOINTS:
+            query = next(queries)
+            request_kwargs = (
+                {"params": query} if method == "GET" else {"json": query}
+            )
+        request_start = time.perf_counter()
+        try:
+            response = await client.request(method, path, **request_kwargs)
+            status_code, response_size = response.status_code, len(
+                response.content
+            )
+        except httpx.HTTPError:
+            status_code, response_size = "error", 0
+        recorder.record_response(
+            time.perf_counter() - request_start, status_code, response_size
+        )
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    concurrency: int,
+    duration: float,
+) -> tuple[LoadRecorder, float]:
+    """Send requests to an endpoint from a number of concurrent clients for a duration, returning the recorded load and its actual duration."""
+    recorder = LoadRecorder()
+    queries = itertools.cycle(QUERIES)
+    lag_sampler = asyncio.create_task(sample_event_loop_lag(recorder))
+    load_start = time.perf_counter()
+    try:
+        await asyncio.gather(
+            *(
+                send_requests(
+                    client,
+                    endpoint,
+                    queries,
+                    stop_at=load_start + duration,
+                    recorder=recorder,
+                )
+                for _ in range(concurrency)
+            )
+        )
+    finally:
+        lag_sampler.cancel()
+    return recorder, time.perf_counter() - load_start
+
+
+@asynccontextmanager
+async def federate_over_stub_nodes(
+    num_nodes: int, **settings_kwargs
+) -> AsyncIterator[httpx.AsyncClient]:
+    """
+    Start the app federating over in-process stub nodes with the given settings,
+    and yield a client sending requests to the app.
+    """
+    from app.api import utility as util
+    from app.main import app
+
+    nodes, transport = create_in_process_stub_nodes(
+        build_stub_node_settings(num_nodes, **settings_kwargs)
+    )
+    local_node_index_path = util.LOCAL_NODE_INDEX_PATH
+    create_http_client = util.create_http_client
+    with tempfile.TemporaryDirectory() as temp_dir:
+        util.LOCAL_NODE_INDEX_PATH = Path(temp_dir) / "local_nb_nodes.json"
+        write_local_node_index(nodes, util.LOCAL_NODE_INDEX_PATH)
+        util.create_http_client = lambda: httpx.AsyncClient(
+            transport=transport
+        )
+        try:
+            async with app.router.lifespan_context(app):
+                async with httpx.AsyncClient(
+                    transport=httpx.ASGITransport(app=app),
+                    base_url="http://federation.local",
+                    timeout=None,
+                ) as client:
+                    yield client
+        finally:
+            util.LOCAL_NODE_INDEX_PATH = local_node_index_path
+            util.create_http_client = create_http_client
+
+
+async def measure_scenario(
+    endpoint: str,
+    num_nodes: int,
+    subjects_per_dataset: int,
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    **settings_kwargs,
+) -> dict:
+    """Run the load of a scenario after a warmup period (whose responses are not recorded) and return its results."""
+    async with federate_over_stub_nodes(
+        num_nodes, subjects_per_dataset=subjects_per_dataset, **settings_kwargs
+    ) as client:
+        if warmup > 0:
+            await run_load(client, endpoint, concurrency, warmup)
+        rss_before_load = get_peak_rss()
+        recorder, load_duration = await run_load(
+            client, endpoint, concurrency, duration
+        )
+
+    return {
+        "endpoint": endpoint,
+        "num_nodes": num_nodes,
+        "subjects_per_dataset": subjects_per_dataset,
+        "concurrency": concurrency,
+        "duration_s": round(load_duration, 3),
+        "requests": len(recorder.latencies),
+        "errors": recorder.get_error_count(),
+        "status_counts": recorder.status_counts,
+        "throughput_rps": round(len(recorder.latencies) / load_duration, 3),
+        "latency_ms": summarize(recorder.latencies, scale=1000),
+        "response_size_bytes": summarize(recorder.response_sizes),
+        "event_loop_lag_ms": summarize(recorder.event_loop_lags, scale=1000),
+        "peak_rss_before_load_bytes": rss_before_load,
+        "peak_rss_bytes": get_peak_rss(),
+    }
+
+
+def run_scenario(scenario: dict) -> dict:
+    """Run a scenario in the current process (see measure_scenario)."""
+    # Logging every request to the nodes would slow down the app
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    return asyncio.run(measure_scenario(**scenario))
+
+
+def run_scenario_in_new_process(scenario: dict) -> dict:
+    """Run a scenario in a fresh process, so that its caches and memory usage are not affected by other scenarios."""
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        return executor.submit(run_scenario, scenario).result()
+
+
+def get_git_revision() -> dict:
+    """Return the current commit of the repository and whether it has uncommitted changes, if available."""
+    repo_path = Path(__file__).parents[1]
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=repo_path,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=repo_path,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "is_dirty": None}
+    return {"commit": commit, "is_dirty": bool(status.strip())}
+
+
+def format_result(result: dict) -> str:
+    latency = result["latency_ms"] or {}
+    lag = result["event_loop_lag_ms"] or {}
+    return (
+        f"{result['endpoint']:<20} nodes={result['num_nodes']:<4} subjects={result['subjects_per_dataset']:<5} "
+        f"concurrency={result['concurrency']:<4} {result['throughput_rps']:>9.1f} req/s  "
+        f"p50={latency.get('p50', 0):>8.1f}ms p95={latency.get('p95', 0):>8.1f}ms p99={latency.get('p99', 0):>8.1f}ms  "
+        f"lag p99={lag.get('p99', 0):>6.1f}ms  rss={result['peak_rss_bytes'] / 2**20:>6.0f}MiB  errors={result['errors']}"
+    )
+
+
+def run_benchmarks(args: argparse.Namespace):
+    """Run all scenarios of the sweep, printing each result, and write the results to the output file."""
+    for name, value in APP_ENVIRONMENT_DEFAULTS.items():
+        # Spawned scenario processes read the app settings from the environment when importing the app
+        os.environ.setdefault(name, value)
+
+    settings_kwargs = {
+        "num_datasets": args.datasets,
+        "latency": args.latency,
+        "error_rate": args.error_rate,
+        "records_protected": args.protected,
+        "seed": args.seed,
+    }
+    results = []
+    started_at = datetime.now(timezone.utc).isoformat()
+    for (
+        endpoint,
+        num_nodes,
+        subjects_per_dataset,
+        concurrency,
+    ) in itertools.product(
+        args.endpoints, args.nodes, args.subjects, args.concurrency
+    ):
+        scenario = {
+            "endpoint": endpoint,
+            "num_nodes": num_nodes,
+            "subjects_per_dataset": subjects_per_dataset,
+            "concurrency": concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            **settings_kwargs,
+        }
+        result = run_scenario_in_new_process(scenario)
+        results.append(result)
+        print(format_result(result), flush=True)
+
+    args.output.write_bytes(
+        orjson.dumps(
+            {
+                "metadata": {
+                    **get_git_revision(),
+                    "started_at": started_at,
+                    "python_version": platform.python_version(),
+                    "platform": platform.platform(),
+                    "cpu_count": os.cpu_count(),
+                    "app_environment": {
+                        name: value
+                        for name, value in os.environ.items()
+                        if name.startswith("NB_")
+                    },
+                    "settings": {
+                        "duration": args.duration,
+                        "warmup": args.warmup,
+                        **settings_kwargs,
+                        "latency": {
+                            "kind": args.latency.kind,
+                            "params": args.latency.params,
+                        },
+                    },
+                },
+                "results": results,
+            },
+            option=orjson.OPT_INDENT_2,
+        )
+    )
+    print(f"Wrote {len(results)} results to {args.output}.")
+
+
+def get_scenario_key(result: dict) -> tuple:
+    return (
+        result["endpoint"],
+        result["num_nodes"],
+        result["subjects_per_dataset"],
+        result["concurrency"],
+    )
+
+
+def format_change(baseline: float | None, value: float | None) -> str:
+    if not baseline or value is None:
+        return "n/a"
+    return f"{(value - baseline) / baseline:+.1%}"
+
+
+def compare_results(baseline_path: Path, path: Path) -> list[dict]:
+    """
+    Return the relative change in throughput and latency percentiles for each scenario found in both result files,
+    e.g. from the benchmarks of two commits.
+    """
+    baseline_results = {
+        get_scenario_key(result): result
+        for result in orjson.loads(baseline_path.read_bytes())["results"]
+    }
+    comparisons = []
+    for result in orjson.loads(path.read_bytes())["results"]:
+        baseline_result = baseline_results.get(get_scenario_key(result))
+        if baseline_result is None:
+            continue
+        baseline_latency = baseline_result["latency_ms"] or {}
+        latency = result["latency_ms"] or {}
+        comparisons.append(
+            {
+                "scenario": get_scenario_key(result),
+                "throughput_rps": format_change(
+                    baseline_result["throughput_rps"], result["throughput_rps"]
+                ),
+                **{
+                    f"latency_{percentile}": format_change(
+                        baseline_latency.get(percentile),
+                        latency.get(percentile),
+                    )
+                    for percentile in ("p50", "p95", "p99")
+                },
+                "peak_rss": format_change(
+                    baseline_result["peak_rss_bytes"], result["peak_rss_bytes"]
+                ),
+            }
+        )
+    return comparisons
+
+
+def parse_int_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(",")]
+
+
+def parse_endpoint_list(value: str) -> list[str]:
+    endpoints = value.split(",")
+    unknown_endpoints = set(endpoints) - set(ENDPOINT_REQUESTS)
+    if unknown_endpoints:
+        raise argparse.ArgumentTypeError(
+            f"Unknown endpoints {sorted(unknown_endpoints)}, expected any of {list(ENDPOINT_REQUESTS)}."
+        )
+    return endpoints
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser(
+        "run", help="Run a sweep of load benchmark scenarios."
+    )
+    run_parser.add_argument(
+        "--endpoints",
+        type=parse_endpoint_list,
+        default=list(ENDPOINT_REQUESTS),
+        help="Comma-separated endpoints to benchmark.",
+    )
+    run_parser.add_argument(
+        "--nodes",
+        type=parse_int_list,
+        default=[1, 10, 50, 200],
+        help="Comma-separated numbers of nodes to federate over.",
+    )
+    run_parser.add_argument(
+        "--subjects",
+        type=parse_int_list,
+        default=[10, 100],
+        help="Comma-separated numbers of subjects per dataset (i.e. payload sizes).",
+    )
+    run_parser.add_argument(
+        "--concurrency",
+        type=parse_int_list,
+        default=[1, 10, 50],
+        help="Comma-separated numbers of concurrent clients.",
+    )
+    run_parser.add_argument(
+        "--datasets",
+        type=int,
+        default=10,
+        help="Number of datasets in each node.",
+    )
+    run_parser.add_argument(
+        "--latency",
+        type=LatencyDistribution.parse,
+        default=LatencyDistribution(),
+        help="Node response latency distribution in seconds (see benchmarks.stub_node).",
+    )
+    run_parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of node requests (0-1) that receive an error response.",
+    )
+    run_parser.add_argument(
+        "--protected",
+        action="store_true",
+        help="Nodes only report aggregate results instead of subject-level results.",
+    )
+    run_parser.add_argument(
+        "--seed", type=int, default=0, help="Seed of the node data."
+    )
+    run_parser.add_argument(
+        "--duration",
+        type=float,
+        default=10,
+        help="Duration in seconds of the measured load of each scenario.",
+    )
+    run_parser.add_argument(
+        "--warmup",
+        type=float,
+        default=2,
+        help="Duration in seconds of the unmeasured load before each scenario.",
+    )
+    run_parser.add_argument(
+        "--output",
+        type=Path,
+        default=Path("benchmark_results.json"),
+        help="Path of the JSON results file.",
+    )
+
+    compare_parser = subparsers.add_parser(
+        "compare",
+        help="Compare the results of two benchmark runs, e.g. of two commits.",
+    )
+    compare_parser.add_argument("baseline", type=Path)
+    compare_parser.add_argument("results", type=Path)
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        run_benchmarks(args)
+    else:
+        for comparison in compare_results(args.baseline, args.results):
+            endpoint, num_nodes, subjects_per_dataset, concurrency = (
+                comparison["scenario"]
+            )
+            print(
+                f"{endpoint:<20} nodes={num_nodes:<4} subjects={subjects_per_dataset:<5} concurrency={concurrency:<4} "
+                f"throughput {comparison['throughput_rps']:>7}  p50 {comparison['latency_p50']:>7}  "
+                f"p95 {comparison['latency_p95']:>7}  p99 {comparison['latency_p99']:>7}  "
+                f"peak RSS {comparison['peak_rss']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
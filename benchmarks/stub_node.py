@@ -0,0 +1,818 @@
+"""
+Simulated Neurobagel node API for benchmarking the federation API without real nodes or network access.
+
+A stub node serves synthetic datasets and subjects from the same endpoints as a node API
+(GET /query, POST /subjects, POST /datasets, the attribute endpoints and GET /pipelines/{pipeline_term}/versions),
+with a configurable number of datasets and subjects, response latency distribution, error rate
+and slowly streamed ("slow-drip") response bodies.
+
+Stub nodes can be run in-process as ASGI apps (see create_stub_node_app and StubNodeTransport),
+or as local server processes, e.g.:
+
+    python -m benchmarks.stub_node --nodes 10 --base-port 9001 --datasets 20 --subjects 100 --latency lognormal:0.05,0.5
+
+which also writes a local_nb_nodes.json file pointing the federation API at the started nodes.
+"""
+
+import argparse
+import asyncio
+import math
+import multiprocessing
+import random
+import signal
+import time
+from pathlib import Path
+from typing import Callable
+
+import httpx
+import orjson
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.types import ASGIApp
+
+from app.api.planner import HEALTHY_CONTROL_TERM
+from app.api.utility import RESOURCE_URI_MAP
+
+# Default path of the generated node index, which is where the federation API looks for local nodes
+DEFAULT_LOCAL_NODE_INDEX_PATH = (
+    Path(__file__).parents[1] / "local_nb_nodes.json"
+)
+
+# Terms the synthetic subjects are drawn from, in the form of {term_url: label, ...}
+SEX_TERMS = {
+    "snomed:248153007": "Male",
+    "snomed:248152002": "Female",
+    "snomed:32570681000036106": "Other",
+}
+DIAGNOSIS_TERMS = {
+    "snomed:49049000": "Parkinson's disease",
+    "snomed:35489007": "Depressive disorder",
+    "snomed:406506008": "Attention deficit hyperactivity disorder",
+    "snomed:26929004": "Alzheimer's disease",
+    "snomed:58214004": "Schizophrenia",
+    "snomed:13746004": "Bipolar disorder",
+}
+ASSESSMENT_TERMS = {
+    "cogatlas:trm_4d559bcd67c18": "Montreal Cognitive Assessment",
+    "cogatlas:trm_537bab6a2a3a8": "Beck Depression Inventory",
+    "cogatlas:trm_5a0e0f6b8f6b4": "Trail Making Test",
+    "cogatlas:trm_4f24126c22011": "Stroop Task",
+    "cogatlas:trm_56e8bf3c12ab2": "Wechsler Adult Intelligence Scale",
+    "cogatlas:trm_4c8991fed0a74": "Unified Parkinson's Disease Rating Scale",
+}
+IMAGE_MODAL_TERMS = {
+    "nidm:T1Weighted": "T1-weighted image",
+    "nidm:T2Weighted": "T2-weighted image",
+    "nidm:FlowWeighted": "Blood-oxygen-level dependent image",
+    "nidm:DiffusionWeighted": "Diffusion-weighted image",
+    "nidm:ArterialSpinLabeling": "Arterial spin labeling",
+}
+PIPELINE_TERMS = {
+    "np:fmriprep": "fMRIPrep",
+    "np:freesurfer": "FreeSurfer",
+    "np:mriqc": "MRIQC",
+    "np:qsiprep": "QSIPrep",
+}
+PIPELINE_VERSIONS = {
+    "np:fmriprep": ["20.2.7", "23.1.3", "24.1.1"],
+    "np:freesurfer": ["6.0.1", "7.3.2"],
+    "np:mriqc": ["23.1.0", "24.0.2"],
+    "np:qsiprep": ["0.19.1"],
+}
+
+
+class LatencyDistribution:
+    """
+    Distribution of the simulated response latency of a stub node, in seconds.
+
+    Parameters
+    ----------
+    kind : str
+        One of "constant", "uniform", "exponential" or "lognormal".
+    params : tuple[float, ...]
+        Parameters of the distribution: the latency for "constant", the minimum and maximum for "uniform",
+        the mean for "exponential", and the median and shape (sigma) for "lognormal".
+    """
+
+    PARAM_COUNTS = {
+        "constant": 1,
+        "uniform": 2,
+        "exponential": 1,
+        "lognormal": 2,
+    }
+
+    def __init__(self, kind: str = "constant", params: tuple = (0,)):
+        if kind not in self.PARAM_COUNTS:
+            raise ValueError(
+                f"Unknown latency distribution '{kind}', expected one of {list(self.PARAM_COUNTS)}."
+            )
+        if len(params) != self.PARAM_COUNTS[kind]:
+            raise ValueError(
+                f"The {kind} latency distribution takes {self.PARAM_COUNTS[kind]} parameter(s), got {len(params)}."
+            )
+        if any(param < 0 for param in params):
+            raise ValueError(
+                "Latency distribution parameters cannot be negative."
+            )
+        self.kind = kind
+        self.params = tuple(float(param) for param in params)
+
+    def __repr__(self) -> str:
+        return f"LatencyDistribution({self.kind!r}, {self.params!r})"
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        """
+        Parse a distribution from a specification of the form "<kind>:<param>,...",
+        e.g. "uniform:0.01,0.1", "exponential:0.05" or "lognormal:0.05,0.5".
+        A plain number is parsed as a constant latency.
+        """
+        kind, _, params = spec.rpartition(":")
+        try:
+            return cls(
+                kind or "constant",
+                tuple(float(param) for param in params.split(",")),
+            )
+        except ValueError as exc:
+            raise ValueError(
+                f"Invalid latency distribution '{spec}': {exc}"
+            ) from exc
+
+    def sample(self, rng: random.Random) -> float:
+        """Draw a latency from the distribution."""
+        if self.kind == "uniform":
+            return rng.uniform(*self.params)
+        if self.kind == "exponential":
+            mean = self.params[0]
+            return rng.expovariate(1 / mean) if mean > 0 else 0
+        if self.kind == "lognormal":
+            median, sigma = self.params
+            return (
+                rng.lognormvariate(math.log(median), sigma)
+                if median > 0
+                else 0
+            )
+        return self.params[0]
+
+
+class StubNodeSettings:
+    """
+    Settings of a stub node: the size of its synthetic data and the simulated behaviour of its responses.
+
+    Parameters
+    ----------
+    name : str
+        Name of the node, which also seeds the generation of its data.
+    num_datasets : int
+        Number of datasets in the node.
+    subjects_per_dataset : int
+        Number of subjects in each dataset.
+    latency : LatencyDistribution, optional
+        Distribution of the time taken to start each response, by default no latency.
+    error_rate : float
+        Fraction of requests (0-1) that receive an error response instead of results.
+    error_status : int
+        Status code of the error responses.
+    drip_chunk_size : int
+        If > 0, response bodies are streamed in chunks of this many bytes, with drip_interval seconds between chunks.
+    drip_interval : float
+        Time in seconds between the chunks of slowly streamed response bodies.
+    records_protected : bool
+        Whether the datasets only report aggregate results ("protected" subject data) rather than subject-level results.
+    seed : int
+        Seed of the generated data and of the simulated latencies and errors.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        num_datasets: int = 10,
+        subjects_per_dataset: int = 50,
+        latency: LatencyDistribution | None = None,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        drip_chunk_size: int = 0,
+        drip_interval: float = 0.0,
+        records_protected: bool = False,
+        seed: int = 0,
+    ):
+        self.name = name
+        self.num_datasets = num_datasets
+        self.subjects_per_dataset = subjects_per_dataset
+        self.latency = latency or LatencyDistribution()
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.drip_chunk_size = drip_chunk_size
+        self.drip_interval = drip_interval
+        self.records_protected = records_protected
+        self.seed = seed
+
+
+def _sample_terms(rng: random.Random, terms: list, min_count: int) -> list:
+    return rng.sample(
+        terms, rng.randint(min(min_count, len(terms)), len(terms))
+    )
+
+
+def generate_subject(
+    rng: random.Random, index: int, dataset_vocabulary: dict
+) -> dict:
+    """Generate a synthetic subject using the terms in the vocabulary of its dataset."""
+    is_control = rng.random() < 0.3
+    completed_pipelines = {
+        pipeline_term: rng.sample(
+            PIPELINE_VERSIONS[pipeline_term],
+            rng.randint(1, len(PIPELINE_VERSIONS[pipeline_term])),
+        )
+        for pipeline_term in dataset_vocabulary["pipelines"]
+        if rng.random() < 0.7
+    }
+    return {
+        "sub_id": f"sub-{index:05d}",
+        "age": round(rng.uniform(18, 90), 1),
+        "sex": rng.choice(list(SEX_TERMS)),
+        "is_control": is_control,
+        "diagnosis": (
+            []
+            if is_control
+            else _sample_terms(rng, dataset_vocabulary["diagnoses"], 1)[:2]
+        ),
+        "assessment": _sample_terms(rng, dataset_vocabulary["assessments"], 1),
+        "image_modal": _sample_terms(
+            rng, dataset_vocabulary["imaging-modalities"], 1
+        ),
+        "num_phenotypic_sessions": rng.randint(1, 4),
+        "num_imaging_sessions": rng.randint(0, 3),
+        "completed_pipelines": completed_pipelines,
+    }
+
+
+def generate_datasets(settings: StubNodeSettings) -> list[dict]:
+    """
+    Generate the synthetic datasets of a stub node, each with its subjects under "subjects".
+    The same settings always generate the same datasets, and each node only uses a subset of all terms,
+    so that nodes can be ruled out of queries based on their vocabularies.
+    """
+    rng = random.Random(f"{settings.seed}:{settings.name}")
+    node_vocabulary = {
+        "diagnoses": _sample_terms(rng, list(DIAGNOSIS_TERMS), 2),
+        "assessments": _sample_terms(rng, list(ASSESSMENT_TERMS), 2),
+        "imaging-modalities": _sample_terms(rng, list(IMAGE_MODAL_TERMS), 2),
+        "pipelines": _sample_terms(rng, list(PIPELINE_TERMS), 1),
+    }
+
+    datasets = []
+    for dataset_index in range(settings.num_datasets):
+        dataset_vocabulary = {
+            attribute_path: _sample_terms(rng, terms, 1)
+            for attribute_path, terms in node_vocabulary.items()
+        }
+        subjects = [
+            generate_subject(rng, subject_index, dataset_vocabulary)
+            for subject_index in range(settings.subjects_per_dataset)
+        ]
+        available_pipelines = {}
+        for subject in subjects:
+            for pipeline_term, versions in subject[
+                "completed_pipelines"
+            ].items():
+                available_pipelines.setdefault(pipeline_term, set()).update(
+                    versions
+                )
+        dataset_name = f"{settings.name} Dataset {dataset_index + 1}"
+        datasets.append(
+            {
+                "dataset_uuid": f"http://neurobagel.org/vocab/{rng.getrandbits(128):032x}",
+                "dataset_name": dataset_name,
+                "authors": [
+                    f"Author {i + 1}" for i in range(rng.randint(1, 5))
+                ],
+                "homepage": f"https://example.org/{dataset_index + 1}",
+                "references_and_links": [],
+                "keywords": ["synthetic", "benchmark"],
+                "repository_url": None,
+                "access_instructions": None,
+                "access_type": rng.choice(
+                    ["public", "registered", "restricted"]
+                ),
+                "access_email": None,
+                "access_link": None,
+                "dataset_portal_uri": None,
+                "dataset_total_subjects": len(subjects),
+                "records_protected": settings.records_protected,
+                "image_modals": sorted(
+                    {
+                        image_modal
+                        for subject in subjects
+                        for image_modal in subject["image_modal"]
+                    }
+                ),
+                "available_pipelines": {
+                    pipeline_term: sorted(versions)
+                    for pipeline_term, versions in available_pipelines.items()
+                },
+                "subjects": subjects,
+            }
+        )
+    return datasets
+
+
+def subject_matches(subject: dict, query: dict) -> bool:
+    """Return whether a synthetic subject matches the Neurobagel query parameters of a request."""
+
+    def get_param(name: str, convert: Callable = str):
+        value = query.get(name)
+        return None if value is None or value == "" else convert(value)
+
+    min_age, max_age = get_param("min_age", float), get_param("max_age", float)
+    diagnosis = get_param("diagnosis")
+    pipeline_name = get_param("pipeline_name")
+    pipeline_version = get_param("pipeline_version")
+    min_imaging_sessions = get_param("min_num_imaging_sessions", int)
+    min_phenotypic_sessions = get_param("min_num_phenotypic_sessions", int)
+    return all(
+        (
+            min_age is None or subject["age"] >= min_age,
+            max_age is None or subject["age"] <= max_age,
+            get_param("sex") in (None, subject["sex"]),
+            diagnosis is None
+            or (
+                subject["is_control"]
+                if diagnosis == HEALTHY_CONTROL_TERM
+                else diagnosis in subject["diagnosis"]
+            ),
+            min_imaging_sessions is None
+            or subject["num_imaging_sessions"] >= min_imaging_sessions,
+            min_phenotypic_sessions is None
+            or subject["num_phenotypic_sessions"] >= min_phenotypic_sessions,
+            get_param("assessment") in (None, *subject["assessment"]),
+            get_param("image_modal") in (None, *subject["image_modal"]),
+            pipeline_name is None
+            or (
+                pipeline_name in subject["completed_pipelines"]
+                and pipeline_version
+                in (None, *subject["completed_pipelines"][pipeline_name])
+            ),
+        )
+    )
+
+
+def find_matching_subjects(datasets: list[dict], query: dict) -> list:
+    """
+    Return the datasets with subjects matching a query, along with their matching subjects,
+    in the form of [(dataset, [subject, ...]), ...].
+    Only the datasets in the "dataset_uuids" of the query are searched, if specified.
+    """
+    dataset_uuids = query.get("dataset_uuids")
+    matches = []
+    for dataset in datasets:
+        if dataset_uuids is not None and (
+            dataset["dataset_uuid"] not in dataset_uuids
+        ):
+            continue
+        matching_subjects = [
+            subject
+            for subject in dataset["subjects"]
+            if subject_matches(subject, query)
+        ]
+        if matching_subjects:
+            matches.append((dataset, matching_subjects))
+    return matches
+
+
+def get_subject_data(dataset: dict, matching_subjects: list) -> list | str:
+    return "protected" if dataset["records_protected"] else matching_subjects
+
+
+def build_cohort_query_response(datasets: list[dict], query: dict) -> list:
+    """Build the response of a node to a GET /query request."""
+    return [
+        {
+            "dataset_uuid": dataset["dataset_uuid"],
+            "dataset_name": dataset["dataset_name"],
+            "dataset_portal_uri": dataset["dataset_portal_uri"],
+            "dataset_total_subjects": dataset["dataset_total_subjects"],
+            "records_protected": dataset["records_protected"],
+            "num_matching_subjects": len(matching_subjects),
+            "subject_data": get_subject_data(dataset, matching_subjects),
+            "image_modals": dataset["image_modals"],
+            "available_pipelines": dataset["available_pipelines"],
+        }
+        for dataset, matching_subjects in find_matching_subjects(
+            datasets, query
+        )
+    ]
+
+
+def build_subjects_query_response(datasets: list[dict], query: dict) -> list:
+    """Build the response of a node to a POST /subjects request."""
+    return [
+        {
+            "dataset_uuid": dataset["dataset_uuid"],
+            "subject_data": get_subject_data(dataset, matching_subjects),
+        }
+        for dataset, matching_subjects in find_matching_subjects(
+            datasets, query
+        )
+    ]
+
+
+def build_datasets_query_response(datasets: list[dict], query: dict) -> list:
+    """Build the response of a node to a POST /datasets request."""
+    return [
+        {
+            **{
+                key: value
+                for key, value in dataset.items()
+                if key not in ("subjects", "dataset_portal_uri")
+            },
+            "num_matching_subjects": len(matching_subjects),
+        }
+        for dataset, matching_subjects in find_matching_subjects(
+            datasets, query
+        )
+    ]
+
+
+def build_vocabularies(datasets: list[dict]) -> tuple[dict, dict]:
+    """
+    Build the responses of a node to requests to each attribute endpoint, in the form of {attribute_path: response, ...},
+    and for the versions of each pipeline, in the form of {pipeline_term: response, ...}.
+    """
+    attribute_terms = {
+        "assessments": (ASSESSMENT_TERMS, "assessment"),
+        "diagnoses": (DIAGNOSIS_TERMS, "diagnosis"),
+        "imaging-modalities": (IMAGE_MODAL_TERMS, "image_modal"),
+        "pipelines": (PIPELINE_TERMS, "completed_pipelines"),
+    }
+    attribute_responses = {}
+    for attribute_path, (term_labels, subject_key) in attribute_terms.items():
+        used_terms = sorted(
+            {
+                term
+                for dataset in datasets
+                for subject in dataset["subjects"]
+                for term in subject[subject_key]
+            }
+        )
+        attribute_responses[attribute_path] = {
+            RESOURCE_URI_MAP[attribute_path]: [
+                {"TermURL": term, "Label": term_labels[term]}
+                for term in used_terms
+            ]
+        }
+
+    pipeline_versions = {}
+    for dataset in datasets:
+        for pipeline_term, versions in dataset["available_pipelines"].items():
+            pipeline_versions.setdefault(pipeline_term, set()).update(versions)
+    versions_responses = {
+        pipeline_term: {pipeline_term: sorted(versions)}
+        for pipeline_term, versions in pipeline_versions.items()
+    }
+    return attribute_responses, versions_responses
+
+
+def create_stub_node_app(settings: StubNodeSettings) -> FastAPI:
+    """
+    Create the app of a stub node API serving synthetic data generated from the given settings.
+    The serialized response to each distinct request is cached, so that the stub node adds as little
+    processing time as possible on top of its simulated latency.
+    """
+    datasets = generate_datasets(settings)
+    attribute_responses, versions_responses = build_vocabularies(datasets)
+    rng = random.Random(f"{settings.seed}:{settings.name}:responses")
+    # In the form of {(path, serialized query): serialized response body, ...}
+    response_bodies = {}
+
+    async def drip(body: bytes):
+        chunk_size = settings.drip_chunk_size
+        for chunk_start in range(0, len(body), chunk_size):
+            if chunk_start > 0:
+                await asyncio.sleep(settings.drip_interval)
+            chunk_end = chunk_start + chunk_size
+            yield body[chunk_start:chunk_end]
+
+    async def respond(
+        path: str, query: dict, build_content: Callable[[], object]
+    ) -> Response:
+        latency = settings.latency.sample(rng)
+        if latency > 0:
+            await asyncio.sleep(latency)
+        if settings.error_rate > 0 and rng.random() < settings.error_rate:
+            return Response(
+                orjson.dumps({"detail": "Simulated node error."}),
+                status_code=settings.error_status,
+                media_type="application/json",
+            )
+
+        key = (path, orjson.dumps(query, option=orjson.OPT_SORT_KEYS))
+        body = response_bodies.get(key)
+        if body is None:
+            body = response_bodies[key] = orjson.dumps(build_content())
+        if settings.drip_chunk_size > 0:
+            return StreamingResponse(drip(body), media_type="application/json")
+        return Response(body, media_type="application/json")
+
+    app = FastAPI(title=f"Stub node: {settings.name}")
+
+    @app.get("/")
+    async def root():
+        return {"message": f"Stub Neurobagel node {settings.name}"}
+
+    @app.get("/query")
+    async def query(request: Request):
+        query = dict(request.query_params)
+        return await respond(
+            "query",
+            query,
+            lambda: build_cohort_query_response(datasets, query),
+        )
+
+    @app.post("/subjects")
+    async def subjects(request: Request):
+        query = await request.json()
+        return await respond(
+            "subjects",
+            query,
+            lambda: build_subjects_query_response(datasets, query),
+        )
+
+    @app.post("/datasets")
+    async def post_datasets(request: Request):
+        query = await request.json()
+        return await respond(
+            "datasets",
+            query,
+            lambda: build_datasets_query_response(datasets, query),
+        )
+
+    @app.get("/pipelines/{pipeline_term}/versions")
+    async def pipeline_versions(pipeline_term: str):
+        return await respond(
+            f"pipelines/{pipeline_term}/versions",
+            {},
+            lambda: versions_responses.get(pipeline_term, {pipeline_term: []}),
+        )
+
+    def add_attribute_route(attribute_path: str):
+        async def get_attribute_terms():
+            return await respond(
+                attribute_path, {}, lambda: attribute_responses[attribute_path]
+            )
+
+        app.add_api_route(f"/{attribute_path}", get_attribute_terms)
+
+    for attribute_path in attribute_responses:
+        add_attribute_route(attribute_path)
+
+    return app
+
+
+def build_stub_node_settings(
+    num_nodes: int, **settings_kwargs
+) -> list[StubNodeSettings]:
+    """Return the settings of a number of stub nodes named "Stub Node 1", "Stub Node 2", ..., sharing the other settings."""
+    return [
+        StubNodeSettings(name=f"Stub Node {index}", **settings_kwargs)
+        for index in range(1, num_nodes + 1)
+    ]
+
+
+class StubNodeTransport(httpx.AsyncBaseTransport):
+    """
+    HTTP transport sending requests to in-process stub node apps (or any ASGI apps) based on the host and port
+    of the request URL, without any network access.
+
+    Parameters
+    ----------
+    node_apps : dict
+        The app to send requests to for each node URL, in the form of {node_url: app, ...}.
+    """
+
+    def __init__(self, node_apps: dict[str, ASGIApp]):
+        self._transports = {
+            httpx.URL(node_url).netloc: httpx.ASGITransport(app=app)
+            for node_url, app in node_apps.items()
+        }
+
+    async def handle_async_request(
+        self, request: httpx.Request
+    ) -> httpx.Response:
+        transport = self._transports.get(request.url.netloc)
+        if transport is None:
+            raise httpx.ConnectError(
+                f"No stub node at {request.url}", request=request
+            )
+        return await transport.handle_async_request(request)
+
+
+def create_in_process_stub_nodes(
+    node_settings: list[StubNodeSettings],
+) -> tuple[dict, StubNodeTransport]:
+    """
+    Create an in-process app for each stub node, with a URL of the form "http://stub-node-1.local/".
+    Returns the node index, in the form of {node_url: node_name, ...},
+    and a transport sending requests to the node URLs to the corresponding apps.
+    """
+    node_apps = {
+        f"http://stub-node-{index}.local/": create_stub_node_app(settings)
+        for index, settings in enumerate(node_settings, start=1)
+    }
+    nodes = {
+        node_url: settings.name
+        for node_url, settings in zip(node_apps, node_settings)
+    }
+    return nodes, StubNodeTransport(node_apps)
+
+
+def write_local_node_index(
+    nodes: dict, path: Path = DEFAULT_LOCAL_NODE_INDEX_PATH
+):
+    """Write a local_nb_nodes.json file pointing the federation API at the given nodes, in the form of {node_url: node_name, ...}."""
+    Path(path).write_bytes(
+        orjson.dumps(
+            [
+                {"NodeName": node_name, "ApiURL": node_url}
+                for node_url, node_name in nodes.items()
+            ],
+            option=orjson.OPT_INDENT_2,
+        )
+    )
+
+
+def run_stub_node(settings: StubNodeSettings, host: str, port: int):
+    """Serve a stub node API on the given host and port (blocking)."""
+    uvicorn.run(
+        create_stub_node_app(settings),
+        host=host,
+        port=port,
+        log_level="warning",
+        access_log=False,
+    )
+
+
+def start_stub_node_processes(
+    node_settings: list[StubNodeSettings], host: str, base_port: int
+) -> tuple[dict, list[multiprocessing.Process]]:
+    """
+    Start a server process for each stub node, on consecutive ports starting from the base port.
+    Returns the node index, in the form of {node_url: node_name, ...}, and the started processes.
+    """
+    nodes = {}
+    processes = []
+    for port, settings in enumerate(node_settings, start=base_port):
+        process = multiprocessing.Process(
+            target=run_stub_node, args=(settings, host, port), daemon=True
+        )
+        process.start()
+        processes.append(process)
+        nodes[f"http://{host}:{port}/"] = settings.name
+    return nodes, processes
+
+
+def wait_for_nodes(node_urls: list, timeout: float = 30):
+    """Wait until all nodes respond to requests to their root path, raising a TimeoutError if they do not within the timeout."""
+    deadline = time.monotonic() + timeout
+    pending_node_urls = list(node_urls)
+    with httpx.Client(timeout=1) as client:
+        while pending_node_urls:
+            node_url = pending_node_urls[0]
+            try:
+                client.get(node_url).raise_for_status()
+                pending_node_urls.pop(0)
+                continue
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise TimeoutError(
+                    f"Stub nodes did not start within {timeout} seconds: {pending_node_urls}"
+                )
+            time.sleep(0.1)
+
+
+def stop_processes(processes: list[multiprocessing.Process]):
+    """Stop server processes and wait for them to exit."""
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join(timeout=10)
+
+
+def add_stub_node_arguments(parser: argparse.ArgumentParser):
+    """Add the command-line options for the data and simulated behaviour of stub nodes to a parser."""
+    parser.add_argument(
+        "--datasets",
+        type=int,
+        default=10,
+        help="Number of datasets in each node.",
+    )
+    parser.add_argument(
+        "--subjects",
+        type=int,
+        default=50,
+        help="Number of subjects in each dataset.",
+    )
+    parser.add_argument(
+        "--latency",
+        type=LatencyDistribution.parse,
+        default=LatencyDistribution(),
+        help="Response latency distribution in seconds, e.g. 0.05, uniform:0.01,0.1, exponential:0.05 or lognormal:0.05,0.5.",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests (0-1) that receive an error response.",
+    )
+    parser.add_argument(
+        "--error-status",
+        type=int,
+        default=500,
+        help="Status code of the error responses.",
+    )
+    parser.add_argument(
+        "--drip-chunk-size",
+        type=int,
+        default=0,
+        help="If > 0, stream response bodies in chunks of this many bytes.",
+    )
+    parser.add_argument(
+        "--drip-interval",
+        type=float,
+        default=0.0,
+        help="Time in seconds between the chunks of streamed response bodies.",
+    )
+    parser.add_argument(
+        "--protected",
+        action="store_true",
+        help="Only report aggregate results instead of subject-level results.",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed of the generated data."
+    )
+
+
+def get_stub_node_settings_kwargs(args: argparse.Namespace) -> dict:
+    """Return the stub node settings from parsed command-line options (see add_stub_node_arguments)."""
+    return {
+        "num_datasets": args.datasets,
+        "subjects_per_dataset": args.subjects,
+        "latency": args.latency,
+        "error_rate": args.error_rate,
+        "error_status": args.error_status,
+        "drip_chunk_size": args.drip_chunk_size,
+        "drip_interval": args.drip_interval,
+        "records_protected": args.protected,
+        "seed": args.seed,
+    }
+
+
+def main(argv: list[str] | None = None):
+    """Start local stub node processes and write a local_nb_nodes.json file pointing at them, until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--nodes", type=int, default=3, help="Number of stub nodes to start."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument(
+        "--base-port",
+        type=int,
+        default=9001,
+        help="Port of the first node, with the other nodes on the following ports.",
+    )
+    parser.add_argument(
+        "--nodes-file",
+        type=Path,
+        default=DEFAULT_LOCAL_NODE_INDEX_PATH,
+        help="Path of the generated local_nb_nodes.json file.",
+    )
+    add_stub_node_arguments(parser)
+    args = parser.parse_args(argv)
+
+    node_settings = build_stub_node_settings(
+        args.nodes, **get_stub_node_settings_kwargs(args)
+    )
+    nodes, processes = start_stub_node_processes(
+        node_settings, host=args.host, base_port=args.base_port
+    )
+    # Stop the node processes when terminated, as when interrupted
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        wait_for_nodes(list(nodes))
+        write_local_node_index(nodes, args.nodes_file)
+        print(
+            f"Started {len(nodes)} stub nodes on {args.host}:{args.base_port}-{args.base_port + len(nodes) - 1}, "
+            f"listed in {args.nodes_file}. Press Ctrl+C to stop."
+        )
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_processes(processes)
+
+
+if __name__ == "__main__":
+    main()
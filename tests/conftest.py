@@ -4,6 +4,7 @@ import httpx
 import pytest
 from starlette.testclient import TestClient
 
+from app.api import crud, metrics, security
 from app.api import utility as util
 from app.main import app
 
@@ -20,6 +21,100 @@ def silence_httpx_info_logs():
     logging.getLogger("httpx").setLevel(logging.WARNING)
 
 
+@pytest.fixture(autouse=True)
+def reset_node_circuit_breakers(monkeypatch):
+    """Start each test with closed circuits for all nodes, so that failed requests in one test do not affect others."""
+    monkeypatch.setattr(util, "NODE_CIRCUIT_BREAKERS", {})
+
+
+@pytest.fixture(autouse=True)
+def reset_node_health(monkeypatch):
+    """
+    Start each test without any recorded node health, and disable the background health checks
+    to avoid sending requests to the test nodes on startup (tests of health checks can re-enable them).
+    """
+    monkeypatch.setattr(util, "NODE_HEALTH", {})
+    monkeypatch.setattr(
+        util,
+        "HEALTH_CHECK_INTERVAL",
+        util.EnvVar("NB_FAPI_HEALTH_CHECK_INTERVAL", 0),
+    )
+
+
+@pytest.fixture(autouse=True)
+def isolate_node_directory_snapshot(monkeypatch, tmp_path):
+    """Save and load the public node directory snapshot in a temporary directory, starting without any snapshot."""
+    monkeypatch.setattr(
+        util,
+        "NODE_DIRECTORY_SNAPSHOT_PATH",
+        util.EnvVar(
+            "NB_FAPI_NODE_DIRECTORY_SNAPSHOT_PATH",
+            tmp_path / "public_nb_nodes_snapshot.json",
+        ),
+    )
+    monkeypatch.setattr(util, "PUBLIC_NODES", {})
+    monkeypatch.setattr(util, "NODE_DIRECTORY_VALIDATORS", {})
+
+
+@pytest.fixture(autouse=True)
+def disable_node_index_reloads(monkeypatch):
+    """Disable the background reloads of the node index, so that tests only use the nodes they set up."""
+    monkeypatch.setattr(
+        util,
+        "LOCAL_NODE_INDEX_WATCH_INTERVAL",
+        util.EnvVar("NB_FAPI_LOCAL_NODE_INDEX_WATCH_INTERVAL", 0),
+    )
+    monkeypatch.setattr(
+        util,
+        "NODE_DIRECTORY_REFRESH_INTERVAL",
+        util.EnvVar("NB_FAPI_NODE_DIRECTORY_REFRESH_INTERVAL", 0),
+    )
+
+
+@pytest.fixture(autouse=True)
+def clear_caches_and_indexes():
+    """
+    Start each test with empty caches and node vocabulary and dataset indexes,
+    so that vocabularies and query results fetched in one test are not served or used to skip nodes in others.
+    """
+    caches_and_indexes = [
+        crud.VOCABULARY_CACHE,
+        crud.PIPELINE_VERSIONS_CACHE,
+        crud.NODE_VOCABULARY_INDEX,
+        crud.DATASET_NODE_INDEX,
+        crud.QUERY_SESSION_CACHE,
+    ]
+    for cache_or_index in caches_and_indexes:
+        cache_or_index.clear()
+    yield
+    for cache_or_index in caches_and_indexes:
+        cache_or_index.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    """Start each test without any recorded metrics."""
+    metrics.clear_metrics()
+
+
+@pytest.fixture(autouse=True)
+def reset_token_verification(monkeypatch):
+    """
+    Start each test without any fetched identity provider public keys or verified tokens,
+    and disable the background refreshes of the public keys to avoid sending requests to the identity provider on startup.
+    """
+    monkeypatch.setattr(security, "JWK_SET", None)
+    monkeypatch.setattr(security, "JWK_SET_FETCHED_AT", None)
+    monkeypatch.setattr(
+        util,
+        "JWKS_REFRESH_INTERVAL",
+        util.EnvVar("NB_FAPI_JWKS_REFRESH_INTERVAL", 0),
+    )
+    security.VERIFIED_TOKEN_CACHE.clear()
+    yield
+    security.VERIFIED_TOKEN_CACHE.clear()
+
+
 @pytest.fixture()
 def enable_auth(monkeypatch):
     """Enable the authentication requirement for the API."""
@@ -39,7 +134,7 @@ def disable_auth(monkeypatch):
 def mock_verify_token():
     """Mock a successful token verification that does not raise any exceptions."""
 
-    def _verify_token(token):
+    async def _verify_token(token):
         return None
 
     return _verify_token
@@ -189,6 +189,43 @@ def test_fully_failed_get_instances_handled_gracefully(
     assert response["responses"] == {"nb:Assessment": []}
 
 
+def test_get_instances_served_from_cache(
+    test_app, monkeypatch, set_valid_test_federation_nodes
+):
+    """
+    Once the instances of an attribute have been fetched from all nodes,
+    subsequent requests for the attribute should be served from the cache without requests to the nodes,
+    whereas fully failed responses should not be cached.
+    """
+    requested_urls = []
+    is_node_down = True
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        requested_urls.append(url)
+        if is_node_down:
+            raise httpx.ConnectError("Some connection error")
+        return httpx.Response(
+            status_code=200,
+            json={"nb:Diagnosis": [{"TermURL": "snomed:1", "Label": "Dx"}]},
+        )
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+
+    response = test_app.get("/diagnoses")
+    assert response.json()["nodes_response_status"] == "fail"
+    assert len(requested_urls) == 2
+
+    is_node_down = False
+    for _ in range(3):
+        response = test_app.get("/diagnoses")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["responses"] == {
+            "nb:Diagnosis": [{"TermURL": "snomed:1", "Label": "Dx"}]
+        }
+    # Only the first successful request was sent to the nodes
+    assert len(requested_urls) == 4
+
+
 @pytest.mark.parametrize(
     "path",
     [
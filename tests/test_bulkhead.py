@@ -0,0 +1,127 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.api import metrics
+from app.api import utility as util
+from app.api.bulkhead import Bulkhead
+
+
+@pytest.mark.asyncio
+async def test_bulkhead_bounds_concurrency_and_counts_queued_requests():
+    """Test that a bulkhead never lets more than the maximum number of requests run at once, and counts the waiting requests."""
+    bulkhead = Bulkhead(max_concurrent=2)
+    release = asyncio.Event()
+    max_in_flight = 0
+
+    async def request():
+        nonlocal max_in_flight
+        async with bulkhead.slot():
+            max_in_flight = max(max_in_flight, bulkhead.in_flight)
+            await release.wait()
+
+    tasks = [asyncio.create_task(request()) for _ in range(5)]
+    await asyncio.sleep(0)
+
+    assert bulkhead.in_flight == 2
+    assert bulkhead.waiting == 3
+
+    release.set()
+    await asyncio.gather(*tasks)
+
+    assert max_in_flight == 2
+    assert bulkhead.in_flight == 0
+    assert bulkhead.waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_node_does_not_use_up_shared_request_slots(monkeypatch):
+    """
+    Test that requests to a slow node are queued once the per-node limit is reached,
+    leaving the shared outbound request slots free for requests to other nodes.
+    """
+    slow_node_url = "https://slownode.org/"
+    fast_node_url = "https://fastnode.org/"
+    release_slow_node = asyncio.Event()
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        if url.startswith(slow_node_url):
+            await release_slow_node.wait()
+        return httpx.Response(status_code=200, json=[])
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+    monkeypatch.setattr(util, "OUTBOUND_REQUESTS_BULKHEAD", Bulkhead(3))
+    monkeypatch.setattr(util, "NODE_BULKHEADS", {})
+    monkeypatch.setattr(
+        util,
+        "MAX_CONCURRENT_REQUESTS_PER_NODE",
+        util.EnvVar("NB_FAPI_MAX_CONCURRENT_REQUESTS_PER_NODE", 2),
+    )
+
+    slow_node_requests = [
+        asyncio.create_task(
+            util.send_request(
+                method="GET",
+                url=slow_node_url + "query",
+                node_url=slow_node_url,
+            )
+        )
+        for _ in range(4)
+    ]
+    await asyncio.sleep(0.01)
+
+    slow_node_bulkhead = util.NODE_BULKHEADS[slow_node_url]
+    assert slow_node_bulkhead.in_flight == 2
+    assert slow_node_bulkhead.waiting == 2
+    assert util.OUTBOUND_REQUESTS_BULKHEAD.in_flight == 2
+
+    await asyncio.wait_for(
+        util.send_request(
+            method="GET", url=fast_node_url + "query", node_url=fast_node_url
+        ),
+        timeout=1,
+    )
+
+    release_slow_node.set()
+    await asyncio.gather(*slow_node_requests)
+    assert util.OUTBOUND_REQUESTS_BULKHEAD.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_requests_waiting_for_shared_slots_reported(monkeypatch):
+    """
+    Test that requests waiting for one of the outbound request slots shared across all nodes
+    are reported as queued, separately from requests queued for a slot of their node.
+    """
+    release_nodes = asyncio.Event()
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        await release_nodes.wait()
+        return httpx.Response(status_code=200, json=[])
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+    monkeypatch.setattr(util, "OUTBOUND_REQUESTS_BULKHEAD", Bulkhead(1))
+    monkeypatch.setattr(util, "NODE_BULKHEADS", {})
+
+    node_requests = [
+        asyncio.create_task(
+            util.send_request(
+                method="GET", url=node_url + "query", node_url=node_url
+            )
+        )
+        for node_url in ("https://firstnode.org/", "https://secondnode.org/")
+    ]
+    await asyncio.sleep(0.01)
+
+    rendered_metrics = metrics.render_metrics()
+    assert "nb_fapi_outbound_requests_in_flight 1" in rendered_metrics
+    assert "nb_fapi_outbound_requests_queued 1" in rendered_metrics
+    assert all(
+        node_bulkhead.waiting == 0
+        for node_bulkhead in util.NODE_BULKHEADS.values()
+    )
+
+    release_nodes.set()
+    await asyncio.gather(*node_requests)
+    assert "nb_fapi_outbound_requests_queued 0" in metrics.render_metrics()
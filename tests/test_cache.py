@@ -0,0 +1,150 @@
+import asyncio
+import time
+
+import pytest
+
+from app.api.cache import TTLCache
+
+
+def test_expired_value_is_returned_as_stale():
+    """Test that a cached value is reported as fresh until its TTL has passed, and as stale afterwards."""
+    cache = TTLCache(ttl=10)
+    cache.set("key", "value")
+    assert cache.get("key") == ("value", True)
+
+    cache.set("key", "value", ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("key") == ("value", False)
+    assert cache.get("missing_key") is None
+
+
+def test_least_recently_used_value_is_evicted():
+    """Test that once the cache is full, the least recently used value is evicted."""
+    cache = TTLCache(ttl=10, max_size=2)
+    cache.set("key1", 1)
+    cache.set("key2", 2)
+    # Use key1 so that key2 becomes the least recently used
+    cache.get("key1")
+    cache.set("key3", 3)
+
+    assert "key1" in cache
+    assert "key2" not in cache
+    assert "key3" in cache
+    assert len(cache) == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_single_fetch():
+    """Test that concurrent requests for a missing key share a single fetch, and that the fetched value is cached."""
+    cache = TTLCache(ttl=10)
+    fetches = []
+
+    async def fetch():
+        fetches.append(1)
+        await asyncio.sleep(0.05)
+        return "value"
+
+    results = await asyncio.gather(
+        cache.get_or_fetch("key", fetch), cache.get_or_fetch("key", fetch)
+    )
+
+    assert results == ["value", "value"]
+    assert len(fetches) == 1
+    assert await cache.get_or_fetch("key", fetch) == "value"
+    assert len(fetches) == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_value_returned_while_refreshed_in_background():
+    """Test that a stale value is returned immediately, and replaced once a background refresh completes."""
+    cache = TTLCache(ttl=10)
+    # Cache a value that is already stale
+    cache.set("key", "old value", ttl=-1)
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "new value"
+
+    assert await cache.get_or_fetch("key", fetch) == "old value"
+    # Only one refresh is started while one is in flight
+    assert await cache.get_or_fetch("key", fetch) == "old value"
+    assert len(cache._fetches) == 1
+
+    await asyncio.sleep(0.1)
+    assert cache.get("key") == ("new value", True)
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_keeps_stale_value(caplog):
+    """Test that if a background refresh fails, the stale value is kept and the error is logged."""
+    cache = TTLCache(ttl=10)
+    # Cache a value that is already stale
+    cache.set("key", "old value", ttl=-1)
+
+    async def fetch():
+        raise RuntimeError("Some fetch error")
+
+    assert await cache.get_or_fetch("key", fetch) == "old value"
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    assert cache.get("key") == ("old value", False)
+    assert "Some fetch error" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_value_not_cached_when_ttl_not_positive():
+    """Test that a fetched value is returned but not cached when get_ttl returns a TTL <= 0."""
+    cache = TTLCache(ttl=10)
+
+    async def fetch():
+        return "value"
+
+    assert (
+        await cache.get_or_fetch("key", fetch, get_ttl=lambda value: 0)
+        == "value"
+    )
+    assert "key" not in cache
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("is_fetch_failed", [True, False])
+async def test_stale_value_kept_for_retry_interval_after_failed_refresh(
+    is_fetch_failed,
+):
+    """
+    Test that when a background refresh fails or returns a value that is not to be cached,
+    the stale value is served without another refresh until the retry interval has passed.
+    """
+    cache = TTLCache(ttl=10, retry_interval=0.05)
+    # Cache a value that is already stale
+    cache.set("key", "old value", ttl=-1)
+    fetches = []
+
+    async def fetch():
+        fetches.append(1)
+        if is_fetch_failed:
+            raise RuntimeError("Some fetch error")
+        return "failed value"
+
+    assert (
+        await cache.get_or_fetch("key", fetch, get_ttl=lambda value: 0)
+        == "old value"
+    )
+    await asyncio.sleep(0.01)
+    assert cache.get("key") == ("old value", True)
+
+    assert (
+        await cache.get_or_fetch("key", fetch, get_ttl=lambda value: 0)
+        == "old value"
+    )
+    await asyncio.sleep(0.01)
+    assert len(fetches) == 1
+
+    await asyncio.sleep(0.05)
+    assert (
+        await cache.get_or_fetch("key", fetch, get_ttl=lambda value: 0)
+        == "old value"
+    )
+    await asyncio.sleep(0.01)
+    assert len(fetches) == 2
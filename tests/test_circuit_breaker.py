@@ -0,0 +1,126 @@
+import httpx
+import pytest
+
+from app.api import utility as util
+from app.api.circuit_breaker import CircuitBreaker, CircuitState
+
+
+@pytest.fixture()
+def mock_clock(monkeypatch):
+    """Replace the monotonic clock used by circuit breakers with a manually advanced one."""
+
+    class MockClock:
+        now = 1000.0
+
+        def __call__(self):
+            return self.now
+
+    clock = MockClock()
+    monkeypatch.setattr("app.api.circuit_breaker.time.monotonic", clock)
+    return clock
+
+
+@pytest.fixture()
+def circuit_breaker(mock_clock):
+    return CircuitBreaker(
+        name="https://firstnode.org/", failure_threshold=3, reset_timeout=30
+    )
+
+
+def test_circuit_opens_after_consecutive_failures(circuit_breaker):
+    """Test that the circuit only opens once the number of consecutive failures reaches the threshold."""
+    circuit_breaker.record_failure()
+    circuit_breaker.record_failure()
+    circuit_breaker.record_success()
+    circuit_breaker.record_failure()
+    circuit_breaker.record_failure()
+    assert circuit_breaker.state == CircuitState.CLOSED
+    assert circuit_breaker.allow_request()
+
+    circuit_breaker.record_failure()
+    assert circuit_breaker.state == CircuitState.OPEN
+    assert not circuit_breaker.allow_request()
+
+
+def test_half_open_circuit_allows_single_probe(circuit_breaker, mock_clock):
+    """Test that once the reset timeout has passed, only a single probe request is let through at a time."""
+    for _ in range(3):
+        circuit_breaker.record_failure()
+
+    mock_clock.now += 29
+    assert not circuit_breaker.allow_request()
+
+    mock_clock.now += 1
+    assert circuit_breaker.allow_request()
+    assert circuit_breaker.state == CircuitState.HALF_OPEN
+    assert not circuit_breaker.allow_request()
+
+    # A probe that never reports back is eventually replaced
+    mock_clock.now += 30
+    assert circuit_breaker.allow_request()
+
+
+@pytest.mark.parametrize(
+    "probe_succeeded,expected_state",
+    [(True, CircuitState.CLOSED), (False, CircuitState.OPEN)],
+)
+def test_probe_result_closes_or_reopens_circuit(
+    circuit_breaker, mock_clock, probe_succeeded, expected_state
+):
+    """Test that a successful probe closes the circuit and a failed probe reopens it."""
+    for _ in range(3):
+        circuit_breaker.record_failure()
+    mock_clock.now += 30
+    assert circuit_breaker.allow_request()
+
+    if probe_succeeded:
+        circuit_breaker.record_success()
+    else:
+        circuit_breaker.record_failure()
+
+    assert circuit_breaker.state == expected_state
+    assert circuit_breaker.allow_request() is probe_succeeded
+
+
+def test_open_circuit_skips_requests_to_node(
+    test_app,
+    disable_auth,
+    set_valid_test_federation_nodes,
+    mocked_datasets_query_response_for_single_dataset,
+    monkeypatch,
+):
+    """
+    Test that once a node has failed repeatedly, federated requests skip the node without sending a request
+    and report it as an error with a circuit open reason.
+    """
+    requested_hosts = []
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        host = httpx.URL(url).host
+        requested_hosts.append(host)
+        if host == "secondpublicnode.org":
+            raise httpx.ConnectError("Some connection error")
+        return httpx.Response(
+            status_code=200,
+            json=[mocked_datasets_query_response_for_single_dataset],
+        )
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+    monkeypatch.setattr(
+        util,
+        "CIRCUIT_BREAKER_FAILURE_THRESHOLD",
+        util.EnvVar("NB_FAPI_CIRCUIT_BREAKER_FAILURE_THRESHOLD", 2),
+    )
+
+    for _ in range(2):
+        test_app.post("/datasets", json={})
+    requested_hosts.clear()
+
+    response = test_app.post("/datasets", json={})
+
+    assert requested_hosts == ["firstpublicnode.org"]
+    response = response.json()
+    assert response["nodes_response_status"] == "partial success"
+    assert len(response["errors"]) == 1
+    assert response["errors"][0]["node_name"] == "Second Public Node"
+    assert "circuit open" in response["errors"][0]["error"]
@@ -189,3 +189,54 @@ def test_unrecognized_fields_in_node_responses_handled_gracefully(
 
     assert combined_results_payload == expected_combined_results_payload
     assert not node_errors
+
+
+@pytest.mark.asyncio
+async def test_state_of_removed_nodes_dropped_on_node_index_update(
+    monkeypatch,
+):
+    """
+    Test that when nodes are removed from the node index, all state kept for them is dropped
+    and the vocabulary caches combining the vocabularies of all nodes are invalidated,
+    while the state of the remaining nodes is kept.
+    """
+    kept_node_url = "https://firstpublicnode.org/"
+    removed_node_url = "https://removednode.org/"
+    monkeypatch.setattr(
+        util,
+        "FEDERATION_NODES",
+        {kept_node_url: "First Public Node", removed_node_url: "Removed Node"},
+    )
+    monkeypatch.setattr(util, "NODE_HTTP_CLIENTS", {})
+    monkeypatch.setattr(util, "NODE_HTTP_VERSIONS", {})
+    monkeypatch.setattr(util.NODE_LATENCY_TRACKER, "_latencies", {})
+    monkeypatch.setattr(util.NODE_LATENCY_TRACKER, "_backoffs", {})
+    for node_url in (kept_node_url, removed_node_url):
+        util.get_node_circuit_breaker(node_url)
+        util.record_node_http_version(node_url, "HTTP/1.1")
+        util.NODE_LATENCY_TRACKER.record(node_url, "query", 0.1)
+        crud.NODE_VOCABULARY_INDEX.update_terms(
+            node_url, "assessments", ["snomed:1234"]
+        )
+    crud.DATASET_NODE_INDEX.update(removed_node_url, ["dataset"])
+    crud.VOCABULARY_CACHE.set("assessments", [])
+
+    await util.update_federation_node_index(
+        {kept_node_url: "First Public Node"}
+    )
+
+    assert set(util.NODE_CIRCUIT_BREAKERS) == {kept_node_url}
+    assert set(util.NODE_HTTP_VERSIONS) == {kept_node_url}
+    assert set(util.NODE_LATENCY_TRACKER._latencies) == {
+        (kept_node_url, "query")
+    }
+    assert (
+        crud.NODE_VOCABULARY_INDEX.get_terms(kept_node_url, "assessments")
+        is not None
+    )
+    assert (
+        crud.NODE_VOCABULARY_INDEX.get_terms(removed_node_url, "assessments")
+        is None
+    )
+    assert crud.DATASET_NODE_INDEX.get_nodes("dataset") is None
+    assert "assessments" not in crud.VOCABULARY_CACHE
@@ -1,3 +1,7 @@
+import asyncio
+import json
+from urllib.parse import urlparse
+
 import httpx
 import pytest
 from fastapi import status
@@ -184,3 +188,111 @@ def test_invalid_nodes_query_raises_error(
 
     assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
     assert expected_error in response.text
+
+
+def test_nodes_exceeding_deadline_reported_as_timed_out(
+    test_app,
+    disable_auth,
+    set_valid_test_federation_nodes,
+    mocked_datasets_query_response_for_single_dataset,
+    monkeypatch,
+):
+    """
+    Test that when a node does not respond before the deadline set in the request header,
+    POST /datasets returns the results that have arrived, and the late node is reported as timed out.
+    """
+    received_deadline_headers = []
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        received_deadline_headers.append(
+            float(kwargs["headers"]["X-Federation-Deadline"])
+        )
+        if urlparse(url).hostname == "secondpublicnode.org":
+            await asyncio.sleep(10)
+        return httpx.Response(
+            status_code=200,
+            json=[mocked_datasets_query_response_for_single_dataset],
+        )
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+
+    response = test_app.post(
+        ROUTE, json={}, headers={"X-Federation-Deadline": "0.5"}
+    )
+
+    assert response.status_code == status.HTTP_207_MULTI_STATUS
+    response = response.json()
+    assert response["nodes_response_status"] == "partial success"
+    assert len(response["responses"]) == 1
+    assert response["responses"][0]["node_name"] == "First Public Node"
+    assert response["errors"] == [
+        {
+            "node_name": "Second Public Node",
+            "error": "Request failed due to a timeout: the node did not respond before the federation deadline.",
+        }
+    ]
+    assert all(0 < budget <= 0.5 for budget in received_deadline_headers)
+
+
+@pytest.mark.parametrize(
+    "params,headers,expected_media_type",
+    [
+        ({"stream": True}, {}, "application/x-ndjson"),
+        ({}, {"Accept": "application/x-ndjson"}, "application/x-ndjson"),
+        ({}, {"Accept": "text/event-stream"}, "text/event-stream"),
+    ],
+)
+def test_streamed_dataset_results(
+    test_app,
+    disable_auth,
+    set_valid_test_federation_nodes,
+    mocked_datasets_query_response_for_single_dataset,
+    monkeypatch,
+    params,
+    headers,
+    expected_media_type,
+):
+    """
+    Test that when streaming is requested, POST /datasets sends each matching dataset as soon as its node responds,
+    followed by a summary event, as either NDJSON lines or server-sent events.
+    """
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        if urlparse(url).hostname == "firstpublicnode.org":
+            await asyncio.sleep(0.2)
+        return httpx.Response(
+            status_code=200,
+            json=[mocked_datasets_query_response_for_single_dataset],
+        )
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+
+    response = test_app.post(ROUTE, json={}, params=params, headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith(expected_media_type)
+    if expected_media_type == "text/event-stream":
+        events = []
+        for message in response.text.strip().split("\n\n"):
+            event_line, data_line = message.split("\n")
+            events.append(
+                {
+                    "event": event_line.removeprefix("event: "),
+                    "data": json.loads(data_line.removeprefix("data: ")),
+                }
+            )
+    else:
+        events = [json.loads(line) for line in response.text.splitlines()]
+
+    assert [event["event"] for event in events] == [
+        "response",
+        "response",
+        "summary",
+    ]
+    assert events[0]["data"]["node_name"] == "Second Public Node"
+    assert events[1]["data"]["node_name"] == "First Public Node"
+    assert events[0]["data"]["dataset_name"] == "QPN"
+    assert events[-1]["data"] == {
+        "errors": [],
+        "nodes_response_status": "success",
+    }
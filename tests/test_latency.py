@@ -0,0 +1,151 @@
+import pytest
+
+from app.api.latency import LatencyTracker, calculate_percentile
+
+
+@pytest.fixture()
+def latency_tracker():
+    return LatencyTracker(
+        window_size=100,
+        min_samples=5,
+        timeout_multiplier=3,
+        min_timeout=1,
+        max_timeout=20,
+        default_timeout=5,
+    )
+
+
+@pytest.mark.parametrize(
+    "percentile,expected_value",
+    [(50, 5), (95, 10), (99, 10), (10, 1)],
+)
+def test_calculate_percentile(percentile, expected_value):
+    """Test that percentiles are calculated using the nearest-rank method."""
+    assert calculate_percentile(list(range(1, 11)), percentile) == (
+        expected_value
+    )
+
+
+def test_latencies_tracked_per_node_and_path(latency_tracker):
+    """Test that latencies are tracked separately for each node and request path."""
+    for _ in range(10):
+        latency_tracker.record("https://firstnode.org/", "subjects", 2)
+    for _ in range(10):
+        latency_tracker.record("https://firstnode.org/", "datasets", 0.5)
+
+    assert (
+        latency_tracker.get_timeout("https://firstnode.org/", "subjects") == 6
+    )
+    assert (
+        latency_tracker.get_timeout("https://firstnode.org/", "datasets")
+        == 1.5
+    )
+    assert (
+        latency_tracker.get_timeout("https://secondnode.org/", "subjects") == 5
+    )
+
+
+def test_rolling_window_drops_oldest_latencies(latency_tracker):
+    """Test that only the most recent latencies within the window are used."""
+    for _ in range(100):
+        latency_tracker.record("https://firstnode.org/", "subjects", 5)
+    for _ in range(100):
+        latency_tracker.record("https://firstnode.org/", "subjects", 0.5)
+
+    assert (
+        latency_tracker.get_timeout("https://firstnode.org/", "subjects")
+        == 1.5
+    )
+
+
+@pytest.mark.parametrize(
+    "latency,expected_timeout",
+    [
+        # Multiple of the p99 latency
+        (2, 6),
+        # Bounded by the minimum timeout
+        (0.05, 1),
+        # Bounded by the maximum timeout
+        (15, 20),
+    ],
+)
+def test_timeout_derived_from_tail_latency(
+    latency_tracker, latency, expected_timeout
+):
+    """Test that the timeout is a multiple of the p99 latency of the node, within the configured bounds."""
+    for _ in range(10):
+        latency_tracker.record("https://firstnode.org/", "subjects", latency)
+
+    assert (
+        latency_tracker.get_timeout("https://firstnode.org/", "subjects")
+        == expected_timeout
+    )
+
+
+def test_default_timeout_used_without_enough_samples(latency_tracker):
+    """
+    Test that the default timeout is used until enough latencies have been observed for a node,
+    and that it only grows toward the maximum timeout after timeouts.
+    """
+    for _ in range(4):
+        latency_tracker.record("https://firstnode.org/", "subjects", 0.1)
+
+    assert (
+        latency_tracker.get_timeout("https://firstnode.org/", "subjects") == 5
+    )
+    assert (
+        latency_tracker.get_timeout("https://secondnode.org/", "subjects") == 5
+    )
+
+    latency_tracker.record_timeout("https://secondnode.org/", "subjects", 5)
+    assert (
+        latency_tracker.get_timeout("https://secondnode.org/", "subjects")
+        == 10
+    )
+    latency_tracker.record_timeout("https://secondnode.org/", "subjects", 10)
+    latency_tracker.record_timeout("https://secondnode.org/", "subjects", 20)
+    assert (
+        latency_tracker.get_timeout("https://secondnode.org/", "subjects")
+        == 20
+    )
+
+
+def test_timeout_backed_off_after_timeouts_and_recovers(latency_tracker):
+    """
+    Test that timeouts raise the timeout of a node above its previously observed latencies,
+    so that a node that has become slower can respond again, and that the timeout recovers once it responds.
+    """
+    for _ in range(10):
+        latency_tracker.record("https://firstnode.org/", "subjects", 0.5)
+    assert (
+        latency_tracker.get_timeout("https://firstnode.org/", "subjects")
+        == 1.5
+    )
+
+    # The node has become slower than the timeout
+    latency_tracker.record_timeout("https://firstnode.org/", "subjects", 1.5)
+    assert (
+        latency_tracker.get_timeout("https://firstnode.org/", "subjects") == 9
+    )
+    latency_tracker.record_timeout("https://firstnode.org/", "subjects", 9)
+    assert (
+        latency_tracker.get_timeout("https://firstnode.org/", "subjects") == 20
+    )
+
+    # The slow responses are now received within the timeout
+    latency_tracker.record("https://firstnode.org/", "subjects", 8)
+    assert (
+        latency_tracker.get_timeout("https://firstnode.org/", "subjects") == 20
+    )
+    latency_tracker.record("https://firstnode.org/", "subjects", 8)
+    assert (
+        latency_tracker.get_timeout("https://firstnode.org/", "subjects") == 20
+    )
+
+    # Once the slow latencies leave the window, the timeout returns to its original value
+    for _ in range(100):
+        latency_tracker.record("https://firstnode.org/", "subjects", 0.5)
+    assert (
+        latency_tracker.get_timeout("https://firstnode.org/", "subjects")
+        == 1.5
+    )
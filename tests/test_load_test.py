@@ -0,0 +1,87 @@
+import orjson
+import pytest
+
+from app.api import utility as util
+from benchmarks.load_test import compare_results, measure_scenario
+
+
+@pytest.fixture()
+def disable_public_nodes(monkeypatch):
+    """Federate only over the locally defined nodes, without fetching the public node directory."""
+    monkeypatch.setattr(
+        util,
+        "IS_FEDERATE_REMOTE_PUBLIC_NODES",
+        util.EnvVar("NB_FEDERATE_REMOTE_PUBLIC_NODES", False),
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("endpoint", ["query", "subjects", "diagnoses"])
+async def test_scenario_measured_against_stub_nodes(
+    disable_public_nodes, disable_auth, endpoint
+):
+    """Test that a load scenario against stub nodes completes without errors and reports its measurements."""
+    local_node_index_path = util.LOCAL_NODE_INDEX_PATH
+
+    result = await measure_scenario(
+        endpoint=endpoint,
+        num_nodes=3,
+        subjects_per_dataset=5,
+        concurrency=2,
+        duration=0.2,
+        warmup=0,
+        num_datasets=2,
+    )
+
+    assert result["requests"] > 0
+    assert result["errors"] == 0
+    assert result["throughput_rps"] > 0
+    assert set(result["latency_ms"]) == {"mean", "p50", "p95", "p99", "max"}
+    assert result["peak_rss_bytes"] >= result["peak_rss_before_load_bytes"]
+    assert util.LOCAL_NODE_INDEX_PATH == local_node_index_path
+    assert util.FEDERATION_NODES == {}
+
+
+def test_results_compared_by_scenario(tmp_path):
+    """Test that results are compared between runs for the scenarios found in both runs."""
+
+    def write_results(path, node_counts, throughput_rps, p95):
+        path.write_bytes(
+            orjson.dumps(
+                {
+                    "metadata": {},
+                    "results": [
+                        {
+                            "endpoint": "query",
+                            "num_nodes": num_nodes,
+                            "subjects_per_dataset": 10,
+                            "concurrency": 1,
+                            "throughput_rps": throughput_rps,
+                            "latency_ms": {"p50": 10, "p95": p95, "p99": 30},
+                            "peak_rss_bytes": 100,
+                        }
+                        for num_nodes in node_counts
+                    ],
+                }
+            )
+        )
+
+    write_results(
+        tmp_path / "baseline.json", (1, 10), throughput_rps=100, p95=20
+    )
+    write_results(
+        tmp_path / "results.json", (1, 100), throughput_rps=150, p95=15
+    )
+
+    assert compare_results(
+        tmp_path / "baseline.json", tmp_path / "results.json"
+    ) == [
+        {
+            "scenario": ("query", 1, 10, 1),
+            "throughput_rps": "+50.0%",
+            "latency_p50": "+0.0%",
+            "latency_p95": "-25.0%",
+            "latency_p99": "+0.0%",
+            "peak_rss": "+0.0%",
+        }
+    ]
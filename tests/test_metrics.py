@@ -0,0 +1,178 @@
+import httpx
+import pytest
+from fastapi import status
+
+from app.api import metrics
+from app.api import utility as util
+from app.api.shared_store import SharedStore
+
+
+@pytest.fixture()
+def histogram():
+    histogram = metrics.Histogram(
+        "test_duration_seconds",
+        "Test durations.",
+        label_names=("node",),
+        buckets=(0.1, 1),
+    )
+    yield histogram
+    metrics.METRICS.remove(histogram)
+
+
+def test_histogram_rendered_with_cumulative_buckets(histogram):
+    """Test that a histogram is rendered in the exposition format with cumulative bucket counts, a sum and a count."""
+    for value in [0.05, 0.5, 5]:
+        histogram.observe(value, 'Node "1"')
+
+    assert histogram.render() == [
+        "# HELP test_duration_seconds Test durations.",
+        "# TYPE test_duration_seconds histogram",
+        'test_duration_seconds_bucket{node="Node \\"1\\"",le="0.1"} 1',
+        'test_duration_seconds_bucket{node="Node \\"1\\"",le="1"} 2',
+        'test_duration_seconds_bucket{node="Node \\"1\\"",le="+Inf"} 3',
+        'test_duration_seconds_sum{node="Node \\"1\\""} 5.55',
+        'test_duration_seconds_count{node="Node \\"1\\""} 3',
+    ]
+
+
+def test_federated_query_recorded_in_metrics(
+    monkeypatch,
+    test_app,
+    set_valid_test_federation_nodes,
+    mocked_cohort_query_response_for_single_dataset,
+    disable_auth,
+):
+    """
+    Test that a federated query records the latency, outcome and response size of the request to each node,
+    the number of nodes queried and the end-to-end latency of the query, which are then exposed at /metrics.
+    """
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        if url == "https://firstpublicnode.org/query":
+            return httpx.Response(
+                status_code=200,
+                json=[mocked_cohort_query_response_for_single_dataset],
+            )
+        return httpx.Response(
+            status_code=500, json={}, text="Some internal server error"
+        )
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+
+    test_app.get("/query")
+    response = test_app.get("/metrics")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Type"] == metrics.CONTENT_TYPE
+    assert (
+        metrics.NODE_REQUESTS.get("First Public Node", "query", "success", "")
+        == 1
+    )
+    assert (
+        metrics.NODE_REQUESTS.get(
+            "Second Public Node", "query", "error", "http_5xx"
+        )
+        == 1
+    )
+    assert (
+        metrics.NODE_REQUEST_DURATION.get_count("First Public Node", "query")
+        == 1
+    )
+    assert (
+        metrics.NODE_RESPONSE_SIZE.get_count("First Public Node", "query") == 1
+    )
+    assert metrics.FEDERATION_FANOUT.get_count("query") == 1
+    assert metrics.HTTP_REQUEST_DURATION.get_count("/query", "GET", 207) == 1
+    assert (
+        'nb_fapi_node_requests_total{node="Second Public Node",path="query",outcome="error",error_class="http_5xx"} 1'
+        in response.text
+    )
+    assert "nb_fapi_outbound_requests_in_flight 0" in response.text
+
+
+def test_metrics_of_all_worker_processes_merged(
+    monkeypatch, test_app, tmp_path, disable_auth
+):
+    """
+    Test that with a shared store, the metrics published by the other worker processes
+    are merged with those of the worker process handling the scrape.
+    """
+    metrics.NODE_REQUESTS.inc("First Public Node", "query", "success", "")
+    metrics.NODE_REQUEST_DURATION.observe(0.5, "First Public Node", "query")
+    other_worker_snapshot = metrics.snapshot_metrics()
+    metrics.clear_metrics()
+    metrics.NODE_REQUESTS.inc("First Public Node", "query", "success", "")
+    metrics.NODE_REQUEST_DURATION.observe(1.5, "First Public Node", "query")
+
+    shared_store = SharedStore(tmp_path / "shared_store.sqlite3")
+    shared_store.set("metrics", "1", other_worker_snapshot, ttl=60)
+    shared_store.set("metrics", "2", other_worker_snapshot, ttl=-1)
+    monkeypatch.setattr(util, "SHARED_STORE", shared_store)
+
+    response = test_app.get("/metrics")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert (
+        'nb_fapi_node_requests_total{node="First Public Node",path="query",outcome="success",error_class=""} 2'
+        in response.text
+    )
+    assert (
+        'nb_fapi_node_request_duration_seconds_count{node="First Public Node",path="query"} 2'
+        in response.text
+    )
+    assert (
+        'nb_fapi_node_request_duration_seconds_sum{node="First Public Node",path="query"} 2'
+        in response.text
+    )
+    assert "nb_fapi_outbound_requests_in_flight 0" in response.text
+
+
+def test_gauge_values_of_worker_processes_merged():
+    """Test that gauge values from several processes are summed, or take the highest value for gauges that are not summed."""
+    summed_gauge = metrics.Gauge(
+        "test_in_flight", "Test.", collect=lambda: {}, label_names=("node",)
+    )
+    max_gauge = metrics.Gauge(
+        "test_info",
+        "Test.",
+        collect=lambda: {},
+        label_names=("node",),
+        is_summed=False,
+    )
+    try:
+        snapshots = [
+            {("Node 1",): 1},
+            {("Node 1",): 2, ("Node 2",): 1},
+        ]
+
+        assert summed_gauge.merge_samples(snapshots) == {
+            ("Node 1",): 3,
+            ("Node 2",): 1,
+        }
+        assert max_gauge.merge_samples(snapshots) == {
+            ("Node 1",): 2,
+            ("Node 2",): 1,
+        }
+    finally:
+        metrics.METRICS.remove(summed_gauge)
+        metrics.METRICS.remove(max_gauge)
+
+
+def test_metrics_require_token_when_auth_enabled(test_app, enable_auth):
+    """Test that when authentication is enabled, the metrics cannot be read without a token."""
+    response = test_app.get("/metrics")
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_metrics_can_be_disabled(monkeypatch, test_app, disable_auth):
+    """Test that the metrics endpoint can be disabled."""
+    monkeypatch.setattr(
+        util,
+        "IS_METRICS_ENABLED",
+        util.EnvVar("NB_FAPI_ENABLE_METRICS", False),
+    )
+
+    response = test_app.get("/metrics")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -1,5 +1,6 @@
 import httpx
 import pytest
+from fastapi import status
 
 from app.api import utility as util
 
@@ -22,7 +23,7 @@ def test_nodes_discovery_endpoint(
     def mock_parse_nodes_as_dict(path):
         return local_nodes
 
-    def mock_httpx_get(**kwargs):
+    async def mock_httpx_get(self, url, **kwargs):
         return httpx.Response(
             status_code=200,
             json=[
@@ -38,7 +39,7 @@ def test_nodes_discovery_endpoint(
         )
 
     monkeypatch.setattr(util, "parse_nodes_as_dict", mock_parse_nodes_as_dict)
-    monkeypatch.setattr(httpx, "get", mock_httpx_get)
+    monkeypatch.setattr(httpx.AsyncClient, "get", mock_httpx_get)
 
     with test_app:
         response = test_app.get("/nodes")
@@ -63,18 +64,21 @@ def test_nodes_discovery_endpoint(
 def test_failed_public_nodes_fetching_raises_warning(
     test_app, monkeypatch, disable_auth, caplog
 ):
-    """Test that when request for remote list of public nodes fails, an informative warning is raised and the federation node index only includes local nodes."""
+    """
+    Test that when request for remote list of public nodes fails, an informative warning is raised and the federation node index only includes local nodes.
+    Without a node directory snapshot, the directory is fetched in the background after startup with the local nodes.
+    """
 
     def mock_parse_nodes_as_dict(path):
         return {"https://mylocalnode.org/": "Local Node"}
 
-    def mock_httpx_get(**kwargs):
+    async def mock_httpx_get(self, url, **kwargs):
         return httpx.Response(
             status_code=404, json={}, text="Some error message"
         )
 
     monkeypatch.setattr(util, "parse_nodes_as_dict", mock_parse_nodes_as_dict)
-    monkeypatch.setattr(httpx, "get", mock_httpx_get)
+    monkeypatch.setattr(httpx.AsyncClient, "get", mock_httpx_get)
 
     with test_app:
         response = test_app.get("/nodes")
@@ -88,7 +92,10 @@ def test_failed_public_nodes_fetching_raises_warning(
             }
         ]
 
-    assert len(caplog.records) == 1
+    warnings = [
+        record for record in caplog.records if record.levelname == "WARNING"
+    ]
+    assert len(warnings) == 1
     for warn_substr in [
         "IS_FEDERATE_REMOTE_PUBLIC_NODES is set to True, but\n"
         "unable to fetch directory of public Neurobagel nodes",
@@ -105,7 +112,7 @@ def test_unset_local_nodes_raises_warning(
     def mock_parse_nodes_as_dict(path):
         return {}
 
-    def mock_httpx_get(**kwargs):
+    async def mock_httpx_get(self, url, **kwargs):
         return httpx.Response(
             status_code=200,
             json=[
@@ -121,7 +128,7 @@ def test_unset_local_nodes_raises_warning(
         )
 
     monkeypatch.setattr(util, "parse_nodes_as_dict", mock_parse_nodes_as_dict)
-    monkeypatch.setattr(httpx, "get", mock_httpx_get)
+    monkeypatch.setattr(httpx.AsyncClient, "get", mock_httpx_get)
 
     with test_app:
         response = test_app.get("/nodes")
@@ -188,13 +195,13 @@ def test_no_available_nodes_raises_error(
     def mock_parse_nodes_as_dict(path):
         return {}
 
-    def mock_httpx_get(**kwargs):
+    async def mock_httpx_get(self, url, **kwargs):
         return httpx.Response(
             status_code=404, json={}, text="Some error message"
         )
 
     monkeypatch.setattr(util, "parse_nodes_as_dict", mock_parse_nodes_as_dict)
-    monkeypatch.setattr(httpx, "get", mock_httpx_get)
+    monkeypatch.setattr(httpx.AsyncClient, "get", mock_httpx_get)
 
     with pytest.raises(RuntimeError) as exc_info:
         with test_app:
@@ -207,3 +214,197 @@ def test_no_available_nodes_raises_error(
     assert len(errors) == 1
     assert expected_err in errors[0].getMessage()
     assert expected_err in str(exc_info.value)
+
+
+@pytest.mark.asyncio
+async def test_node_health_checks_record_reachability(
+    monkeypatch, set_valid_test_federation_nodes
+):
+    """Test that health checks record nodes that respond as reachable and nodes that cannot be reached as unreachable."""
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        if httpx.URL(url).host == "secondpublicnode.org":
+            raise httpx.ConnectError("Some connection error")
+        return httpx.Response(status_code=200, text="Welcome!")
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+
+    await util.check_all_nodes_health()
+
+    first_node_health = util.NODE_HEALTH["https://firstpublicnode.org/"]
+    second_node_health = util.NODE_HEALTH["https://secondpublicnode.org/"]
+    assert first_node_health["is_reachable"] is True
+    assert first_node_health["latency"] is not None
+    assert second_node_health["is_reachable"] is False
+    assert "Some connection error" in second_node_health["error"]
+
+
+def test_nodes_health_endpoint(
+    test_app, monkeypatch, set_valid_test_federation_nodes
+):
+    """Test that the health of each node is reported by the /nodes/health endpoint."""
+    monkeypatch.setattr(
+        util,
+        "NODE_HEALTH",
+        {
+            "https://firstpublicnode.org/": {
+                "is_reachable": False,
+                "latency": None,
+                "last_checked": "2026-01-01T00:00:00+00:00",
+                "error": "ConnectError: Some connection error",
+            }
+        },
+    )
+
+    response = test_app.get("/nodes/health")
+
+    assert response.json() == [
+        {
+            "NodeName": "First Public Node",
+            "ApiURL": "https://firstpublicnode.org/",
+            "IsReachable": False,
+            "LatencySeconds": None,
+            "LastChecked": "2026-01-01T00:00:00+00:00",
+            "Error": "ConnectError: Some connection error",
+            "InFlightRequests": 0,
+            "QueuedRequests": 0,
+        },
+        {
+            "NodeName": "Second Public Node",
+            "ApiURL": "https://secondpublicnode.org/",
+            "IsReachable": None,
+            "LatencySeconds": None,
+            "LastChecked": None,
+            "Error": None,
+            "InFlightRequests": 0,
+            "QueuedRequests": 0,
+        },
+    ]
+
+
+@pytest.mark.parametrize(
+    "nodes_query,unreachable_nodes,expected_queried_hosts,expected_skipped_nodes",
+    [
+        # Unreachable nodes are left out when querying all nodes by default, and reported as errors
+        (
+            None,
+            ["https://secondpublicnode.org/"],
+            {"firstpublicnode.org"},
+            ["Second Public Node"],
+        ),
+        # Explicitly requested nodes are always queried
+        (
+            [{"node_url": "https://secondpublicnode.org/"}],
+            ["https://secondpublicnode.org/"],
+            {"secondpublicnode.org"},
+            [],
+        ),
+        # When no node is reachable, all nodes are queried so that errors are reported
+        (
+            None,
+            [
+                "https://firstpublicnode.org/",
+                "https://secondpublicnode.org/",
+            ],
+            {"firstpublicnode.org", "secondpublicnode.org"},
+            [],
+        ),
+    ],
+)
+def test_unreachable_nodes_skipped_by_default(
+    test_app,
+    disable_auth,
+    set_valid_test_federation_nodes,
+    mocked_datasets_query_response_for_single_dataset,
+    monkeypatch,
+    nodes_query,
+    unreachable_nodes,
+    expected_queried_hosts,
+    expected_skipped_nodes,
+):
+    """Test that nodes found unreachable at the last health check are only left out of default federated requests."""
+    queried_hosts = set()
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        queried_hosts.add(httpx.URL(url).host)
+        return httpx.Response(
+            status_code=200,
+            json=[mocked_datasets_query_response_for_single_dataset],
+        )
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+    for node_url in unreachable_nodes:
+        util.NODE_HEALTH[node_url] = {
+            "is_reachable": False,
+            "latency": None,
+            "last_checked": "2026-01-01T00:00:00+00:00",
+            "error": "ConnectError: Some connection error",
+        }
+
+    response = test_app.post("/datasets", json={"nodes": nodes_query})
+
+    assert response.status_code == (
+        status.HTTP_207_MULTI_STATUS
+        if expected_skipped_nodes
+        else status.HTTP_200_OK
+    )
+    assert queried_hosts == expected_queried_hosts
+    assert response.json()["errors"] == [
+        {
+            "node_name": node_name,
+            "error": "Request skipped: unreachable at last health check.",
+        }
+        for node_name in expected_skipped_nodes
+    ]
+    assert response.json()["nodes_response_status"] == (
+        "partial success" if expected_skipped_nodes else "success"
+    )
+
+
+@pytest.mark.parametrize(
+    "route",
+    ["/query", "/assessments", "/pipelines/np:fmriprep/versions"],
+)
+def test_unreachable_nodes_reported_in_get_request_errors(
+    test_app,
+    disable_auth,
+    set_valid_test_federation_nodes,
+    monkeypatch,
+    route,
+):
+    """Test that nodes skipped as unreachable in GET requests to all nodes are reported in the response errors."""
+    queried_hosts = set()
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        queried_hosts.add(httpx.URL(url).host)
+        return httpx.Response(
+            status_code=200,
+            json=(
+                []
+                if route == "/query"
+                else {
+                    "nb:Assessment": [],
+                    "np:fmriprep": ["23.1.3"],
+                }
+            ),
+        )
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+    util.NODE_HEALTH["https://secondpublicnode.org/"] = {
+        "is_reachable": False,
+        "latency": None,
+        "last_checked": "2026-01-01T00:00:00+00:00",
+        "error": "ConnectError: Some connection error",
+    }
+
+    response = test_app.get(route)
+
+    assert response.status_code == status.HTTP_207_MULTI_STATUS
+    assert queried_hosts == {"firstpublicnode.org"}
+    assert response.json()["errors"] == [
+        {
+            "node_name": "Second Public Node",
+            "error": "Request skipped: unreachable at last health check.",
+        }
+    ]
+    assert response.json()["nodes_response_status"] == "partial success"
@@ -67,3 +67,41 @@ def test_invalid_response_format_handled_gracefully(
         "Unexpected response format" in response_object["errors"][0]["error"]
     )
     assert response_object["nodes_response_status"] == "partial success"
+
+
+def test_pipeline_versions_cached_and_invalidated_with_pipelines(
+    test_app, monkeypatch, set_valid_test_federation_nodes
+):
+    """
+    Test that the versions of a pipeline (including when no node has any versions of it) are served from the cache,
+    until the pipelines vocabulary is refreshed.
+    """
+    requested_paths = []
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        path = urlparse(url).path
+        requested_paths.append(path)
+        if path == "/pipelines":
+            mocked_response_json = {"nb:Pipeline": []}
+        elif "np:pipeline1" in path:
+            mocked_response_json = {"np:pipeline1": ["1.0.0"]}
+        else:
+            mocked_response_json = {"np:unknown": []}
+        return httpx.Response(status_code=200, json=mocked_response_json)
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+
+    for _ in range(2):
+        response = test_app.get("/pipelines/np:pipeline1/versions")
+        assert response.json()["responses"] == {"np:pipeline1": ["1.0.0"]}
+        response = test_app.get("/pipelines/np:unknown/versions")
+        assert response.json()["responses"] == {"np:unknown": []}
+    assert len(requested_paths) == 4
+
+    test_app.get("/pipelines")
+    test_app.get("/pipelines/np:pipeline1/versions")
+    assert requested_paths[-2:] == [
+        "/pipelines/np:pipeline1/versions",
+        "/pipelines/np:pipeline1/versions",
+    ]
+    assert len(requested_paths) == 8
@@ -0,0 +1,108 @@
+import time
+
+import pytest
+
+from app.api.planner import DatasetNodeIndex, NodeVocabularyIndex
+
+NODE_URL = "https://firstpublicnode.org/"
+
+
+@pytest.fixture()
+def node_vocabulary_index():
+    """Index with a known diagnoses and pipelines vocabulary and pipeline versions for a single node."""
+    index = NodeVocabularyIndex(max_age=60)
+    index.update_terms(NODE_URL, "diagnoses", ["snomed:1", "snomed:2"])
+    index.update_terms(NODE_URL, "pipelines", ["np:fmriprep"])
+    index.update_pipeline_versions(NODE_URL, "np:fmriprep", ["23.1.3"])
+    return index
+
+
+@pytest.mark.parametrize(
+    "query,expected_unmatched_params",
+    [
+        ({"diagnosis": "snomed:1"}, []),
+        ({"diagnosis": "snomed:3"}, ["diagnosis"]),
+        # Healthy controls are never ruled out
+        ({"diagnosis": "ncit:C94342"}, []),
+        # Attributes with an unknown vocabulary are never ruled out
+        ({"assessment": "cogatlas:trm1"}, []),
+        ({"pipeline_name": "np:fmriprep", "pipeline_version": "23.1.3"}, []),
+        (
+            {"pipeline_name": "np:fmriprep", "pipeline_version": "20.2.7"},
+            ["pipeline_version"],
+        ),
+        (
+            {"pipeline_name": "np:freesurfer", "pipeline_version": "7.3.2"},
+            ["pipeline_name"],
+        ),
+        ({"min_age": 10, "diagnosis": None}, []),
+    ],
+)
+def test_unmatched_query_params(
+    node_vocabulary_index, query, expected_unmatched_params
+):
+    """Test that only query parameters with a value known to be missing from the node's vocabulary are unmatched."""
+    assert (
+        node_vocabulary_index.get_unmatched_params(NODE_URL, query)
+        == expected_unmatched_params
+    )
+
+
+def test_outdated_vocabulary_not_used():
+    """Test that a vocabulary older than the maximum age is treated as unknown."""
+    index = NodeVocabularyIndex(max_age=0.01)
+    index.update_terms(NODE_URL, "diagnoses", ["snomed:1"])
+    assert index.get_unmatched_params(NODE_URL, {"diagnosis": "snomed:3"})
+
+    time.sleep(0.02)
+    assert index.get_terms(NODE_URL, "diagnoses") is None
+    assert (
+        index.get_unmatched_params(NODE_URL, {"diagnosis": "snomed:3"}) == []
+    )
+
+
+def test_vocabularies_loaded_from_entries_of_another_index(
+    node_vocabulary_index,
+):
+    """
+    Test that the entries of an index can be loaded into another index (e.g., in another process),
+    without replacing more recent vocabularies and keeping the time the entries were stored.
+    """
+    other_index = NodeVocabularyIndex(max_age=60)
+    other_index.update_terms(NODE_URL, "pipelines", ["np:freesurfer"])
+    entries = node_vocabulary_index.get_entries()
+
+    other_index.load_entries(entries)
+
+    assert other_index.get_terms(NODE_URL, "diagnoses") == {
+        "snomed:1",
+        "snomed:2",
+    }
+    assert other_index.get_terms(NODE_URL, "pipelines") == {"np:freesurfer"}
+    assert other_index.get_pipeline_versions(NODE_URL, "np:fmriprep") == {
+        "23.1.3"
+    }
+
+    outdated_index = NodeVocabularyIndex(max_age=0.01)
+    time.sleep(0.02)
+    outdated_index.load_entries(entries)
+    assert outdated_index.get_terms(NODE_URL, "diagnoses") is None
+
+
+def test_datasets_routed_to_nodes_they_were_found_in():
+    """Test that known datasets are routed to their nodes only, and unknown datasets to all nodes."""
+    other_node_url = "https://secondpublicnode.org/"
+    index = DatasetNodeIndex(max_age=60)
+    index.update(NODE_URL, ["dataset1"])
+    index.update(other_node_url, ["dataset2"])
+
+    assert index.route(
+        [NODE_URL, other_node_url], ["dataset1", "dataset3"]
+    ) == {
+        NODE_URL: ["dataset1", "dataset3"],
+        other_node_url: ["dataset3"],
+    }
+    assert index.route([NODE_URL, other_node_url], ["dataset2"]) == {
+        NODE_URL: [],
+        other_node_url: ["dataset2"],
+    }
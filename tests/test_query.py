@@ -241,3 +241,50 @@ def test_query_without_token_succeeds_when_auth_disabled(
     response = test_app.get("/query")
 
     assert response.status_code == status.HTTP_200_OK
+
+
+def test_nodes_without_queried_term_skipped(
+    monkeypatch,
+    test_app,
+    set_valid_test_federation_nodes,
+    mocked_cohort_query_response_for_single_dataset,
+    mock_token,
+    set_mock_verify_token,
+):
+    """
+    Test that once the diagnoses vocabulary of the nodes is known, a query for a diagnosis
+    is only sent to the nodes that have it, while the skipped nodes are reported without errors.
+    """
+    requested_urls = []
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        requested_urls.append(url)
+        if url.endswith("/diagnoses"):
+            diagnosis_terms = (
+                [{"TermURL": "snomed:1", "Label": "Dx"}]
+                if url.startswith("https://firstpublicnode.org/")
+                else []
+            )
+            return httpx.Response(
+                status_code=200, json={"nb:Diagnosis": diagnosis_terms}
+            )
+        return httpx.Response(
+            status_code=200,
+            json=[mocked_cohort_query_response_for_single_dataset],
+        )
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+
+    test_app.get("/diagnoses")
+    response = test_app.get(
+        "/query",
+        params={"diagnosis": "snomed:1"},
+        headers={"Authorization": mock_token},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["errors"] == []
+    assert response.json()["nodes_response_status"] == "success"
+    assert len(response.json()["responses"]) == 1
+    assert requested_urls[-1] == "https://firstpublicnode.org/query"
+    assert len(requested_urls) == 3
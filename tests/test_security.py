@@ -1,3 +1,9 @@
+import asyncio
+import base64
+import time
+
+import httpx
+import jwt
 import pytest
 from fastapi import HTTPException
 
@@ -44,12 +50,13 @@ def test_missing_client_id_ignored_when_auth_disabled(monkeypatch, test_app):
     "invalid_token",
     ["Bearer faketoken", "Bearer", "faketoken", "fakescheme faketoken"],
 )
-def test_invalid_token_raises_error(monkeypatch, invalid_token):
+@pytest.mark.asyncio
+async def test_invalid_token_raises_error(monkeypatch, invalid_token):
     """Test that an invalid token raises an error from the verification process."""
     monkeypatch.setattr("app.api.security.CLIENT_ID", "foo.id")
 
     with pytest.raises(HTTPException) as exc_info:
-        verify_token(invalid_token)
+        await verify_token(invalid_token)
 
     assert exc_info.value.status_code == 401
     assert "Invalid token" in exc_info.value.detail
@@ -88,13 +95,14 @@ def test_token_returned_without_auth_scheme(monkeypatch, enable_auth):
     assert extract_token(mock_valid_token) == "foo"
 
 
-def test_valid_token_does_not_error_out(monkeypatch, enable_auth):
+@pytest.mark.asyncio
+async def test_valid_token_does_not_error_out(monkeypatch, enable_auth):
     """
     Test that when a valid token is passed to verify_token, the token is returned without errors.
     """
 
-    def mock_get_signing_key_from_jwt(*args, **kwargs):
-        # NOTE: The actual get_signing_key_from_jwt method should return a key object
+    async def mock_get_signing_key(*args, **kwargs):
+        # NOTE: The actual get_signing_key function should return a key object
         return "signingkey"
 
     def mock_jwt_decode(*args, **kwargs):
@@ -109,9 +117,111 @@ def test_valid_token_does_not_error_out(monkeypatch, enable_auth):
 
     monkeypatch.setattr("app.api.security.CLIENT_ID", "123abc.myapp.com")
     monkeypatch.setattr(
-        "app.api.security.JWKS_CLIENT.get_signing_key_from_jwt",
-        mock_get_signing_key_from_jwt,
+        "app.api.security.get_signing_key", mock_get_signing_key
+    )
+    monkeypatch.setattr("app.api.security.jwt.decode", mock_jwt_decode)
+
+    assert await verify_token("Bearer myvalidtoken") == "myvalidtoken"
+
+
+@pytest.mark.asyncio
+async def test_verified_token_is_cached_until_expiry(monkeypatch, enable_auth):
+    """
+    Test that the signature of a valid token is only verified once while the token has not expired,
+    and that tokens that have already expired are not cached.
+    """
+    token_expiries = {
+        "unexpiredtoken": time.time() + 3600,
+        "expiredtoken": time.time() - 1,
+    }
+    decoded_tokens = []
+
+    async def mock_get_signing_key(*args, **kwargs):
+        return "signingkey"
+
+    def mock_jwt_decode(jwt, **kwargs):
+        decoded_tokens.append(jwt)
+        return {
+            "iss": "https://myissuer.com",
+            "aud": "123abc.myapp.com",
+            "iat": 1730476922,
+            "exp": token_expiries[jwt],
+        }
+
+    monkeypatch.setattr("app.api.security.CLIENT_ID", "123abc.myapp.com")
+    monkeypatch.setattr(
+        "app.api.security.get_signing_key", mock_get_signing_key
     )
     monkeypatch.setattr("app.api.security.jwt.decode", mock_jwt_decode)
 
-    assert verify_token("Bearer myvalidtoken") == "myvalidtoken"
+    for _ in range(2):
+        assert await verify_token("Bearer unexpiredtoken") == "unexpiredtoken"
+        assert await verify_token("Bearer expiredtoken") == "expiredtoken"
+
+    assert decoded_tokens == [
+        "unexpiredtoken",
+        "expiredtoken",
+        "expiredtoken",
+    ]
+    assert len(security.VERIFIED_TOKEN_CACHE) == 1
+
+
+@pytest.mark.asyncio
+async def test_public_keys_fetched_once_for_concurrent_tokens(
+    monkeypatch, enable_auth
+):
+    """
+    Test that the identity provider public keys are fetched once and shared between concurrently verified tokens,
+    and that a token signed with an unknown key is rejected without re-fetching keys that were just fetched.
+    """
+    secret = b"a-test-signing-secret-of-at-least-32-bytes"
+    mock_jwks = {
+        "keys": [
+            {
+                "kty": "oct",
+                "kid": "key1",
+                "alg": "HS256",
+                "k": base64.urlsafe_b64encode(secret).rstrip(b"=").decode(),
+            }
+        ]
+    }
+    jwks_requests = []
+
+    async def mock_httpx_get(self, url, **kwargs):
+        jwks_requests.append(url)
+        return httpx.Response(
+            status_code=200,
+            json=mock_jwks,
+            request=httpx.Request("GET", url),
+        )
+
+    def create_token(key_id: str) -> str:
+        return jwt.encode(
+            {
+                "iss": security.ISSUER,
+                "aud": "123abc.myapp.com",
+                "iat": int(time.time()),
+                "exp": int(time.time()) + 3600,
+            },
+            secret,
+            algorithm="HS256",
+            headers={"kid": key_id},
+        )
+
+    monkeypatch.setattr("app.api.security.CLIENT_ID", "123abc.myapp.com")
+    monkeypatch.setattr(httpx.AsyncClient, "get", mock_httpx_get)
+
+    tokens = [create_token("key1") for _ in range(3)]
+    verified_tokens = await asyncio.gather(
+        *(verify_token(f"Bearer {token}") for token in tokens)
+    )
+
+    assert verified_tokens == tokens
+    assert jwks_requests == [security.KEYS_URL]
+
+    with pytest.raises(HTTPException) as exc_info:
+        await verify_token(f"Bearer {create_token('key2')}")
+
+    assert exc_info.value.status_code == 401
+    assert "Unable to find a signing key" in exc_info.value.detail
+    assert jwks_requests == [security.KEYS_URL]
@@ -0,0 +1,255 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from app.api import crud
+from app.api import utility as util
+from app.api.cache import TTLCache
+from app.api.shared_store import SharedStore
+
+
+@pytest.fixture()
+def shared_store_path(tmp_path):
+    return tmp_path / "shared_store.sqlite3"
+
+
+def test_values_are_shared_between_store_instances(shared_store_path):
+    """Test that values set through one store instance (e.g., in one worker process) can be read through another."""
+    store = SharedStore(shared_store_path)
+    other_store = SharedStore(shared_store_path)
+
+    store.set("vocabulary", "assessments", {"nodes_response_status": "ok"})
+    store.set("vocabulary", "expired", "value", ttl=-1)
+    store.set("state", "public_nodes", {"https://node.org/": "Node"}, ttl=60)
+
+    assert other_store.get("vocabulary", "assessments") == (
+        {"nodes_response_status": "ok"},
+        None,
+    )
+    assert other_store.get("vocabulary", "expired") is None
+    value, expires_in = other_store.get("state", "public_nodes")
+    assert value == {"https://node.org/": "Node"}
+    assert 0 < expires_in <= 60
+
+    other_store.clear("vocabulary")
+
+    assert store.get("vocabulary", "assessments") is None
+    assert store.get("state", "public_nodes") is not None
+
+
+def test_concurrent_updates_are_not_lost(shared_store_path):
+    """Test that concurrent read-merge-write updates of a key from different store instances are all kept."""
+
+    def add_updates(worker: str):
+        store = SharedStore(shared_store_path)
+        for update in range(20):
+            store.update(
+                "state",
+                "updates",
+                lambda updates: (updates or []) + [f"{worker}-{update}"],
+            )
+
+    threads = [
+        threading.Thread(target=add_updates, args=(f"worker{worker}",))
+        for worker in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    updates, _ = SharedStore(shared_store_path).get("state", "updates")
+    assert len(updates) == 80
+    assert len(set(updates)) == 80
+
+
+def test_lease_is_held_by_one_owner_at_a_time(shared_store_path):
+    """Test that a lease is only granted to another owner once it has expired, while its owner can renew it."""
+    store = SharedStore(shared_store_path)
+
+    assert store.acquire_lease("node_health_checks", "worker1", ttl=60)
+    assert not store.acquire_lease("node_health_checks", "worker2", ttl=60)
+    assert store.acquire_lease("node_health_checks", "worker1", ttl=-1)
+    assert store.acquire_lease("node_health_checks", "worker2", ttl=60)
+    assert not store.acquire_lease("node_health_checks", "worker1", ttl=60)
+
+
+@pytest.mark.asyncio
+async def test_shared_cache_reuses_value_fetched_by_another_cache(
+    shared_store_path,
+):
+    """
+    Test that a value fetched for one cache sharing a store is reused by another cache sharing the same store
+    (e.g., in another worker process), without fetching it again.
+    """
+    fetch_count = 0
+
+    async def fetch():
+        nonlocal fetch_count
+        fetch_count += 1
+        return {"terms": ["snomed:1234"]}
+
+    cache = TTLCache(ttl=60)
+    other_cache = TTLCache(ttl=60)
+    cache.share(SharedStore(shared_store_path), "vocabulary")
+    other_cache.share(SharedStore(shared_store_path), "vocabulary")
+
+    assert await cache.get_or_fetch("diagnoses", fetch) == {
+        "terms": ["snomed:1234"]
+    }
+    assert await other_cache.get_or_fetch("diagnoses", fetch) == {
+        "terms": ["snomed:1234"]
+    }
+    assert fetch_count == 1
+
+    await other_cache.clear_shared()
+    cache.clear()
+    await cache.get_or_fetch("diagnoses", fetch)
+
+    assert fetch_count == 2
+
+
+@pytest.mark.asyncio
+async def test_node_vocabularies_loaded_with_vocabulary_from_shared_store(
+    monkeypatch, shared_store_path, set_valid_test_federation_nodes
+):
+    """
+    Test that a worker process that takes a vocabulary from the shared store rather than fetching it from the nodes
+    also gets the vocabulary of each node fetched by another worker, so that it still skips nodes that cannot match a query.
+    """
+    node_request_urls = []
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        node_request_urls.append(url)
+        term_url = (
+            "snomed:1234"
+            if url.startswith("https://firstpublicnode.org/")
+            else "snomed:5678"
+        )
+        return httpx.Response(
+            status_code=200,
+            json={"nb:Assessment": [{"TermURL": term_url, "Label": "Test"}]},
+        )
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+    monkeypatch.setattr(util, "SHARED_STORE", SharedStore(shared_store_path))
+    monkeypatch.setattr(crud, "VOCABULARY_CACHE", TTLCache(ttl=60))
+    monkeypatch.setattr(crud, "PIPELINE_VERSIONS_CACHE", TTLCache(ttl=60))
+    crud.share_caches(util.SHARED_STORE)
+
+    vocabulary = await crud.get_instances("assessments")
+    assert len(node_request_urls) == 2
+
+    # Switch to the caches and node vocabularies of another worker process sharing the same store
+    crud.NODE_VOCABULARY_INDEX.clear()
+    monkeypatch.setattr(util, "SHARED_STORE", SharedStore(shared_store_path))
+    monkeypatch.setattr(crud, "VOCABULARY_CACHE", TTLCache(ttl=60))
+    monkeypatch.setattr(crud, "PIPELINE_VERSIONS_CACHE", TTLCache(ttl=60))
+    crud.share_caches(util.SHARED_STORE)
+
+    assert await crud.get_instances("assessments") == vocabulary
+    assert len(node_request_urls) == 2
+    assert crud.plan_node_requests(
+        list(util.FEDERATION_NODES), {"assessment": "snomed:1234"}
+    ) == ["https://firstpublicnode.org/"]
+
+
+@pytest.mark.asyncio
+async def test_vocabularies_fetched_together_written_to_shared_store(
+    monkeypatch, shared_store_path, set_valid_test_federation_nodes
+):
+    """
+    Test that the vocabulary of each attribute and the versions of each pipeline fetched in a single refresh
+    of all vocabularies are written to the shared store, for the other worker processes to reuse.
+    """
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        if url.endswith("/versions"):
+            return httpx.Response(
+                status_code=200, json={"np:fmriprep": ["23.1.3"]}
+            )
+        return httpx.Response(
+            status_code=200,
+            json={
+                attribute_uri: (
+                    [{"TermURL": "np:fmriprep", "Label": "fMRIPrep"}]
+                    if attribute_path == "pipelines"
+                    else []
+                )
+                for attribute_path, attribute_uri in util.RESOURCE_URI_MAP.items()
+            },
+        )
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+    monkeypatch.setattr(util, "SHARED_STORE", SharedStore(shared_store_path))
+    monkeypatch.setattr(crud, "VOCABULARY_CACHE", TTLCache(ttl=60))
+    monkeypatch.setattr(crud, "PIPELINE_VERSIONS_CACHE", TTLCache(ttl=60))
+    crud.share_caches(util.SHARED_STORE)
+
+    await crud.fetch_vocabularies()
+
+    other_store = SharedStore(shared_store_path)
+    for attribute_path in util.RESOURCE_URI_MAP:
+        assert other_store.get("vocabulary", attribute_path) is not None
+    versions, _ = other_store.get("pipeline_versions", "np:fmriprep")
+    assert versions["responses"] == {"np:fmriprep": ["23.1.3"]}
+
+
+@pytest.mark.asyncio
+async def test_node_health_loaded_from_shared_store_without_lease(
+    monkeypatch, shared_store_path
+):
+    """
+    Test that a worker process that does not hold the health check lease does not check the nodes itself,
+    and instead uses the node health recorded by the worker process holding the lease.
+    """
+    shared_node_health = {
+        "https://firstpublicnode.org/": {
+            "is_reachable": False,
+            "latency": None,
+            "last_checked": "2026-01-01T00:00:00+00:00",
+            "error": "ConnectError: Connection refused",
+        },
+        "https://removednode.org/": {
+            "is_reachable": True,
+            "latency": 0.1,
+            "last_checked": "2026-01-01T00:00:00+00:00",
+            "error": None,
+        },
+    }
+    store = SharedStore(shared_store_path)
+    store.acquire_lease("node_health_checks", "another worker", ttl=60)
+    store.set("state", "node_health", shared_node_health)
+    checked_node_urls = []
+
+    async def mock_check_node_health(node_url):
+        checked_node_urls.append(node_url)
+
+    monkeypatch.setattr(util, "SHARED_STORE", store)
+    monkeypatch.setattr(
+        util,
+        "FEDERATION_NODES",
+        {
+            "https://firstpublicnode.org/": "First Public Node",
+            "https://secondpublicnode.org/": "Second Public Node",
+        },
+    )
+    monkeypatch.setattr(
+        util,
+        "HEALTH_CHECK_INTERVAL",
+        util.EnvVar("NB_FAPI_HEALTH_CHECK_INTERVAL", 60),
+    )
+    monkeypatch.setattr(util, "check_node_health", mock_check_node_health)
+
+    health_checks = asyncio.create_task(util.run_node_health_checks())
+    await asyncio.sleep(0.1)
+    health_checks.cancel()
+
+    assert checked_node_urls == []
+    assert util.NODE_HEALTH == {
+        "https://firstpublicnode.org/": shared_node_health[
+            "https://firstpublicnode.org/"
+        ]
+    }
@@ -0,0 +1,189 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.api import crud, timing, tracing
+from app.api import utility as util
+from app.api.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_with_same_key_share_single_call():
+    """Test that concurrent calls with the same key share one call, while calls with a different key run separately."""
+    single_flight = SingleFlight()
+    calls = []
+
+    async def func(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        return value
+
+    results = await asyncio.gather(
+        single_flight.do("key1", lambda: func(1)),
+        single_flight.do("key1", lambda: func(2)),
+        single_flight.do("key2", lambda: func(3)),
+    )
+
+    assert results == [1, 1, 3]
+    assert calls == [1, 3]
+    assert len(single_flight) == 0
+
+    # Once the call is complete, a new call with the same key starts a new call
+    assert await single_flight.do("key1", lambda: func(4)) == 4
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_call():
+    """Test that cancelling one caller does not cancel the shared call for other callers."""
+    single_flight = SingleFlight()
+
+    async def func():
+        await asyncio.sleep(0.05)
+        return "result"
+
+    first_caller = asyncio.create_task(single_flight.do("key", func))
+    second_caller = asyncio.create_task(single_flight.do("key", func))
+    await asyncio.sleep(0)
+    first_caller.cancel()
+
+    assert await second_caller == "result"
+
+
+@pytest.mark.parametrize(
+    "first_query,second_query",
+    [
+        (
+            {"min_age": 20, "nodes": [{"node_url": "https://firstnode.org"}]},
+            {"nodes": [{"node_url": "https://firstnode.org/"}], "min_age": 20},
+        ),
+        (
+            {
+                "nodes": [
+                    {
+                        "node_url": "https://secondnode.org/",
+                        "dataset_uuids": ["ds2", "ds1"],
+                    },
+                    {"node_url": "https://firstnode.org/"},
+                ]
+            },
+            {
+                "nodes": [
+                    {"node_url": "https://firstnode.org/"},
+                    {
+                        "node_url": "https://secondnode.org/",
+                        "dataset_uuids": ["ds1", "ds2"],
+                    },
+                ]
+            },
+        ),
+    ],
+)
+def test_equivalent_queries_have_same_fingerprint(first_query, second_query):
+    """Test that queries differing only in ordering or trailing slashes have the same fingerprint."""
+    assert util.build_query_fingerprint(
+        "subjects", first_query
+    ) == util.build_query_fingerprint("subjects", second_query)
+
+
+@pytest.mark.parametrize(
+    "other_fingerprint_args",
+    [
+        {"path": "datasets", "query": {"min_age": 30}},
+        {"path": "subjects", "query": {"min_age": 30}, "token": "token2"},
+        {"path": "subjects", "query": {"min_age": 30}, "time_budget": 5},
+        {"path": "subjects", "query": {"min_age": 31}, "token": "token1"},
+    ],
+)
+def test_different_queries_have_different_fingerprints(other_fingerprint_args):
+    """Test that queries to different paths, with different parameters, time budgets or users have different fingerprints."""
+    fingerprint = util.build_query_fingerprint(
+        "subjects", {"min_age": 30}, token="token1"
+    )
+    assert "token1" not in fingerprint
+    assert fingerprint != util.build_query_fingerprint(
+        **other_fingerprint_args
+    )
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_queries_fan_out_once(
+    monkeypatch,
+    set_valid_test_federation_nodes,
+    mocked_datasets_query_response_for_single_dataset,
+):
+    """Test that concurrent identical federated queries share one fan-out to the nodes, and all receive its result."""
+    requested_urls = []
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        requested_urls.append(url)
+        await asyncio.sleep(0.05)
+        return httpx.Response(
+            status_code=200,
+            json=[mocked_datasets_query_response_for_single_dataset],
+        )
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+
+    responses = await asyncio.gather(
+        *(crud.post_datasets(query={"min_age": 20}) for _ in range(5)),
+        crud.post_datasets(query={"min_age": 20}, token="sometoken"),
+    )
+
+    assert len(requested_urls) == 4
+    assert all(response == responses[0] for response in responses)
+    assert len(responses[0]["responses"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_coalesced_queries_keep_timing_and_trace_of_each_request(
+    monkeypatch,
+    set_valid_test_federation_nodes,
+    mocked_datasets_query_response_for_single_dataset,
+):
+    """
+    Test that the request of each caller of a shared federated query gets the timing of the node requests,
+    while the node requests carry the request ID of the request that started the call,
+    which the other requests point to through a "coalesced" span.
+    """
+    node_request_ids = []
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        node_request_ids.append(kwargs["headers"][tracing.REQUEST_ID_HEADER])
+        await asyncio.sleep(0.05)
+        return httpx.Response(
+            status_code=200,
+            json=[mocked_datasets_query_response_for_single_dataset],
+        )
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+    tracing.configure_exporters(buffer_size=100, file_path="")
+
+    async def handle_request(request_id: str) -> timing.RequestTiming:
+        tracing.REQUEST_ID.set(request_id)
+        request_timing = timing.RequestTiming()
+        timing.REQUEST_TIMING.set(request_timing)
+        await crud.post_datasets(query={"min_age": 20})
+        return request_timing
+
+    try:
+        first_timing, second_timing = await asyncio.gather(
+            asyncio.create_task(handle_request("first-request")),
+            asyncio.create_task(handle_request("second-request")),
+        )
+        first_spans = await tracing.get_spans(request_id="first-request")
+        second_spans = await tracing.get_spans(request_id="second-request")
+    finally:
+        tracing.close_exporters()
+
+    assert node_request_ids == ["first-request", "first-request"]
+    for request_timing in [first_timing, second_timing]:
+        assert set(request_timing.node_durations) == {
+            "First Public Node",
+            "Second Public Node",
+        }
+        assert "validate" in request_timing.durations
+    assert [span["name"] for span in first_spans].count("node_request") == 2
+    assert [(span["name"], span["attributes"]) for span in second_spans] == [
+        ("coalesced", {"shared_request_id": "first-request"})
+    ]
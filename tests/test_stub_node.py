@@ -0,0 +1,113 @@
+import httpx
+import pytest
+
+from app.api import utility as util
+from benchmarks.stub_node import (
+    LatencyDistribution,
+    build_stub_node_settings,
+    create_in_process_stub_nodes,
+    write_local_node_index,
+)
+
+
+@pytest.fixture()
+def set_stub_federation_nodes(monkeypatch):
+    """Federate over in-process stub nodes, created with the given settings, instead of real nodes."""
+
+    def _set_stub_federation_nodes(num_nodes: int, **settings_kwargs):
+        nodes, transport = create_in_process_stub_nodes(
+            build_stub_node_settings(num_nodes, **settings_kwargs)
+        )
+        monkeypatch.setattr(util, "FEDERATION_NODES", nodes)
+        monkeypatch.setattr(
+            util,
+            "create_http_client",
+            lambda: httpx.AsyncClient(transport=transport),
+        )
+        return nodes
+
+    return _set_stub_federation_nodes
+
+
+@pytest.mark.parametrize(
+    "spec, expected_kind, expected_params",
+    [
+        ("0.05", "constant", (0.05,)),
+        ("uniform:0.01,0.1", "uniform", (0.01, 0.1)),
+        ("lognormal:0.05,0.5", "lognormal", (0.05, 0.5)),
+    ],
+)
+def test_latency_distribution_parsed(spec, expected_kind, expected_params):
+    """Test that latency distributions are parsed from their command-line specification."""
+    distribution = LatencyDistribution.parse(spec)
+
+    assert distribution.kind == expected_kind
+    assert distribution.params == expected_params
+
+
+@pytest.mark.parametrize(
+    "spec", ["uniform:0.01", "gamma:1,2", "constant:-1", "fast"]
+)
+def test_invalid_latency_distribution_raises_error(spec):
+    """Test that unknown distributions and invalid parameters are rejected."""
+    with pytest.raises(ValueError):
+        LatencyDistribution.parse(spec)
+
+
+def test_federated_queries_to_stub_nodes_succeed(
+    test_app, set_stub_federation_nodes, disable_auth
+):
+    """
+    Test that the responses of stub nodes to all the endpoints queried by the federation API are valid,
+    and that the stub nodes filter their synthetic subjects by the query parameters.
+    """
+    set_stub_federation_nodes(3, num_datasets=4, subjects_per_dataset=20)
+
+    query_response = test_app.get("/query").json()
+    filtered_query_response = test_app.get(
+        "/query", params={"min_age": 60}
+    ).json()
+    datasets_response = test_app.post("/datasets", json={}).json()
+    subjects_response = test_app.post("/subjects", json={}).json()
+    vocabularies_response = test_app.get("/vocabularies")
+
+    assert query_response["nodes_response_status"] == "success"
+    assert len(query_response["responses"]) == 12
+    assert sum(
+        dataset["num_matching_subjects"]
+        for dataset in filtered_query_response["responses"]
+    ) < sum(
+        dataset["num_matching_subjects"]
+        for dataset in query_response["responses"]
+    )
+    assert datasets_response["nodes_response_status"] == "success"
+    assert len(datasets_response["responses"]) == 12
+    assert subjects_response["nodes_response_status"] == "success"
+    assert all(
+        len(dataset["subject_data"]) == 20
+        for dataset in subjects_response["responses"]
+    )
+    assert vocabularies_response.status_code == 200
+
+
+def test_stub_node_errors_are_reported(
+    test_app, set_stub_federation_nodes, disable_auth
+):
+    """Test that simulated node errors are reported by the federation API as failed node requests."""
+    set_stub_federation_nodes(2, error_rate=1, error_status=503)
+
+    response = test_app.get("/query").json()
+
+    assert response["nodes_response_status"] == "fail"
+    assert len(response["errors"]) == 2
+
+
+def test_generated_local_node_index_is_loaded(tmp_path):
+    """Test that the generated local node index is read by the federation API as the given nodes."""
+    nodes = {
+        "http://127.0.0.1:9001/": "Stub Node 1",
+        "http://127.0.0.1:9002/": "Stub Node 2",
+    }
+    write_local_node_index(nodes, tmp_path / "local_nb_nodes.json")
+
+    assert util.parse_nodes_as_dict(tmp_path / "local_nb_nodes.json") == nodes
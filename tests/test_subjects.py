@@ -1,7 +1,12 @@
+import asyncio
+import json
+
 import httpx
 import pytest
 from fastapi import status
 
+from app.api import utility as util
+
 ROUTE = "/subjects"
 
 
@@ -178,3 +183,277 @@ def test_extra_query_fields_raise_error(
     assert all(
         msg in response.text for msg in ["invalid_extra_field", "Extra inputs"]
     )
+
+
+@pytest.mark.parametrize(
+    "params,headers",
+    [
+        ({"stream": True}, {}),
+        ({}, {"Accept": "application/x-ndjson"}),
+    ],
+)
+def test_streamed_results_sent_in_order_of_node_responses(
+    test_app,
+    disable_auth,
+    set_valid_test_federation_nodes,
+    mocked_subjects_query_response_for_single_dataset,
+    monkeypatch,
+    params,
+    headers,
+):
+    """
+    Test that when streaming is requested, POST /subjects sends one NDJSON line per matching dataset
+    in the order that the nodes respond, followed by a summary line with the node errors and overall status.
+    """
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        host = httpx.URL(url).host
+        if host == "firstpublicnode.org":
+            await asyncio.sleep(0.2)
+            return httpx.Response(
+                status_code=200,
+                json=[mocked_subjects_query_response_for_single_dataset],
+            )
+        return httpx.Response(
+            status_code=200,
+            json=[
+                mocked_subjects_query_response_for_single_dataset,
+                mocked_subjects_query_response_for_single_dataset,
+            ],
+        )
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+
+    response = test_app.post(ROUTE, json={}, params=params, headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [event["event"] for event in events] == [
+        "response",
+        "response",
+        "response",
+        "summary",
+    ]
+    assert [event["data"]["node_name"] for event in events[:3]] == [
+        "Second Public Node",
+        "Second Public Node",
+        "First Public Node",
+    ]
+    assert events[-1]["data"] == {
+        "errors": [],
+        "nodes_response_status": "success",
+    }
+
+
+def test_streamed_results_summary_includes_node_errors(
+    test_app,
+    disable_auth,
+    set_valid_test_federation_nodes,
+    mocked_subjects_query_response_for_single_dataset,
+    monkeypatch,
+):
+    """Test that when streaming is requested and a node fails, the error is reported in the summary line."""
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        if httpx.URL(url).host == "firstpublicnode.org":
+            raise httpx.ConnectError("Some connection error")
+        return httpx.Response(
+            status_code=200,
+            json=[mocked_subjects_query_response_for_single_dataset],
+        )
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+
+    response = test_app.post(ROUTE, json={}, params={"stream": True})
+
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert len(events) == 2
+    assert events[0]["data"]["node_name"] == "Second Public Node"
+    summary = events[-1]["data"]
+    assert summary["nodes_response_status"] == "partial success"
+    assert summary["errors"][0]["node_name"] == "First Public Node"
+    assert "Some connection error" in summary["errors"][0]["error"]
+
+
+@pytest.mark.parametrize(
+    "subjects_query,expected_node_dataset_uuids",
+    [
+        (
+            {
+                "dataset_uuids": [
+                    "http://neurobagel.org/vocab/first",
+                    "http://neurobagel.org/vocab/unknown",
+                ]
+            },
+            {
+                "https://firstpublicnode.org/subjects": [
+                    "http://neurobagel.org/vocab/first",
+                    "http://neurobagel.org/vocab/unknown",
+                ],
+                "https://secondpublicnode.org/subjects": [
+                    "http://neurobagel.org/vocab/unknown"
+                ],
+            },
+        ),
+        (
+            {"dataset_uuids": ["http://neurobagel.org/vocab/second"]},
+            {
+                "https://secondpublicnode.org/subjects": [
+                    "http://neurobagel.org/vocab/second"
+                ],
+            },
+        ),
+        (
+            {
+                "nodes": [
+                    {
+                        "node_url": "https://firstpublicnode.org",
+                        "dataset_uuids": [
+                            "http://neurobagel.org/vocab/second"
+                        ],
+                    },
+                    {"node_url": "https://secondpublicnode.org"},
+                ]
+            },
+            {"https://secondpublicnode.org/subjects": None},
+        ),
+        # Nodes explicitly given no datasets are still queried with an empty list of datasets
+        (
+            {
+                "nodes": [
+                    {
+                        "node_url": "https://firstpublicnode.org",
+                        "dataset_uuids": [],
+                    },
+                    {"node_url": "https://secondpublicnode.org"},
+                ]
+            },
+            {
+                "https://firstpublicnode.org/subjects": [],
+                "https://secondpublicnode.org/subjects": None,
+            },
+        ),
+    ],
+)
+def test_subjects_query_routed_to_nodes_with_datasets(
+    test_app,
+    disable_auth,
+    set_valid_test_federation_nodes,
+    mocked_datasets_query_response_for_single_dataset,
+    monkeypatch,
+    subjects_query,
+    expected_node_dataset_uuids,
+):
+    """
+    Test that after a POST /datasets query, a POST /subjects query for specific datasets is only sent to
+    the nodes the datasets were found in (or to all nodes, for unknown datasets),
+    and that skipped nodes are reported without errors.
+    """
+    subjects_requests = {}
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        if url.endswith("/datasets"):
+            node_name = (
+                "first" if url.startswith("https://first") else "second"
+            )
+            return httpx.Response(
+                status_code=200,
+                json=[
+                    {
+                        **mocked_datasets_query_response_for_single_dataset,
+                        "dataset_uuid": f"http://neurobagel.org/vocab/{node_name}",
+                    }
+                ],
+            )
+        subjects_requests[url] = kwargs["json"].get("dataset_uuids")
+        return httpx.Response(status_code=200, json=[])
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+    # Disable the query sessions, to only route the query based on the nodes the datasets were found in
+    monkeypatch.setattr(
+        util, "QUERY_SESSION_TTL", util.EnvVar("NB_FAPI_QUERY_SESSION_TTL", 0)
+    )
+
+    test_app.post("/datasets", json={})
+    response = test_app.post(ROUTE, json=subjects_query)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["errors"] == []
+    assert response.json()["nodes_response_status"] == "success"
+    assert subjects_requests == expected_node_dataset_uuids
+
+
+def test_nodes_and_dataset_uuids_cannot_be_combined(test_app, disable_auth):
+    """Test that a POST /subjects query cannot specify datasets both per node and across nodes."""
+    response = test_app.post(
+        ROUTE,
+        json={
+            "nodes": [{"node_url": "https://firstpublicnode.org"}],
+            "dataset_uuids": ["http://neurobagel.org/vocab/12345"],
+        },
+    )
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_subjects_query_skips_nodes_without_matches_in_query_session(
+    test_app,
+    disable_auth,
+    set_valid_test_federation_nodes,
+    mocked_datasets_query_response_for_single_dataset,
+    monkeypatch,
+):
+    """
+    Test that a POST /subjects query following a POST /datasets query with the same filters
+    is not sent to nodes that matched no datasets, or none of the selected datasets,
+    while a query with different filters is sent to all nodes.
+    """
+    subjects_requests = {}
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        if url.endswith("/datasets"):
+            if url.startswith("https://secondpublicnode.org/"):
+                return httpx.Response(status_code=200, json=[])
+            return httpx.Response(
+                status_code=200,
+                json=[mocked_datasets_query_response_for_single_dataset],
+            )
+        subjects_requests[url] = kwargs["json"].get("dataset_uuids")
+        return httpx.Response(status_code=200, json=[])
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+
+    test_app.post("/datasets", json={"min_age": 10})
+
+    response = test_app.post(ROUTE, json={"min_age": 10})
+    assert response.json()["nodes_response_status"] == "success"
+    assert subjects_requests == {"https://firstpublicnode.org/subjects": None}
+
+    subjects_requests.clear()
+    response = test_app.post(
+        ROUTE,
+        json={
+            "min_age": 10,
+            "nodes": [
+                {
+                    "node_url": "https://firstpublicnode.org/",
+                    "dataset_uuids": [
+                        mocked_datasets_query_response_for_single_dataset[
+                            "dataset_uuid"
+                        ],
+                        "http://neurobagel.org/vocab/unmatched",
+                    ],
+                }
+            ],
+        },
+    )
+    assert subjects_requests == {
+        "https://firstpublicnode.org/subjects": [
+            mocked_datasets_query_response_for_single_dataset["dataset_uuid"]
+        ]
+    }
+
+    subjects_requests.clear()
+    test_app.post(ROUTE, json={"min_age": 20})
+    assert len(subjects_requests) == 2
@@ -0,0 +1,67 @@
+import httpx
+import pytest
+from fastapi import status
+
+from app.api import utility as util
+
+
+@pytest.fixture()
+def mock_node_query_responses(
+    monkeypatch, mocked_cohort_query_response_for_single_dataset
+):
+    """Mock successful responses to cohort queries from all nodes."""
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        return httpx.Response(
+            status_code=200,
+            json=[mocked_cohort_query_response_for_single_dataset],
+        )
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+
+
+def test_query_response_has_server_timing_breakdown(
+    test_app,
+    set_valid_test_federation_nodes,
+    mock_node_query_responses,
+    disable_auth,
+):
+    """
+    Test that the response to a federated query has a Server-Timing header with the network time of each node
+    and the time spent decoding, validating and serializing the results, without any timing in the body by default.
+    """
+    response = test_app.get("/query")
+
+    assert response.status_code == status.HTTP_200_OK
+    server_timing = response.headers["Server-Timing"]
+    assert 'desc="First Public Node"' in server_timing
+    assert 'desc="Second Public Node"' in server_timing
+    for step in ["decode", "validate", "serialize", "total"]:
+        assert f"{step};dur=" in server_timing
+    assert "timing" not in response.json()
+
+
+def test_timing_embedded_in_body_when_debug_enabled(
+    monkeypatch,
+    test_app,
+    set_valid_test_federation_nodes,
+    mock_node_query_responses,
+    disable_auth,
+):
+    """Test that when timing debugging is enabled, the timing breakdown is also embedded in the response body."""
+    monkeypatch.setattr(
+        util,
+        "IS_TIMING_DEBUG_ENABLED",
+        util.EnvVar("NB_FAPI_ENABLE_TIMING_DEBUG", True),
+    )
+
+    response = test_app.get("/query")
+    response_body = response.json()
+
+    assert len(response_body["responses"]) == 2
+    assert set(response_body["timing"]["nodes"]) == {
+        "First Public Node",
+        "Second Public Node",
+    }
+    assert response_body["timing"]["total"] >= 0
+    assert int(response.headers["Content-Length"]) == len(response.content)
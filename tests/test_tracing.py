@@ -0,0 +1,172 @@
+import httpx
+import orjson
+import pytest
+from fastapi import status
+
+from app.api import tracing
+from app.api import utility as util
+
+
+@pytest.fixture()
+def trace_file_path(tmp_path):
+    """Record trace spans to an in-memory buffer and a JSON lines file for the duration of a test."""
+    trace_file_path = tmp_path / "traces.jsonl"
+    tracing.configure_exporters(buffer_size=100, file_path=trace_file_path)
+    yield trace_file_path
+    tracing.close_exporters()
+
+
+@pytest.fixture()
+def enable_traces_endpoint(monkeypatch):
+    """Enable the /admin/traces endpoint, which is disabled by default."""
+    monkeypatch.setattr(
+        util,
+        "IS_TRACES_ENDPOINT_ENABLED",
+        util.EnvVar("NB_FAPI_ENABLE_TRACES_ENDPOINT", True),
+    )
+
+
+@pytest.fixture()
+def node_request_headers(
+    monkeypatch, mocked_cohort_query_response_for_single_dataset
+):
+    """Mock successful responses to cohort queries from all nodes, and return the headers of the requests sent to each node."""
+    node_request_headers = {}
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        node_request_headers[url] = kwargs["headers"]
+        return httpx.Response(
+            status_code=200,
+            json=[mocked_cohort_query_response_for_single_dataset],
+        )
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+    return node_request_headers
+
+
+def test_request_id_generated_and_forwarded_to_nodes(
+    test_app,
+    set_valid_test_federation_nodes,
+    node_request_headers,
+    disable_auth,
+):
+    """Test that a request without a request ID is assigned one, which is returned in the response and forwarded to each node."""
+    response = test_app.get("/query")
+
+    request_id = response.headers[tracing.REQUEST_ID_HEADER]
+    assert len(node_request_headers) == 2
+    for headers in node_request_headers.values():
+        assert headers[tracing.REQUEST_ID_HEADER] == request_id
+
+
+@pytest.mark.parametrize(
+    "sent_request_id, is_accepted",
+    [("my-request.id:123", True), ("not a valid id", False), ("", False)],
+)
+def test_valid_request_id_from_client_is_kept(
+    test_app,
+    set_valid_test_federation_nodes,
+    node_request_headers,
+    disable_auth,
+    sent_request_id,
+    is_accepted,
+):
+    """Test that a valid request ID sent by the client is kept, while an invalid one is replaced."""
+    response = test_app.get(
+        "/query", headers={tracing.REQUEST_ID_HEADER: sent_request_id}
+    )
+
+    returned_request_id = response.headers[tracing.REQUEST_ID_HEADER]
+    assert (returned_request_id == sent_request_id) == is_accepted
+    assert tracing.VALID_REQUEST_ID_REGEX.match(returned_request_id)
+
+
+def test_spans_of_request_recorded_and_exported(
+    test_app,
+    set_valid_test_federation_nodes,
+    node_request_headers,
+    disable_auth,
+    trace_file_path,
+    enable_traces_endpoint,
+):
+    """
+    Test that the steps of handling a federated query are recorded as spans nested in the span of the request,
+    which can be read through the admin endpoint and are written to the trace file.
+    """
+    request_id = test_app.get("/query").headers[tracing.REQUEST_ID_HEADER]
+
+    response = test_app.get("/admin/traces", params={"request_id": request_id})
+    spans = response.json()
+
+    assert response.status_code == status.HTTP_200_OK
+    assert sorted(span["name"] for span in spans) == [
+        "merge",
+        "node_request",
+        "node_request",
+        "request",
+        "serialize",
+        "validate",
+    ]
+    request_span = next(span for span in spans if span["name"] == "request")
+    assert request_span["parent_id"] is None
+    assert request_span["attributes"]["status_code"] == 200
+    assert all(
+        span["parent_id"] == request_span["span_id"]
+        for span in spans
+        if span is not request_span
+    )
+    assert {
+        span["attributes"]["node"]
+        for span in spans
+        if span["name"] == "node_request"
+    } == {"First Public Node", "Second Public Node"}
+
+    tracing.close_exporters()
+    exported_spans = [
+        orjson.loads(line)
+        for line in trace_file_path.read_bytes().splitlines()
+    ]
+    assert [
+        span for span in exported_spans if span["request_id"] == request_id
+    ] == spans
+
+
+def test_traces_of_other_worker_processes_read_from_trace_file(
+    test_app, disable_auth, trace_file_path, enable_traces_endpoint
+):
+    """
+    Test that when a trace file is configured, the admin endpoint returns the spans written to it
+    by other worker processes, which are not in the trace buffer of the worker process handling the request.
+    """
+    other_worker_exporter = tracing.JsonLinesExporter(trace_file_path)
+    other_worker_exporter.export(
+        {"request_id": "other-worker-request", "name": "request"}
+    )
+
+    response = test_app.get(
+        "/admin/traces", params={"request_id": "other-worker-request"}
+    )
+    other_worker_exporter.close()
+
+    assert response.json() == [
+        {"request_id": "other-worker-request", "name": "request"}
+    ]
+    assert tracing.RING_BUFFER.get_spans("other-worker-request") == []
+
+
+def test_traces_endpoint_disabled_by_default(
+    test_app, disable_auth, trace_file_path
+):
+    """Test that the admin endpoint for traces is disabled unless it is explicitly enabled."""
+    response = test_app.get("/admin/traces")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_traces_require_token_when_auth_enabled(
+    test_app, enable_auth, trace_file_path, enable_traces_endpoint
+):
+    """Test that when authentication is enabled, the traces cannot be read without a token."""
+    response = test_app.get("/admin/traces")
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
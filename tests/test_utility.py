@@ -1,3 +1,4 @@
+import asyncio
 import json
 from copy import deepcopy
 
@@ -5,6 +6,7 @@ import httpx
 import pytest
 from fastapi import HTTPException
 
+from app.api import metrics
 from app.api import utility as util
 
 
@@ -331,7 +333,7 @@ async def test_federate_only_local_nodes(tmp_path, monkeypatch):
     def mock_parse_nodes_as_dict(path):
         return local_nodes
 
-    def mock_httpx_get(**kwargs):
+    async def mock_httpx_get(self, url, **kwargs):
         return httpx.Response(
             status_code=200,
             json=[
@@ -343,7 +345,7 @@ async def test_federate_only_local_nodes(tmp_path, monkeypatch):
         )
 
     monkeypatch.setattr(util, "parse_nodes_as_dict", mock_parse_nodes_as_dict)
-    monkeypatch.setattr(httpx, "get", mock_httpx_get)
+    monkeypatch.setattr(httpx.AsyncClient, "get", mock_httpx_get)
     monkeypatch.setattr(
         util, "IS_FEDERATE_REMOTE_PUBLIC_NODES", util.EnvVar("", False)
     )
@@ -581,3 +583,459 @@ def test_raw_subjects_query_not_mutated_by_node_requests():
     )
 
     assert original_query == query_copy
+
+
+def test_pooled_node_clients_opened_and_closed_with_lifespan(
+    test_app, monkeypatch, disable_auth
+):
+    """
+    Test that a pooled HTTP client is opened for each federation node on startup
+    and that all pooled clients are closed on shutdown.
+    """
+
+    async def mock_create_federation_node_index():
+        util.FEDERATION_NODES.update(
+            {
+                "https://firstpublicnode.org/": "First Public Node",
+                "https://secondpublicnode.org/": "Second Public Node",
+            }
+        )
+
+    monkeypatch.setattr(util, "FEDERATION_NODES", {})
+    monkeypatch.setattr(
+        util, "create_federation_node_index", mock_create_federation_node_index
+    )
+
+    with test_app:
+        assert set(util.NODE_HTTP_CLIENTS) == {
+            "https://firstpublicnode.org/",
+            "https://secondpublicnode.org/",
+        }
+        clients = list(util.NODE_HTTP_CLIENTS.values())
+
+    assert util.NODE_HTTP_CLIENTS == {}
+    assert all(client.is_closed for client in clients)
+
+
+@pytest.mark.asyncio
+async def test_send_request_reuses_pooled_node_client(monkeypatch):
+    """Test that requests to a node with a pooled HTTP client are all sent using that same client."""
+    node_url = "https://firstpublicnode.org/"
+    clients_used = []
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        clients_used.append(self)
+        return httpx.Response(status_code=200, json=[])
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+    monkeypatch.setattr(util, "NODE_HTTP_CLIENTS", {})
+
+    util.open_node_http_clients([node_url])
+    pooled_client = util.NODE_HTTP_CLIENTS[node_url]
+    for _ in range(3):
+        await util.send_request(
+            method="GET", url=node_url + "query", node_url=node_url
+        )
+    await util.close_node_http_clients()
+
+    assert clients_used == [pooled_client] * 3
+    assert pooled_client.is_closed
+
+
+def test_http2_enabled_without_h2_warns_and_falls_back(monkeypatch, caplog):
+    """
+    Test that when HTTP/2 is enabled but the h2 package is not installed,
+    a warning is logged and pooled clients are created for HTTP/1.1 only.
+    """
+    created_client_kwargs = []
+
+    class MockAsyncClient:
+        def __init__(self, **kwargs):
+            created_client_kwargs.append(kwargs)
+
+    monkeypatch.setattr(
+        util, "IS_HTTP2_ENABLED", util.EnvVar("NB_FAPI_ENABLE_HTTP2", True)
+    )
+    monkeypatch.setattr(util, "IS_HTTP2_AVAILABLE", False)
+    monkeypatch.setattr(httpx, "AsyncClient", MockAsyncClient)
+
+    util.check_http2_support()
+    util.create_http_client()
+
+    assert "the 'h2' package is not installed" in caplog.text
+    assert created_client_kwargs[0]["http2"] is False
+
+
+@pytest.mark.asyncio
+async def test_negotiated_http_version_recorded_per_node(monkeypatch, caplog):
+    """Test that the HTTP protocol version used by each node is recorded, logged when it changes and exposed as a metric."""
+    node_http_versions = {
+        "https://firstpublicnode.org/": "HTTP/2",
+        "https://secondpublicnode.org/": "HTTP/1.1",
+    }
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        node_url = url.removesuffix("query")
+        return httpx.Response(
+            status_code=200,
+            json=[],
+            extensions={"http_version": node_http_versions[node_url].encode()},
+        )
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+    monkeypatch.setattr(util, "NODE_HTTP_VERSIONS", {})
+
+    for _ in range(2):
+        for node_url in node_http_versions:
+            await util.send_request(
+                method="GET", url=node_url + "query", node_url=node_url
+            )
+
+    assert util.NODE_HTTP_VERSIONS == node_http_versions
+    assert caplog.text.count("are using HTTP/2") == 1
+    assert caplog.text.count("are using HTTP/1.1") == 1
+    assert (
+        'nb_fapi_node_http_version{node="https://firstpublicnode.org/",http_version="HTTP/2"} 1'
+        in metrics.render_metrics()
+    )
+
+
+@pytest.mark.parametrize(
+    "url,expected_path",
+    [
+        ("https://firstnode.org/node/subjects", "subjects"),
+        ("https://firstnode.org/node/assessments", "assessments"),
+        (
+            "https://firstnode.org/node/pipelines/np:fmriprep/versions",
+            "pipelines/{pipeline_term}/versions",
+        ),
+    ],
+)
+def test_get_node_request_path(url, expected_path):
+    """Test that the path of a request relative to the node URL is correctly determined."""
+    assert (
+        util.get_node_request_path(url, "https://firstnode.org/node/")
+        == expected_path
+    )
+
+
+@pytest.mark.asyncio
+async def test_send_request_uses_adaptive_node_timeout(monkeypatch):
+    """
+    Test that when no explicit timeout is given, requests to a node use a timeout
+    derived from the observed latencies of the node, and that the latency of each response is recorded.
+    """
+    node_url = "https://firstpublicnode.org/"
+    request_timeouts = []
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        request_timeouts.append(kwargs["timeout"])
+        return httpx.Response(status_code=200, json=[])
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+    monkeypatch.setattr(
+        util.NODE_LATENCY_TRACKER,
+        "get_timeout",
+        lambda node_url, path: 4.5 if path == "subjects" else 10,
+    )
+    monkeypatch.setattr(util.NODE_LATENCY_TRACKER, "_latencies", {})
+
+    await util.send_request(
+        method="POST", url=node_url + "subjects", node_url=node_url
+    )
+    await util.send_request(
+        method="POST", url=node_url + "subjects", timeout=1, node_url=node_url
+    )
+
+    assert request_timeouts == [4.5, 1]
+    assert (
+        len(util.NODE_LATENCY_TRACKER._latencies[(node_url, "subjects")]) == 2
+    )
+
+
+@pytest.mark.asyncio
+async def test_adaptive_timeout_expiry_backs_off_without_opening_circuit(
+    monkeypatch,
+):
+    """
+    Test that when a request to a node times out after an adaptive timeout shorter than the default timeout,
+    the timeout of the node is backed off for the next request and the timeout is not counted as a failure of the node,
+    while timing out after a backed off timeout beyond the default timeout is.
+    """
+    node_url = "https://firstpublicnode.org/"
+    request_timeouts = []
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        request_timeouts.append(kwargs["timeout"])
+        raise httpx.ReadTimeout("Timed out")
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+    monkeypatch.setattr(util.NODE_LATENCY_TRACKER, "_latencies", {})
+    monkeypatch.setattr(util.NODE_LATENCY_TRACKER, "_backoffs", {})
+    for _ in range(util.NODE_LATENCY_TRACKER.min_samples):
+        util.NODE_LATENCY_TRACKER.record(node_url, "subjects", 0.5)
+    circuit_breaker = util.get_node_circuit_breaker(node_url)
+
+    expected_consecutive_failures = [0, 1]
+    for expected_failures in expected_consecutive_failures:
+        with pytest.raises(HTTPException) as exc_info:
+            await util.send_request(
+                method="POST", url=node_url + "subjects", node_url=node_url
+            )
+        assert exc_info.value.status_code == 504
+        assert circuit_breaker.consecutive_failures == expected_failures
+
+    assert (
+        request_timeouts[0]
+        < util.NODE_LATENCY_TRACKER.default_timeout
+        <= request_timeouts[1]
+    )
+
+
+@pytest.mark.asyncio
+async def test_node_index_reloaded_from_changed_local_nodes(
+    monkeypatch, tmp_path
+):
+    """
+    Test that reloading the node index after the local node file changes replaces the index with a new one
+    (leaving the previous index untouched for in-flight requests), and opens and closes pooled clients
+    for added and removed nodes.
+    """
+    local_node_index_path = tmp_path / "local_nb_nodes.json"
+    local_node_index_path.write_text(
+        json.dumps(
+            [{"NodeName": "Local Node", "ApiURL": "https://mylocalnode.org"}]
+        )
+    )
+    previous_nodes = {
+        "https://firstpublicnode.org/": "First Public Node",
+        "https://removednode.org/": "Removed Node",
+    }
+    monkeypatch.setattr(util, "LOCAL_NODE_INDEX_PATH", local_node_index_path)
+    monkeypatch.setattr(util, "FEDERATION_NODES", previous_nodes)
+    monkeypatch.setattr(
+        util,
+        "PUBLIC_NODES",
+        {"https://firstpublicnode.org/": "First Public Node"},
+    )
+    monkeypatch.setattr(util, "NODE_HTTP_CLIENTS", {})
+    util.open_node_http_clients(previous_nodes)
+    removed_node_client = util.NODE_HTTP_CLIENTS["https://removednode.org/"]
+
+    await util.refresh_federation_node_index()
+    # The clients of removed nodes are closed in the background
+    await asyncio.gather(*util.NODE_HTTP_CLIENT_CLOSE_TASKS)
+
+    assert util.FEDERATION_NODES == {
+        "https://firstpublicnode.org/": "First Public Node",
+        "https://mylocalnode.org/": "Local Node",
+    }
+    assert previous_nodes == {
+        "https://firstpublicnode.org/": "First Public Node",
+        "https://removednode.org/": "Removed Node",
+    }
+    assert set(util.NODE_HTTP_CLIENTS) == set(util.FEDERATION_NODES)
+    assert removed_node_client.is_closed
+
+    await util.close_node_http_clients()
+
+
+@pytest.mark.asyncio
+async def test_node_index_kept_when_no_nodes_left(
+    monkeypatch, tmp_path, caplog
+):
+    """Test that if no nodes are found when reloading the node index, the current index is kept."""
+    current_nodes = {"https://mylocalnode.org/": "Local Node"}
+    monkeypatch.setattr(
+        util, "LOCAL_NODE_INDEX_PATH", tmp_path / "local_nb_nodes.json"
+    )
+    monkeypatch.setattr(util, "FEDERATION_NODES", current_nodes)
+    monkeypatch.setattr(util, "PUBLIC_NODES", {})
+
+    await util.refresh_federation_node_index()
+
+    assert util.FEDERATION_NODES is current_nodes
+    assert "The current node index will be kept" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_public_nodes_loaded_from_snapshot_without_fetching(
+    monkeypatch,
+):
+    """
+    Test that public nodes fetched from the node directory are saved to the snapshot,
+    and that on the next startup they are loaded from the snapshot without waiting for the directory.
+    """
+    fetch_headers = []
+
+    async def mock_httpx_get(self, url, **kwargs):
+        fetch_headers.append(kwargs["headers"])
+        return httpx.Response(
+            status_code=200,
+            json=[
+                {
+                    "NodeName": "First Public Node",
+                    "ApiURL": "https://firstpublicnode.org",
+                },
+            ],
+            headers={"ETag": '"v1"'},
+        )
+
+    monkeypatch.setattr(util, "parse_nodes_as_dict", lambda path: {})
+    monkeypatch.setattr(httpx.AsyncClient, "get", mock_httpx_get)
+    monkeypatch.setattr(util, "FEDERATION_NODES", {})
+
+    assert await util.create_federation_node_index() is False
+    assert util.NODE_DIRECTORY_SNAPSHOT_PATH.value.is_file()
+
+    monkeypatch.setattr(util, "FEDERATION_NODES", {})
+    monkeypatch.setattr(util, "PUBLIC_NODES", {})
+    monkeypatch.setattr(util, "NODE_DIRECTORY_VALIDATORS", {})
+
+    assert await util.create_federation_node_index() is True
+    assert util.FEDERATION_NODES == {
+        "https://firstpublicnode.org/": "First Public Node"
+    }
+    assert util.NODE_DIRECTORY_VALIDATORS["etag"] == '"v1"'
+    assert len(fetch_headers) == 1
+
+
+@pytest.mark.asyncio
+async def test_startup_without_snapshot_not_delayed_by_directory_fetch(
+    monkeypatch,
+):
+    """
+    Test that without a node directory snapshot, the node index is first created from the local nodes alone
+    without fetching the directory, and that the public nodes are added once the directory is fetched.
+    """
+    local_nodes = {"https://mylocalnode.org/": "Local Node"}
+    fetched_urls = []
+
+    async def mock_httpx_get(self, url, **kwargs):
+        fetched_urls.append(url)
+        return httpx.Response(
+            status_code=200,
+            json=[
+                {
+                    "NodeName": "First Public Node",
+                    "ApiURL": "https://firstpublicnode.org",
+                },
+            ],
+        )
+
+    monkeypatch.setattr(util, "parse_nodes_as_dict", lambda path: local_nodes)
+    monkeypatch.setattr(httpx.AsyncClient, "get", mock_httpx_get)
+    monkeypatch.setattr(util, "FEDERATION_NODES", {})
+    monkeypatch.setattr(util, "NODE_HTTP_CLIENTS", {})
+
+    assert await util.create_federation_node_index() is True
+    assert util.FEDERATION_NODES == local_nodes
+    assert fetched_urls == []
+
+    await util.refresh_federation_node_index(is_directory_fetched=True)
+
+    assert util.FEDERATION_NODES == {
+        "https://firstpublicnode.org/": "First Public Node",
+        **local_nodes,
+    }
+    assert len(fetched_urls) == 1
+
+    await util.close_node_http_clients()
+
+
+@pytest.mark.asyncio
+async def test_unchanged_node_directory_not_refetched(monkeypatch):
+    """Test that the node directory is re-fetched conditionally, and that the known public nodes are kept if it has not changed."""
+    public_nodes = {"https://firstpublicnode.org/": "First Public Node"}
+    fetch_headers = []
+
+    async def mock_httpx_get(self, url, **kwargs):
+        fetch_headers.append(kwargs["headers"])
+        return httpx.Response(status_code=304)
+
+    monkeypatch.setattr(httpx.AsyncClient, "get", mock_httpx_get)
+    monkeypatch.setattr(util, "PUBLIC_NODES", public_nodes)
+    monkeypatch.setattr(
+        util,
+        "NODE_DIRECTORY_VALIDATORS",
+        {"etag": '"v1"', "last_modified": "Wed, 01 Jan 2025 00:00:00 GMT"},
+    )
+
+    assert await util.fetch_public_nodes() == (public_nodes, "")
+    assert fetch_headers == [
+        {
+            "If-None-Match": '"v1"',
+            "If-Modified-Since": "Wed, 01 Jan 2025 00:00:00 GMT",
+        }
+    ]
+
+
+@pytest.mark.asyncio
+async def test_node_directory_network_error_handled(monkeypatch):
+    """Test that a network error or timeout while fetching the node directory is reported as a failed fetch."""
+
+    async def mock_httpx_get(self, url, **kwargs):
+        raise httpx.ConnectTimeout("Some timeout")
+
+    monkeypatch.setattr(httpx.AsyncClient, "get", mock_httpx_get)
+
+    public_nodes, failed_get_warning = await util.fetch_public_nodes()
+
+    assert public_nodes is None
+    assert "ConnectTimeout: Some timeout" in failed_get_warning
+
+
+@pytest.mark.parametrize(
+    "response_kwargs",
+    [
+        {"text": "<html>Not JSON</html>"},
+        {"json": [{"NodeName": "Node Without URL"}]},
+        {"json": {"NodeName": "Node", "ApiURL": "https://node.org"}},
+        {"json": ["https://node.org"]},
+        {"json": None},
+    ],
+)
+@pytest.mark.asyncio
+async def test_malformed_node_directory_handled(monkeypatch, response_kwargs):
+    """Test that a successful response with a malformed node directory is reported as a failed fetch."""
+
+    async def mock_httpx_get(self, url, **kwargs):
+        return httpx.Response(status_code=200, **response_kwargs)
+
+    monkeypatch.setattr(httpx.AsyncClient, "get", mock_httpx_get)
+    monkeypatch.setattr(util, "NODE_DIRECTORY_VALIDATORS", {})
+
+    public_nodes, failed_get_warning = await util.fetch_public_nodes()
+
+    assert public_nodes is None
+    assert "does not have the expected format" in failed_get_warning
+    assert util.NODE_DIRECTORY_VALIDATORS == {}
+
+
+@pytest.mark.asyncio
+async def test_background_loop_keeps_running_after_error(monkeypatch, caplog):
+    """Test that an error raised in one iteration of a background loop is logged, and the loop keeps running."""
+    health_checks = []
+
+    async def mock_check_all_nodes_health():
+        health_checks.append(1)
+        if len(health_checks) == 1:
+            raise RuntimeError("Some health check error")
+
+    monkeypatch.setattr(
+        util, "check_all_nodes_health", mock_check_all_nodes_health
+    )
+    monkeypatch.setattr(
+        util,
+        "HEALTH_CHECK_INTERVAL",
+        util.EnvVar("NB_FAPI_HEALTH_CHECK_INTERVAL", 0.01),
+    )
+
+    health_check_task = asyncio.create_task(util.run_node_health_checks())
+    await asyncio.sleep(0.05)
+    health_check_task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await health_check_task
+
+    assert len(health_checks) > 1
+    assert "Some health check error" in caplog.text
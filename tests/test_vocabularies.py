@@ -0,0 +1,107 @@
+from urllib.parse import urlparse
+
+import httpx
+from fastapi import status
+
+from app.api import crud
+
+
+def test_vocabularies_combined_across_nodes_and_cached(
+    test_app, monkeypatch, set_valid_test_federation_nodes
+):
+    """
+    Test that all attribute vocabularies and pipeline versions are returned in a single combined response,
+    with terms deduplicated by TermURL, and that the per-attribute and per-pipeline caches are populated.
+    """
+    requested_urls = []
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        requested_urls.append(url)
+        is_first_node = urlparse(url).hostname == "firstpublicnode.org"
+        path = urlparse(url).path
+        if path == "/assessments":
+            mocked_response_json = {
+                "nb:Assessment": [{"TermURL": "cogatlas:trm1", "Label": "A"}]
+            }
+        elif path == "/diagnoses":
+            mocked_response_json = {
+                "nb:Diagnosis": (
+                    [{"TermURL": "snomed:1", "Label": "Dx"}]
+                    if is_first_node
+                    else []
+                )
+            }
+        elif path == "/imaging-modalities":
+            mocked_response_json = {"nb:Image": []}
+        elif path == "/pipelines":
+            mocked_response_json = {
+                "nb:Pipeline": [
+                    {"TermURL": "np:fmriprep", "Label": "fMRIPrep"}
+                ]
+            }
+        else:
+            mocked_response_json = {
+                "np:fmriprep": ["23.1.3"] if is_first_node else ["20.2.7"]
+            }
+        return httpx.Response(status_code=200, json=mocked_response_json)
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+
+    response = test_app.get("/vocabularies")
+    assert response.status_code == status.HTTP_200_OK
+    response_object = response.json()
+    assert response_object["errors"] == []
+    assert response_object["nodes_response_status"] == "success"
+    assert response_object["responses"] == {
+        "nb:Assessment": [{"TermURL": "cogatlas:trm1", "Label": "A"}],
+        "nb:Diagnosis": [{"TermURL": "snomed:1", "Label": "Dx"}],
+        "nb:Pipeline": [{"TermURL": "np:fmriprep", "Label": "fMRIPrep"}],
+        "nb:Image": [],
+        "pipeline_versions": {"np:fmriprep": ["20.2.7", "23.1.3"]},
+    }
+    # 4 attribute requests + 1 pipeline versions request per node
+    assert len(requested_urls) == 10
+
+    # The individual vocabularies are now served from the cache
+    response = test_app.get("/diagnoses")
+    assert response.json()["responses"] == {
+        "nb:Diagnosis": [{"TermURL": "snomed:1", "Label": "Dx"}]
+    }
+    response = test_app.get("/pipelines/np:fmriprep/versions")
+    assert response.json()["responses"] == {
+        "np:fmriprep": ["20.2.7", "23.1.3"]
+    }
+    assert len(requested_urls) == 10
+
+
+def test_vocabularies_node_errors_combined_per_node(
+    test_app, monkeypatch, set_valid_test_federation_nodes
+):
+    """Test that the failed requests to a node are reported as a single error for the node."""
+
+    async def mock_httpx_request(self, method, url, **kwargs):
+        if urlparse(url).hostname == "secondpublicnode.org":
+            raise httpx.ConnectError("Some connection error")
+        path = urlparse(url).path
+        attribute_uri = {
+            "/assessments": "nb:Assessment",
+            "/diagnoses": "nb:Diagnosis",
+            "/imaging-modalities": "nb:Image",
+            "/pipelines": "nb:Pipeline",
+        }[path]
+        return httpx.Response(status_code=200, json={attribute_uri: []})
+
+    monkeypatch.setattr(httpx.AsyncClient, "request", mock_httpx_request)
+
+    response = test_app.get("/vocabularies")
+    assert response.status_code == status.HTTP_207_MULTI_STATUS
+    response_object = response.json()
+    assert response_object["nodes_response_status"] == "partial success"
+    assert len(response_object["errors"]) == 1
+    assert response_object["errors"][0]["node_name"] == "Second Public Node"
+    assert "/assessments" in response_object["errors"][0]["error"]
+    assert response_object["responses"]["pipeline_versions"] == {}
+    assert (
+        crud.VOCABULARY_CACHE.get("assessments")[0]["nodes_response_status"]
+        == "partial success"
+    )